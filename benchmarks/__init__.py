@@ -0,0 +1,19 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Performance benchmarks for ``django-modeltranslation-xliff``
+
+Benchmarks use the test Django project from ``testapp`` package
+and should be run from the repository root, e.g.::
+
+    python -m benchmarks.segmenters
+    python -m benchmarks.taggers
+    python -m benchmarks.parsers
+    python -m benchmarks.suite --objects 1000 --json results.json
+
+Results of the benchmark suite saved with ``--json`` option can be compared
+with results for another commit with ``--compare`` option.
+"""
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'testapp.settings')
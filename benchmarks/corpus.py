@@ -0,0 +1,165 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Synthetic corpus generator for benchmarks
+
+Generates :class:`testapp.models.Article` content that resembles
+content authored with WYSIWYG editors: headings, paragraphs and lists
+with inline formatting tags, links, line breaks and character entities.
+The corpus is fully determined by its parameters and the random seed,
+so benchmark results are comparable across commits.
+
+Usage::
+
+    python -m benchmarks.corpus [--objects 10] [--html-size 2000] [--seed 1]
+"""
+import argparse
+import random
+import typing
+
+WORDS = (
+    'translation content model export import segment page article text '
+    'product service customer quality price delivery order support team '
+    'company market report result value system process data project time '
+    'year people world information development management experience '
+    'the a an of to and in for on with by from at as is are was be have '
+    'new good great best first last long little own other old right big '
+    'high different small large next early young important few public'
+).split()
+ABBREVIATIONS = ('e.g.', 'i.e.', 'etc.', 'Dr.', 'Mr.', 'approx.')
+INLINE_TAGS = (
+    ('<strong>', '</strong>'),
+    ('<em>', '</em>'),
+    ('<a href="https://example.com/page">', '</a>'),
+    ('<span style="color: #ff0000;">', '</span>'),
+    ('<u>', '</u>'),
+)
+EMPTY_TAGS = ('<br>', '<img src="/media/image.png" alt="">')
+ENTITIES = ('&amp;', '&nbsp;', '&copy;', '&quot;', '&lt;', '&gt;', '&#8212;',
+            '&euro;')
+
+
+def make_sentence(rnd, tag_density, entity_density):
+    # type: (random.Random, float, float) -> str
+    """
+    Generate a sentence with inline tags and character entities
+
+    :param rnd: random generator
+    :param tag_density: probability of an inline tag per word
+    :param entity_density: probability of a character entity per word
+    :return: HTML sentence
+    """
+    words = []
+    for i in range(rnd.randint(5, 20)):
+        word = rnd.choice(WORDS)
+        if not i:
+            word = word.capitalize()
+        elif rnd.random() < 0.03:
+            word = rnd.choice(ABBREVIATIONS)
+        if rnd.random() < entity_density:
+            word += ' ' + rnd.choice(ENTITIES)
+        if rnd.random() < tag_density:
+            if rnd.random() < 0.2:
+                word += rnd.choice(EMPTY_TAGS)
+            else:
+                opening, closing = rnd.choice(INLINE_TAGS)
+                word = opening + word + closing
+        words.append(word)
+    return ' '.join(words) + rnd.choice('..?!')
+
+
+def make_html(rnd, html_size, tag_density, entity_density):
+    # type: (random.Random, int, float, float) -> str
+    """
+    Generate a HTML document of approximately the given size
+
+    :param rnd: random generator
+    :param html_size: target document size in characters
+    :param tag_density: probability of an inline tag per word
+    :param entity_density: probability of a character entity per word
+    :return: HTML document
+    """
+    blocks = []
+    size = 0
+    while size < html_size:
+        kind = rnd.random()
+        if kind < 0.15:
+            block = '<h2>{}</h2>'.format(
+                make_sentence(rnd, tag_density, entity_density)[:-1]
+            )
+        elif kind < 0.3:
+            block = '<ul>{}</ul>'.format(''.join(
+                '<li>{}</li>'.format(
+                    make_sentence(rnd, tag_density, entity_density)
+                )
+                for _ in range(rnd.randint(2, 5))
+            ))
+        else:
+            block = '<p>{}</p>'.format(' '.join(
+                make_sentence(rnd, tag_density, entity_density)
+                for _ in range(rnd.randint(1, 6))
+            ))
+        blocks.append(block)
+        size += len(block)
+    return '\n'.join(blocks)
+
+
+def make_corpus(objects, html_size=2000, tag_density=0.1,
+                entity_density=0.02, seed=1):
+    # type: (int, int, float, float, int) -> typing.List[dict]
+    """
+    Generate article data
+
+    :param objects: the number of articles
+    :param html_size: approximate size of article text in characters
+    :param tag_density: probability of an inline tag per word
+    :param entity_density: probability of a character entity per word
+    :param seed: random seed
+    :return: the list of ``{'title': ..., 'text': ...}`` dictionaries
+    """
+    rnd = random.Random(seed)
+    return [
+        {
+            'title': make_sentence(rnd, 0, 0)[:-1][:255],
+            'text': make_html(rnd, html_size, tag_density, entity_density),
+        }
+        for _ in range(objects)
+    ]
+
+
+def populate_articles(corpus, batch_size=500):
+    # type: (typing.List[dict], int) -> None
+    """
+    Save generated articles to the database
+
+    :param corpus: article data from :func:`make_corpus`
+    :param batch_size: the number of articles created with one query
+    """
+    from modeltranslation.utils import auto_populate
+    from testapp.models import Article
+    # Translation fields for the default language are populated
+    # only for regular saves, so they are populated explicitly.
+    with auto_populate('required'):
+        Article.objects.bulk_create(
+            [Article(**data) for data in corpus], batch_size=batch_size
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--objects', type=int, default=10)
+    parser.add_argument('--html-size', type=int, default=2000)
+    parser.add_argument('--tag-density', type=float, default=0.1)
+    parser.add_argument('--entity-density', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    corpus = make_corpus(args.objects, args.html_size, args.tag_density,
+                         args.entity_density, args.seed)
+    for data in corpus:
+        print(data['title'])
+        print(data['text'])
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Throughput benchmark for HTML content parsers
+
+Compares ``html`` parser based on :class:`html.parser.HTMLParser`
+with ``fast_html`` parser on a synthetic corpus and checks
+that both parsers produce the same blocks.
+
+Usage::
+
+    python -m benchmarks.parsers [--documents 1000] [--html-size 2000]
+        [--tag-density 0.1] [--entity-density 0.02] [--seed 1] [--repeat 5]
+"""
+import argparse
+import time
+import typing
+import django
+
+django.setup()
+
+from modeltranslation_xliff.parsers import fast_html, html  # noqa: E402
+from .corpus import make_corpus  # noqa: E402
+
+
+def measure(parse_content, documents, repeat):
+    # type: (typing.Callable, list, int) -> typing.Tuple[list, float]
+    """
+    Parse all documents and measure the best throughput of several runs
+
+    :return: (blocks of all documents, megabytes per second) tuple
+    """
+    size = sum(len(document) for document in documents)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [list(parse_content(document)) for document in documents]
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return results, size / best / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--documents', type=int, default=1000)
+    parser.add_argument('--html-size', type=int, default=2000)
+    parser.add_argument('--tag-density', type=float, default=0.1)
+    parser.add_argument('--entity-density', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    documents = [
+        article['text'] for article in make_corpus(
+            args.documents, args.html_size, args.tag_density,
+            args.entity_density, args.seed
+        )
+    ]
+    html_results, html_speed = measure(html.parse_content, documents,
+                                       args.repeat)
+    fast_results, fast_speed = measure(fast_html.parse_content, documents,
+                                       args.repeat)
+    print('html:      {:>8.2f} MB/s'.format(html_speed))
+    print('fast_html: {:>8.2f} MB/s'.format(fast_speed))
+    print('speedup: {:.2f}x, identical output: {}'.format(
+        fast_speed / html_speed, fast_results == html_results
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Throughput and agreement benchmark for the rule-based (SRX) segmenter
+and NLTK Punkt segmenter
+
+NLTK segmentation is used as the reference for agreement. If Punkt models
+are not installed, only SRX throughput is reported.
+
+Usage::
+
+    python -m benchmarks.segmenters [--blocks 2000] [--seed 1]
+"""
+import argparse
+import random
+import time
+import django
+
+django.setup()
+
+from modeltranslation_xliff.parsers import segmenter, srx  # noqa: E402
+
+SENTENCES = (
+    'The quick brown fox jumps over the lazy dog.',
+    'Mr. Smith arrived at 5 p.m. and left soon after.',
+    'Is this the <strong>right</strong> way to do it?',
+    'Prices start at $9.99 for the basic plan.',
+    'Dr. Watson works for the U.S. Army.',
+    'We need apples, oranges, etc. for the party.',
+    'She said: "It works!" and smiled.',
+    'See Fig. 3 for details.',
+    'The <a href="https://example.com">project page</a> has more info.',
+    'Wait... what happened next?',
+    'It costs approx. 20 dollars.',
+    'Version 2.1 was released in Jan. 2018.',
+)
+
+
+def make_blocks(count, seed):
+    # type: (int, int) -> list
+    """
+    Generate text blocks from random sample sentences
+
+    :param count: the number of blocks
+    :param seed: random seed
+    :return: the list of (block, reference sentences) tuples
+    """
+    rnd = random.Random(seed)
+    blocks = []
+    for _ in range(count):
+        sentences = [rnd.choice(SENTENCES) for _ in range(rnd.randint(1, 8))]
+        blocks.append((' '.join(sentences), sentences))
+    return blocks
+
+
+def measure(segment_text, blocks, language):
+    # type: (typing.Callable, list, str) -> tuple
+    """
+    Segment all blocks and measure throughput
+
+    :return: (segmented blocks, characters per second) tuple
+    """
+    chars = sum(len(block) for block, _ in blocks)
+    start = time.perf_counter()
+    results = [segment_text(block, language) for block, _ in blocks]
+    elapsed = time.perf_counter() - start
+    return results, chars / elapsed
+
+
+def agreement(results, reference):
+    # type: (list, list) -> float
+    """
+    Calculate the percentage of blocks segmented identically
+
+    :return: agreement in percents
+    """
+    same = sum(1 for res, ref in zip(results, reference) if res == ref)
+    return same * 100.0 / len(reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--blocks', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--language', default='en')
+    args = parser.parse_args()
+    blocks = make_blocks(args.blocks, args.seed)
+    sample = [sentences for _, sentences in blocks]
+    srx_results, srx_speed = measure(srx.segment_text, blocks, args.language)
+    print('srx:  {:>12,.0f} chars/s, agreement with sample sentences: '
+          '{:.1f}%'.format(srx_speed, agreement(srx_results, sample)))
+    try:
+        segmenter.load_tokenizer()
+    except LookupError:
+        print('nltk: Punkt models are not installed, skipping.')
+        return
+    nltk_results, nltk_speed = measure(
+        segmenter.segment_text, blocks, args.language
+    )
+    print('nltk: {:>12,.0f} chars/s, agreement with sample sentences: '
+          '{:.1f}%'.format(nltk_speed, agreement(nltk_results, sample)))
+    print('srx/nltk agreement: {:.1f}%, speedup: {:.1f}x'.format(
+        agreement(srx_results, nltk_results), srx_speed / nltk_speed
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Benchmark suite for XLIFF export and import
+
+Runs the main phases of XLIFF exchange on a synthetic corpus of
+``Article`` objects and reports wall time, peak memory allocated
+by Python code (measured with :mod:`tracemalloc`) and the number
+of database queries for each phase. Wall time is the best of several
+runs without memory tracing, because tracing slows down Python code.
+
+The corpus is generated from a fixed random seed, so results saved
+with ``--json`` can be compared between commits with ``--compare``.
+A temporary test database is created for the benchmark.
+
+Usage::
+
+    python -m benchmarks.suite [--objects 200] [--html-size 2000]
+        [--tag-density 0.1] [--entity-density 0.02] [--seed 1]
+        [--repeat 3] [--json results.json] [--compare baseline.json]
+"""
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+import typing
+from collections import OrderedDict
+from copy import deepcopy
+import django
+
+django.setup()
+
+from django.contrib import admin  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from lxml import etree  # noqa: E402
+from modeltranslation_xliff import cache, utils  # noqa: E402
+from modeltranslation_xliff.parsers import html  # noqa: E402
+from testapp.models import Article  # noqa: E402
+from .corpus import make_corpus, populate_articles  # noqa: E402
+
+#: Target language for translated XLIFF files
+TARGET_LANGUAGE = 'ru-ru'
+#: Relative change below which results are reported as unchanged
+THRESHOLD = 0.05
+
+
+def translate_xliff(xliff):
+    # type: (bytes) -> bytes
+    """
+    Create a "translated" XLIFF file by copying sources to targets
+
+    :param xliff: exported XLIFF file
+    :return: translated XLIFF file
+    """
+    root = etree.fromstring(xliff, etree.XMLParser(huge_tree=True))
+    for file in root.iter('file'):
+        file.set('target-language', TARGET_LANGUAGE)
+    for unit in root.iter('trans-unit'):
+        target = deepcopy(unit.find('source'))
+        target.tag = 'target'
+        unit.append(target)
+    return etree.tostring(root, encoding='utf-8', xml_declaration=True)
+
+
+def measure(func, repeat):
+    # type: (typing.Callable, int) -> OrderedDict
+    """
+    Measure a benchmark phase
+
+    The processed block cache is reset before each run, so all runs
+    measure the same amount of work.
+
+    :param func: a callable that runs the phase
+    :param repeat: the number of timed runs
+    :return: phase results
+    """
+    times = []
+    for _ in range(repeat):
+        cache._block_cache = None
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    cache._block_cache = None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    result = OrderedDict()
+    result['time'] = min(times)
+    result['peak_memory'] = peak
+    result['queries'] = len(queries)
+    return result
+
+
+def run_suite(args):
+    # type: (argparse.Namespace) -> OrderedDict
+    """
+    Run all benchmark phases on a generated corpus
+
+    :param args: command line arguments
+    :return: benchmark results for each phase
+    """
+    corpus = make_corpus(args.objects, args.html_size, args.tag_density,
+                         args.entity_density, args.seed)
+    populate_articles(corpus)
+    model_admin = admin.site._registry[Article]
+    queryset = Article.objects.all()
+    texts = [data['text'] for data in corpus]
+    blocks = [block for text in texts for block in html.parse_content(text)]
+    segments = [seg for block in blocks
+                for seg in utils._get_segments(block, 'en')]
+
+    def parse_content():
+        for text in texts:
+            for _ in html.parse_content(text):
+                pass
+
+    def add_xliff_tags():
+        for seg in segments:
+            html.add_xliff_tags(seg)
+
+    def create_xliff():
+        translation_data = model_admin._get_model_trans_source(queryset,
+                                                               lazy=True)
+        for _ in utils.iter_xliff(translation_data):
+            pass
+
+    xliff = translate_xliff(
+        utils.create_xliff(model_admin._get_model_trans_source(queryset))
+    )
+
+    def import_xliff():
+        utils.import_xliff(xliff)
+
+    translation_data = utils.import_xliff(xliff)
+
+    def update_translations():
+        data = deepcopy(translation_data)
+        with transaction.atomic():
+            model_admin._update_translations(data)
+
+    phases = OrderedDict((
+        ('parsers.html.parse_content', parse_content),
+        ('parsers.html.add_xliff_tags', add_xliff_tags),
+        ('create_xliff', create_xliff),
+        ('import_xliff', import_xliff),
+        ('_update_translations', update_translations),
+    ))
+    results = OrderedDict()
+    for name, func in phases.items():
+        results[name] = measure(func, args.repeat)
+        print_result(name, results[name])
+    return results
+
+
+def get_revision():
+    # type: () -> typing.Optional[str]
+    """
+    Get the current git commit of the repository
+
+    :return: commit hash or ``None`` if it cannot be determined
+    """
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(name, result):
+    # type: (str, dict) -> None
+    print('{:<30} {:>10.3f} s {:>10.1f} MiB {:>6} queries'.format(
+        name, result['time'], result['peak_memory'] / 1048576,
+        result['queries']
+    ))
+
+
+def _format_change(current, baseline):
+    # type: (float, float) -> str
+    if not baseline:
+        return '{:>10}'.format('n/a')
+    ratio = current / baseline
+    if abs(ratio - 1) < THRESHOLD:
+        return '{:>10}'.format('~')
+    return '{:>9.2f}x'.format(ratio)
+
+
+def compare(results, baseline):
+    # type: (dict, dict) -> None
+    """
+    Print ratios of current results to baseline results
+
+    :param results: current benchmark results
+    :param baseline: baseline benchmark results loaded from a JSON file
+    """
+    if baseline['parameters'] != results['parameters']:
+        print('Warning: baseline parameters differ: {}'.format(
+            baseline['parameters']
+        ))
+    print('Compared to {} (current/baseline):'.format(
+        baseline.get('revision') or 'baseline'
+    ))
+    print('{:<30} {:>12} {:>14} {:>14}'.format('', 'time', 'peak memory',
+                                               'queries'))
+    for name, result in results['phases'].items():
+        base = baseline['phases'].get(name)
+        if base is None:
+            continue
+        print('{:<30} {:>12} {:>14} {:>6} -> {:<6}'.format(
+            name, _format_change(result['time'], base['time']),
+            _format_change(result['peak_memory'], base['peak_memory']),
+            base['queries'], result['queries']
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--objects', type=int, default=200)
+    parser.add_argument('--html-size', type=int, default=2000)
+    parser.add_argument('--tag-density', type=float, default=0.1)
+    parser.add_argument('--entity-density', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='the number of timed runs for each phase')
+    parser.add_argument('--json', metavar='FILE',
+                        help='save results to a JSON file')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare results with a saved JSON file')
+    args = parser.parse_args()
+    results = OrderedDict()
+    results['revision'] = get_revision()
+    results['python'] = platform.python_version()
+    results['django'] = django.get_version()
+    results['parameters'] = OrderedDict(
+        (name, getattr(args, name)) for name in
+        ('objects', 'html_size', 'tag_density', 'entity_density', 'seed')
+    )
+    # The test database of testapp is created in memory
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        results['phases'] = run_suite(args)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    if args.json:
+        with open(args.json, 'w') as fo:
+            json.dump(results, fo, indent=2)
+    if args.compare:
+        with open(args.compare) as fo:
+            compare(results, json.load(fo))
+
+
+if __name__ == '__main__':
+    main()
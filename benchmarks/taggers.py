@@ -0,0 +1,99 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Throughput benchmark for the single-pass inline XLIFF tagger
+and the two-pass tagger (add_ph_tags + add_t_tags)
+
+Segments are generated with high inline tag and entity density,
+and a part of them has deeply nested inline markup.
+
+Usage::
+
+    python -m benchmarks.taggers [--segments 20000] [--tag-density 0.5]
+        [--entity-density 0.1] [--depth 20] [--seed 1] [--repeat 5]
+"""
+import argparse
+import random
+import time
+import typing
+import django
+
+django.setup()
+
+from modeltranslation_xliff.parsers import html  # noqa: E402
+from .corpus import make_sentence  # noqa: E402
+
+
+def make_segments(count, tag_density, entity_density, depth, seed):
+    # type: (int, float, float, int, int) -> list
+    """
+    Generate tag-dense segments
+
+    Every 10th segment is wrapped in nested inline tags.
+
+    :param count: the number of segments
+    :param tag_density: probability of an inline tag per word
+    :param entity_density: probability of a character entity per word
+    :param depth: nesting depth of inline tags
+    :param seed: random seed
+    :return: the list of segments
+    """
+    rnd = random.Random(seed)
+    segments = []
+    for i in range(count):
+        segment = make_sentence(rnd, tag_density, entity_density)
+        if not i % 10:
+            tags = [rnd.choice(('b', 'i', 'em', 'span')) for _ in range(depth)]
+            segment = ''.join('<{}>'.format(tag) for tag in tags) + segment + \
+                ''.join('</{}>'.format(tag) for tag in reversed(tags))
+        segments.append(segment)
+    return segments
+
+
+def two_pass(segment):
+    # type: (str) -> str
+    return html.add_t_tags(html.add_ph_tags(segment))
+
+
+def measure(tagger, segments, repeat):
+    # type: (typing.Callable, list, int) -> typing.Tuple[list, float]
+    """
+    Tag all segments and measure the best throughput of several runs
+
+    :return: (tagged segments, segments per second) tuple
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [tagger(segment) for segment in segments]
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return results, len(segments) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--segments', type=int, default=20000)
+    parser.add_argument('--tag-density', type=float, default=0.5)
+    parser.add_argument('--entity-density', type=float, default=0.1)
+    parser.add_argument('--depth', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    segments = make_segments(args.segments, args.tag_density,
+                             args.entity_density, args.depth, args.seed)
+    two_pass_results, two_pass_speed = measure(two_pass, segments,
+                                              args.repeat)
+    single_pass_results, single_pass_speed = measure(html.add_xliff_tags,
+                                                     segments, args.repeat)
+    print('two-pass:    {:>10,.0f} segments/s'.format(two_pass_speed))
+    print('single-pass: {:>10,.0f} segments/s'.format(single_pass_speed))
+    print('speedup: {:.2f}x, identical output: {}'.format(
+        single_pass_speed / two_pass_speed,
+        single_pass_results == two_pass_results
+    ))
+
+
+if __name__ == '__main__':
+    main()
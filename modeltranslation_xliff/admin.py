@@ -1,16 +1,82 @@
 import logging
+import os
+import time
+import typing
 from collections import OrderedDict
+from functools import lru_cache, partial
 from django.contrib import messages
-from django.core.exceptions import ValidationError
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import transaction
 from django.db.models import Model, QuerySet
 from django.http.request import HttpRequest
-from django.http.response import HttpResponse, HttpResponseRedirect, \
-    HttpResponseNotAllowed
+from django.http.response import FileResponse, Http404, HttpResponse, \
+    HttpResponseBase, HttpResponseRedirect, HttpResponseNotAllowed, \
+    StreamingHttpResponse
 from django.conf.urls import url
+from django.template.response import TemplateResponse
+from django.urls import reverse
 from django.utils.translation import ugettext_lazy as _
-from modeltranslation.fields import TranslationField
 from modeltranslation.settings import DEFAULT_LANGUAGE, AVAILABLE_LANGUAGES
-from .utils import create_xliff, import_xliff
+from modeltranslation.translator import translator
+from modeltranslation.utils import build_localized_fieldname
+from .settings import STREAMING_EXPORT, IMPORT_BATCH_SIZE, BACKGROUND_JOBS, \
+    EXPORT_CHUNK_SIZE, EXPORT_DB_ALIAS, EXPORT_COMPRESSION, \
+    EXPORT_TARGET_LANGUAGES
+from .compression import ZIP, compress, get_compression, get_content_type, \
+    get_file_extension, iter_xliff_files
+from .metrics import Metrics
+from .utils import iter_xliff, iter_xliff_archive, iterparse_xliff_files, \
+    chunked, bulk_update, iterate_queryset
+
+
+@lru_cache(maxsize=None)
+def get_translation_plan(model):
+    # type: (typing.Type[Model]) -> OrderedDict
+    """
+    Get translatable fields of a model and their translation fields
+
+    The plan is built once per model from modeltranslation registry
+    and cached.
+
+    :param model: Django model class registered with modeltranslation
+    :return: ordered dictionary that maps translatable field names
+        in the order of model fields to dictionaries
+        of ``{language code: translation field name}``
+    """
+    opts = translator.get_options_for_model(model)
+    plan = OrderedDict()
+    for f in model._meta.fields:
+        if f.name in opts.fields:
+            plan[f.name] = {
+                lang: build_localized_fieldname(f.name, lang)
+                for lang in AVAILABLE_LANGUAGES
+            }
+    return plan
+
+
+class _CompletionCallbackIterator:
+    """
+    Iterates over response content and calls a function
+    when the response is closed after all content has been sent
+
+    :param chunks: response content
+    :param callback: a callable without arguments
+    """
+    def __init__(self, chunks, callback):
+        # type: (typing.Iterable[bytes], typing.Callable) -> None
+        self._chunks = chunks
+        self._callback = callback
+        self._completed = False
+
+    def __iter__(self):
+        yield from self._chunks
+        self._completed = True
+
+    def close(self):
+        # type: () -> None
+        if self._completed:
+            self._completed = False
+            self._callback()
 
 
 class XliffExchangeMixin:
@@ -34,49 +100,76 @@ class XliffExchangeMixin:
             pass
     """
     change_list_template = 'modeltranslation_xliff/change_list.html'
-    actions = ['export_xliff']
+    actions = ['export_xliff', 'export_xliff_languages', 'export_xliff_changes']
 
     @staticmethod
-    def _get_object_trans_source(obj):
-        # type: (Model) -> dict
+    def _get_translatable_fields(model):
+        # type: (typing.Type[Model]) -> list
         """
-        Extract translatable content from a model object
+        Get translation fields of a model for the default language
 
-        :param obj: Django model object
+        :param model: Django model class
+        :return: the list of (original field name, translation field name)
+            tuples
+        """
+        return [(name, languages[DEFAULT_LANGUAGE])
+                for name, languages in get_translation_plan(model).items()]
+
+    @staticmethod
+    def _make_object_trans_source(fields, pk, values):
+        # type: (list, typing.Any, typing.Sequence) -> dict
+        """
+        Create translatable content dictionary for a model object
+
+        :param fields: translatable fields from :meth:`_get_translatable_fields`
+        :param pk: object's primary key
+        :param values: translation field values in the order of ``fields``
         :return: dictionary with translatable content
         """
-        fields = obj._meta.get_fields()
         translatable_fields = []
-        for f in fields:
-            name, *lang = f.name.split('_', 1)
-            # .replace('ind', 'id') fixes Indonesian langugage code
-            lang = lang[0].replace('_', '-').replace('ind', 'id') if lang else ''
-            if isinstance(f, TranslationField) and lang == DEFAULT_LANGUAGE:
-                # OrderedDict is used to mitigate different dict behavior
-                # in Py3.5 and Py3.6+ where dict key order is preserved.
-                # This is needed to pass tests on all Python versions.
-                f_dict = OrderedDict()
-                f_dict['name'] = name
-                f_dict['value'] = getattr(obj, f.name)
-                translatable_fields.append(f_dict)
+        for (name, f_name), value in zip(fields, values):
+            # OrderedDict is used to mitigate different dict behavior
+            # in Py3.5 and Py3.6+ where dict key order is preserved.
+            # This is needed to pass tests on all Python versions.
+            f_dict = OrderedDict()
+            f_dict['name'] = name
+            f_dict['value'] = value
+            translatable_fields.append(f_dict)
         obj_dict = OrderedDict()
-        obj_dict['id'] = str(obj.pk)
+        obj_dict['id'] = str(pk)
         obj_dict['fields'] = translatable_fields
         return obj_dict
 
-    def _get_model_trans_source(self, queryset):
-        # type: (QuerySet) -> dict
+    def _get_model_trans_source(self, queryset, lazy=False):
+        # type: (QuerySet, bool) -> dict
         """
         Extract translatable content from a queryset
 
+        Only primary keys and translation fields for the default language
+        are fetched from the database. If ``XLIFF_EXCHANGE_EXPORT_DB_ALIAS``
+        setting is set, content is read from that database.
+
         :param queryset: queryset for model objects to translate
+        :param lazy: if ``True``, translatable objects are provided
+            as a generator that fetches rows from the database
+            in chunks of ``XLIFF_EXCHANGE_EXPORT_CHUNK_SIZE``
+            without caching the queryset.
         :return: dictionary with translatable content
         """
-        translatable_objects = []
-        for obj in queryset:
-            translatable_objects.append(self._get_object_trans_source(obj))
+        fields = self._get_translatable_fields(queryset.model)
+        if EXPORT_DB_ALIAS:
+            queryset = queryset.using(EXPORT_DB_ALIAS)
+        rows = queryset.values_list('pk', *(f_name for name, f_name in fields))
+        if lazy:
+            rows = iterate_queryset(rows, EXPORT_CHUNK_SIZE)
+        translatable_objects = (
+            self._make_object_trans_source(fields, row[0], row[1:])
+            for row in rows
+        )
+        if not lazy:
+            translatable_objects = list(translatable_objects)
         model_dict = OrderedDict()
-        model_dict['name'] = self.model.__name__
+        model_dict['name'] = queryset.model.__name__
         model_dict['language'] = DEFAULT_LANGUAGE
         model_dict['objects'] = translatable_objects
         return model_dict
@@ -101,57 +194,395 @@ class XliffExchangeMixin:
             _('Unknown translation language: "{}"!').format(language)
         )
 
-    def _update_translations(self, translation_data):
-        # type: (dict) -> None
+    def _get_file_model_admin(self, name, request=None):
+        # type: (str, typing.Optional[HttpRequest]) -> XliffExchangeMixin
+        """
+        Find the model admin for a model from a XLIFF ``<file>`` element
+
+        :param name: model name from the XLIFF file
+        :param request: optional request of the user who imports translations.
+            If set, the user must have the change permission for the model.
+        :return: model admin instance
+        :raises django.core.exceptions.ValidationError: if no model or more
+            than one model with XLIFF exchange admin match the name,
+            or if the user has no permission to change the model
+        """
+        if name == self.model.__name__:
+            model_admins = [self]
+        else:
+            model_admins = [
+                model_admin
+                for model, model_admin in self.admin_site._registry.items()
+                if model.__name__ == name and
+                isinstance(model_admin, XliffExchangeMixin)
+            ]
+        if len(model_admins) != 1:
+            raise ValidationError(
+                _('Uploaded XLIFF is for different model: "{}"!').format(name)
+            )
+        model_admin = model_admins[0]
+        if request is not None and not model_admin.has_change_permission(request):
+            raise ValidationError(
+                _('You have no permission to import translations '
+                  'for "{}"!').format(name)
+            )
+        return model_admin
+
+    def _import_xliff_files(self, fo, stats=None, track_progress=None,
+                            request=None):
+        # type: (typing.BinaryIO, typing.Optional[dict], typing.Optional[typing.Callable], typing.Optional[HttpRequest]) -> list
+        """
+        Import translations for all models from a translated XLIFF file
+
+        Each ``<file>`` element of the XLIFF file is imported
+        by the model admin of the respective model. All models are updated
+        in a single transaction. Gzip-compressed XLIFF files and ZIP archives
+        with XLIFF files are decompressed while they are parsed.
+
+        :param fo: XLIFF file, gzip file or ZIP archive as a seekable
+            binary file object
+        :param stats: optional dictionary that receives the numbers
+            of imported ``'objects'`` and ``'segments'``
+        :param track_progress: optional callable that receives an iterable
+            of translated objects and returns an iterable of the same objects
+        :param request: optional request of the user who imports translations.
+            If set, the whole import is rejected if the user has no
+            change permission for any of the models in the XLIFF file.
+        :return: the list of imported translation languages
+        """
+        metrics = Metrics('import')
+        fo.seek(0, os.SEEK_END)
+        metrics.count('bytes', fo.tell())
+        fo.seek(0)
+        languages = []
+        with metrics.count_queries(), transaction.atomic():
+            for xliff_file in iter_xliff_files(fo):
+                for translation_data in iterparse_xliff_files(
+                        xliff_file, metrics.counters, metrics):
+                    if track_progress is not None:
+                        translation_data['objects'] = track_progress(
+                            translation_data['objects']
+                        )
+                    model_admin = self._get_file_model_admin(
+                        translation_data['name'], request
+                    )
+                    model_admin._update_translations(translation_data,
+                                                     metrics)
+                    if translation_data['language'] not in languages:
+                        languages.append(translation_data['language'])
+        if stats is not None:
+            for name in ('objects', 'segments'):
+                stats[name] = stats.get(name, 0) + metrics.counters[name]
+        metrics.report()
+        return languages
+
+    def _update_translations(self, translation_data, metrics=None):
+        # type: (dict, typing.Optional[Metrics]) -> None
         """
         Update translatable models content from imported XLIFF
 
+        Model objects are updated in batches of ``XLIFF_EXCHANGE_IMPORT_BATCH_SIZE``
+        inside a single transaction.
+
         :param translation_data: imported translations from a XLIFF
+        :param metrics: optional import metrics that receive the time
+            spent in fetching and updating objects. If not set, metrics
+            are collected and reported separately.
         """
+        if metrics is None:
+            metrics = Metrics('update_translations')
+            with metrics.count_queries():
+                self._update_translations(translation_data, metrics)
+            metrics.report()
+            return
         if translation_data['name'] != self.model.__name__:
             raise ValidationError(
                 _('Uploaded XLIFF is for different model: "{}"!').format(
                     translation_data['name']
                 )
             )
-        language = self._get_language_code(
-            translation_data['language']
-        ).replace('-', '_')
-        object_pks = (int(obj['id']) for obj in translation_data['objects'])
-        queryset = self.model.objects.filter(pk__in=object_pks)
-        fields = [f['name'] + '_' + language
-                  for f in translation_data['objects'][0]['fields']]
-        for item, obj in zip(queryset, translation_data['objects']):
-            for i, field in enumerate(obj['fields']):
-                setattr(item, fields[i], field['value'])
-                item.save(update_fields=fields)
+        language = self._get_language_code(translation_data['language'])
+        plan = get_translation_plan(self.model)
+        pk_field = self.model._meta.pk
+        with transaction.atomic():
+            for batch in chunked(translation_data['objects'],
+                                 IMPORT_BATCH_SIZE):
+                start = time.perf_counter()
+                items = self.model.objects.in_bulk(
+                    [pk_field.to_python(obj['id']) for obj in batch]
+                )
+                fetched = time.perf_counter()
+                changed_items = []
+                fields = []
+                for obj in batch:
+                    item = items.get(pk_field.to_python(obj['id']))
+                    if item is None:
+                        # The object has been deleted after export
+                        continue
+                    for field in obj['fields']:
+                        try:
+                            field_name = plan[field['name']][language]
+                        except KeyError:
+                            raise ValidationError(
+                                _('Unknown translatable field: "{}"!').format(
+                                    field['name']
+                                )
+                            )
+                        setattr(item, field_name, field['value'])
+                        if field_name not in fields:
+                            fields.append(field_name)
+                    changed_items.append(item)
+                if changed_items:
+                    bulk_update(self.model, changed_items, fields)
+                metrics.add_time('fetch_objects', fetched - start)
+                metrics.add_time('update_objects', time.perf_counter() - fetched)
+                metrics.count('updated_objects', len(changed_items))
+
+    def _get_xliff_response(self, translation_data, target_languages=None,
+                            on_complete=None):
+        # type: (typing.Union[dict, list], typing.Optional[list], typing.Optional[typing.Callable]) -> HttpResponseBase
+        """
+        Create a response with a XLIFF file
+
+        If ``XLIFF_EXCHANGE_STREAMING_EXPORT`` setting is ``True``,
+        the XLIFF file is sent with :class:`StreamingHttpResponse`.
+        The file is compressed according to
+        ``XLIFF_EXCHANGE_EXPORT_COMPRESSION`` setting.
+
+        :param translation_data: translation data for Django model objects
+            or a list of translation data for several models
+        :param target_languages: if set, a ZIP archive with a XLIFF file
+            for each target language is sent
+        :param on_complete: optional callable without arguments that is called
+            after the XLIFF file has been created, or after it has been sent
+            completely if the response is streamed
+        :return: response containing a XLIFF file with content to translate
+        """
+        name = self.model.__name__.lower()
+        if target_languages:
+            compression = ZIP
+            chunks = iter_xliff_archive(translation_data, target_languages, name)
+        else:
+            compression = EXPORT_COMPRESSION
+            chunks = compress(iter_xliff(translation_data), compression, name)
+        if STREAMING_EXPORT:
+            if on_complete is not None:
+                chunks = _CompletionCallbackIterator(chunks, on_complete)
+            response = StreamingHttpResponse(chunks)
+        else:
+            response = HttpResponse(b''.join(chunks))
+            if on_complete is not None:
+                on_complete()
+        response['Content-Type'] = get_content_type(compression)
+        response['Content-Disposition'] = 'attachment; filename="{}{}"'.format(
+            name, get_file_extension(compression)
+        )
+        return response
+
+    def _get_job_redirect(self, job):
+        # type: (Model) -> HttpResponseRedirect
+        """
+        Redirect to the status page of a background job
+
+        :param job: :class:`modeltranslation_xliff.models.XliffJob` instance
+        :return: redirect response
+        """
+        opts = self.model._meta
+        return HttpResponseRedirect(reverse(
+            'admin:{}_{}_xliff_job'.format(opts.app_label, opts.model_name),
+            args=(job.pk,),
+            current_app=self.admin_site.name
+        ))
+
+    def get_xliff_querysets(self, request, queryset):
+        # type: (HttpRequest, QuerySet) -> list
+        """
+        Get querysets to export with XLIFF export actions
+
+        Override this method to export content of related models, e.g. page
+        blocks or SEO metadata, together with selected objects. Each queryset
+        is exported to a separate ``<file>`` element of the same XLIFF file.
+        Related models must be registered in the same admin site
+        with :class:`XliffExchangeMixin` to import their translations.
+
+        :param request: request instance.
+        :param queryset: a queryset for selected model objects.
+        :return: the list of querysets to export
+        """
+        return [queryset]
 
     def export_xliff(self, request, queryset):
-        # type: (HttpRequest, QuerySet) -> HttpResponse
+        # type: (HttpRequest, QuerySet) -> HttpResponseBase
         """
         Export XLIFF view
 
         :param request: request instance.
         :param queryset: a queryset for model objects to translate.
         :return: response containing a XLIFF file with content to translate
+            or a redirect to the background job status page
         """
-        response = HttpResponse(
-            create_xliff(self._get_model_trans_source(queryset)).encode('utf-8')
-        )
-        response['Content-Type'] = 'application/x-xliff-xml'
-        response['Content-Disposition'] = \
-            'attachment; filename="{}.xlf"'.format(self.model.__name__.lower())
-        return response
+        querysets = self.get_xliff_querysets(request, queryset)
+        if BACKGROUND_JOBS:
+            from .jobs import enqueue_export
+            return self._get_job_redirect(enqueue_export(self, querysets))
+        return self._get_xliff_response([
+            self._get_model_trans_source(qs, lazy=STREAMING_EXPORT)
+            for qs in querysets
+        ])
 
     export_xliff.short_description = _('Export to XLIFF')
 
+    def get_xliff_target_languages(self, request):
+        # type: (HttpRequest) -> list
+        """
+        Get target languages for multi-language XLIFF export
+
+        :param request: request instance.
+        :return: the list of target language codes
+            (default: ``XLIFF_EXCHANGE_EXPORT_TARGET_LANGUAGES`` setting
+            or all available languages except the default one)
+        """
+        if EXPORT_TARGET_LANGUAGES is not None:
+            return list(EXPORT_TARGET_LANGUAGES)
+        return [lang for lang in AVAILABLE_LANGUAGES if lang != DEFAULT_LANGUAGE]
+
+    def export_xliff_languages(self, request, queryset):
+        # type: (HttpRequest, QuerySet) -> HttpResponseBase
+        """
+        Export XLIFF files for all target languages in a ZIP archive
+
+        Content is parsed and segmented once for all target languages.
+
+        :param request: request instance.
+        :param queryset: a queryset for model objects to translate.
+        :return: response containing a ZIP archive with XLIFF files
+            or a redirect to the background job status page
+        """
+        querysets = self.get_xliff_querysets(request, queryset)
+        target_languages = self.get_xliff_target_languages(request)
+        if BACKGROUND_JOBS:
+            from .jobs import enqueue_export
+            return self._get_job_redirect(enqueue_export(
+                self, querysets, target_languages=target_languages
+            ))
+        return self._get_xliff_response([
+            self._get_model_trans_source(qs, lazy=STREAMING_EXPORT)
+            for qs in querysets
+        ], target_languages)
+
+    export_xliff_languages.short_description = \
+        _('Export to XLIFF for all languages')
+
+    def export_xliff_changes(self, request, queryset):
+        # type: (HttpRequest, QuerySet) -> HttpResponseBase
+        """
+        Export XLIFF view for content changed since its last export
+
+        Only objects and fields whose content in the default language
+        has changed since the previous export with this action are included.
+
+        :param request: request instance.
+        :param queryset: a queryset for model objects to translate.
+        :return: response containing a XLIFF file with content to translate
+            or a redirect to the background job status page
+        """
+        querysets = self.get_xliff_querysets(request, queryset)
+        if BACKGROUND_JOBS:
+            from .jobs import enqueue_export
+            return self._get_job_redirect(
+                enqueue_export(self, querysets, changed_only=True)
+            )
+        # Models cannot be imported before Django apps are loaded
+        from .delta import filter_changed_objects, save_fingerprints
+        translation_data = []
+        fingerprints = []
+        for qs in querysets:
+            model_data = self._get_model_trans_source(qs, lazy=True)
+            model_data['objects'] = filter_changed_objects(
+                qs.model, model_data['objects'], fingerprints
+            )
+            translation_data.append(model_data)
+        return self._get_xliff_response(
+            translation_data, on_complete=partial(save_fingerprints, fingerprints)
+        )
+
+    export_xliff_changes.short_description = _('Export changed content to XLIFF')
+
     def get_urls(self):
         # type: () -> list
+        opts = self.model._meta
+        info = opts.app_label, opts.model_name
+        import_view = self.admin_site.admin_view(self.import_xliff)
         urls = [
-            url(r'import-xliff/$', self.import_xliff, name='import_xliff')
+            url(r'import-xliff/$', import_view,
+                name='{}_{}_import_xliff'.format(*info)),
+            # Deprecated name kept for compatibility. Translations are imported
+            # into all models in the uploaded file, so any model's URL works.
+            url(r'import-xliff/$', import_view, name='import_xliff'),
+            url(r'xliff-jobs/(?P<job_id>\d+)/$',
+                self.admin_site.admin_view(self.xliff_job_status),
+                name='{}_{}_xliff_job'.format(*info)),
+            url(r'xliff-jobs/(?P<job_id>\d+)/download/$',
+                self.admin_site.admin_view(self.xliff_job_download),
+                name='{}_{}_xliff_job_download'.format(*info)),
         ] + super().get_urls()
         return urls
 
+    def _get_job(self, job_id):
+        # type: (str) -> Model
+        from .models import XliffJob
+        try:
+            return XliffJob.objects.get(
+                pk=job_id, content_type__app_label=self.model._meta.app_label,
+                content_type__model=self.model._meta.model_name
+            )
+        except XliffJob.DoesNotExist:
+            raise Http404('XLIFF job not found.')
+
+    def xliff_job_status(self, request, job_id):
+        # type: (HttpRequest, str) -> HttpResponse
+        """
+        Background XLIFF job status view
+
+        :param request: request instance
+        :param job_id: job ID
+        :return: response with job status page
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        job = self._get_job(job_id)
+        context = dict(
+            self.admin_site.each_context(request),
+            title=_('XLIFF job #{}').format(job.pk),
+            opts=self.model._meta,
+            job=job,
+        )
+        return TemplateResponse(
+            request, 'modeltranslation_xliff/job_status.html', context
+        )
+
+    def xliff_job_download(self, request, job_id):
+        # type: (HttpRequest, str) -> HttpResponseBase
+        """
+        Download XLIFF file exported by a background job
+
+        :param request: request instance
+        :param job_id: job ID
+        :return: response containing a XLIFF file with content to translate
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        job = self._get_job(job_id)
+        if not job.result:
+            raise Http404('XLIFF file not found.')
+        compression = get_compression(job.result.name)
+        response = FileResponse(job.result.storage.open(job.result.name, 'rb'))
+        response['Content-Type'] = get_content_type(compression)
+        response['Content-Disposition'] = 'attachment; filename="{}{}"'.format(
+            self.model.__name__.lower(), get_file_extension(compression)
+        )
+        return response
+
     def import_xliff(self, request):
         # type: (HttpRequest) -> HttpResponse
         """
@@ -162,13 +593,18 @@ class XliffExchangeMixin:
         """
         if request.method != 'POST':
             return HttpResponseNotAllowed('POST')
+        if not self.has_change_permission(request):
+            raise PermissionDenied
         try:
             fo = request.FILES.get('_upload-xliff')
             if not fo:
                 raise ValidationError(_('No XLIFF file uploaded!'))
-            xliff = fo.read()
-            translation_data = import_xliff(xliff)
-            self._update_translations(translation_data)
+            if BACKGROUND_JOBS:
+                from .jobs import enqueue_import
+                return self._get_job_redirect(
+                    enqueue_import(self, fo, user=request.user)
+                )
+            languages = self._import_xliff_files(fo, request=request)
         except ValidationError as ex:
             self.message_user(request, ex.message, level=messages.ERROR)
         except Exception as ex:
@@ -182,7 +618,7 @@ class XliffExchangeMixin:
             self.message_user(
                 request,
                 _('Translation for "{}" was imported successfully.'.format(
-                    translation_data['language']
+                    ', '.join(languages)
                 ))
             )
         return HttpResponseRedirect('../')
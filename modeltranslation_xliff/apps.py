@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ModeltranslationXliffConfig(AppConfig):
     name = 'modeltranslation_xliff'
     verbose_name = 'XLIFF Export/Import'
+
+    def ready(self):
+        from .settings import PRELOAD_NLTK
+        if PRELOAD_NLTK:
+            from .utils import SEGMENTERS, _get_segmenter_name
+            # NLTK is used only by the "nltk" segmenter
+            if _get_segmenter_name() == SEGMENTERS['nltk']:
+                from .parsers.segmenter import load_tokenizer
+                load_tokenizer()
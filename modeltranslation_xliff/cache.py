@@ -0,0 +1,157 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Cache for processed blocks of translatable content
+
+Segmenting and tagging translatable blocks is the most CPU-intensive part
+of XLIFF export. Content often repeats (footers, disclaimers, meta
+descriptions), so processed blocks are cached by a hash of
+(content type, segmenter, language, block text).
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from django.core.cache import caches
+from .settings import BLOCK_CACHE_ALIAS, BLOCK_CACHE_SIZE
+
+__all__ = ['BlockCache', 'LRUBlockCache', 'DjangoBlockCache',
+           'make_key', 'get_block_cache']
+
+KEY_PREFIX = 'xliff-block'
+#: Increase if the format of cached values changes
+KEY_VERSION = 3
+
+
+def make_key(content_type, language, block, segmenter=''):
+    # type: (str, str, str, str) -> str
+    """
+    Create a cache key for a translatable block
+
+    :param content_type: content type
+    :param language: content language
+    :param block: translatable block
+    :param segmenter: the module path of the segmenter
+        or an empty string if segmentation is disabled
+    :return: cache key
+    """
+    digest = hashlib.sha1(
+        '\0'.join((content_type, segmenter, language, block)).encode('utf-8')
+    ).hexdigest()
+    return '{}:{}:{}'.format(KEY_PREFIX, KEY_VERSION, digest)
+
+
+class BlockCache:
+    """
+    Base class for processed block caches
+
+    Subclasses must implement :meth:`_get` and :meth:`_set` methods.
+    Hit and miss counters are updated under :attr:`_lock`.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        raise NotImplementedError
+
+    def get(self, key):
+        """
+        Get a cached value
+
+        :param key: cache key
+        :return: cached value or ``None``
+        """
+        value = self._get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """
+        Store a value in the cache
+
+        :param key: cache key
+        :param value: a value to store
+        """
+        self._set(key, value)
+
+    @property
+    def stats(self):
+        # type: () -> dict
+        """Cache hit and miss counters"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+class LRUBlockCache(BlockCache):
+    """
+    In-process bounded cache that discards least recently used items
+    """
+    def __init__(self, max_size):
+        super().__init__()
+        self.max_size = max_size
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def _set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+class DjangoBlockCache(BlockCache):
+    """
+    Cache that uses a Django cache backend
+    """
+    def __init__(self, alias):
+        super().__init__()
+        self._cache = caches[alias]
+
+    def _get(self, key):
+        return self._cache.get(key)
+
+    def _set(self, key, value):
+        self._cache.set(key, value)
+
+
+_block_cache = None
+_block_cache_lock = threading.Lock()
+
+
+def get_block_cache():
+    # type: () -> BlockCache
+    """
+    Get the processed block cache configured in Django settings
+
+    :return: cache instance or ``None`` if caching is disabled
+    """
+    global _block_cache
+    if not (BLOCK_CACHE_ALIAS or BLOCK_CACHE_SIZE):
+        return None
+    if _block_cache is None:
+        with _block_cache_lock:
+            if _block_cache is None:
+                if BLOCK_CACHE_ALIAS:
+                    _block_cache = DjangoBlockCache(BLOCK_CACHE_ALIAS)
+                else:
+                    _block_cache = LRUBlockCache(BLOCK_CACHE_SIZE)
+    return _block_cache
@@ -0,0 +1,225 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Compression of exported XLIFF files and decompression of uploaded files
+
+XLIFF files are highly redundant, so they are compressed incrementally
+as they are created, and compressed uploads are decompressed as a stream
+while they are parsed. ZIP archives are written in streaming mode
+with data descriptors, so they can be sent to a client before
+the archive size is known.
+"""
+import gzip
+import struct
+import time
+import types
+import typing
+import zipfile
+import zlib
+from django.core.exceptions import ValidationError
+from django.utils.translation import ugettext_lazy as _
+
+__all__ = ['GZIP', 'ZIP', 'get_file_extension', 'get_content_type',
+           'get_compression', 'iter_gzip', 'iter_zip', 'compress',
+           'iter_xliff_files']
+
+GZIP = 'gzip'
+ZIP = 'zip'
+EXTENSIONS = {None: '.xlf', GZIP: '.xlf.gz', ZIP: '.zip'}
+CONTENT_TYPES = {
+    None: 'application/x-xliff-xml',
+    GZIP: 'application/gzip',
+    ZIP: 'application/zip',
+}
+#: Compression level for exported files
+COMPRESSION_LEVEL = 6
+XLIFF_EXTENSIONS = ('.xlf', '.xliff')
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZIP_MAGIC = b'PK\x03\x04'
+_ZIP_VERSION = 20
+# Bit 3: sizes and CRC are written after file data, bit 11: UTF-8 file names
+_ZIP_FLAGS = 0x0808
+_ZIP_MAX_SIZE = 0xFFFFFFFF
+
+
+def _check_compression(compression):
+    # type: (typing.Optional[str]) -> None
+    if compression not in EXTENSIONS:
+        raise ValueError('Unknown compression: "{}"!'.format(compression))
+
+
+def get_file_extension(compression):
+    # type: (typing.Optional[str]) -> str
+    """
+    Get file name extension for exported files
+
+    :param compression: ``'gzip'``, ``'zip'`` or ``None``
+    :return: file extension with the leading dot
+    """
+    _check_compression(compression)
+    return EXTENSIONS[compression]
+
+
+def get_content_type(compression):
+    # type: (typing.Optional[str]) -> str
+    """
+    Get content type for exported files
+
+    :param compression: ``'gzip'``, ``'zip'`` or ``None``
+    :return: MIME type
+    """
+    _check_compression(compression)
+    return CONTENT_TYPES[compression]
+
+
+def get_compression(filename):
+    # type: (str) -> typing.Optional[str]
+    """
+    Get compression of an exported file by its name
+
+    :param filename: file name
+    :return: ``'gzip'``, ``'zip'`` or ``None``
+    """
+    for compression in (GZIP, ZIP):
+        if filename.endswith(EXTENSIONS[compression]):
+            return compression
+    return None
+
+
+def iter_gzip(chunks, level=COMPRESSION_LEVEL):
+    # type: (typing.Iterable[bytes], int) -> types.GeneratorType
+    """
+    Compress data to gzip format incrementally
+
+    :param chunks: an iterable of data chunks
+    :param level: compression level
+    :return: generator that yields compressed chunks
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _get_dos_datetime():
+    # type: () -> typing.Tuple[int, int]
+    now = time.localtime()
+    dos_time = now.tm_hour << 11 | now.tm_min << 5 | now.tm_sec // 2
+    dos_date = (now.tm_year - 1980) << 9 | now.tm_mon << 5 | now.tm_mday
+    return dos_time, dos_date
+
+
+def iter_zip(members, level=COMPRESSION_LEVEL):
+    # type: (typing.Iterable[typing.Tuple[str, typing.Iterable[bytes]]], int) -> types.GeneratorType
+    """
+    Create a ZIP archive incrementally
+
+    Archive members larger than 4 GiB are not supported.
+
+    :param members: an iterable of (file name, an iterable of data chunks)
+        tuples
+    :param level: compression level
+    :return: generator that yields ZIP archive contents
+    :raises ValueError: if an archive member or the archive is too large
+    """
+    dos_time, dos_date = _get_dos_datetime()
+    offset = 0
+    central_directory = []
+    for name, chunks in members:
+        name = name.encode('utf-8')
+        header = struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, _ZIP_VERSION, _ZIP_FLAGS,
+            zipfile.ZIP_DEFLATED, dos_time, dos_date, 0, 0, 0, len(name), 0
+        ) + name
+        yield header
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        crc = size = compressed_size = 0
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            data = compressor.compress(chunk)
+            if data:
+                compressed_size += len(data)
+                yield data
+        data = compressor.flush()
+        compressed_size += len(data)
+        yield data
+        if size > _ZIP_MAX_SIZE:
+            raise ValueError('ZIP archive members larger than 4 GiB '
+                             'are not supported!')
+        descriptor = struct.pack('<IIII', 0x08074b50, crc, compressed_size,
+                                 size)
+        yield descriptor
+        central_directory.append(struct.pack(
+            '<IHHHHHHIIIHHHHHII', 0x02014b50, _ZIP_VERSION, _ZIP_VERSION,
+            _ZIP_FLAGS, zipfile.ZIP_DEFLATED, dos_time, dos_date, crc,
+            compressed_size, size, len(name), 0, 0, 0, 0, 0, offset
+        ) + name)
+        offset += len(header) + compressed_size + len(descriptor)
+    if offset > _ZIP_MAX_SIZE:
+        raise ValueError('ZIP archives larger than 4 GiB are not supported!')
+    directory = b''.join(central_directory)
+    yield directory
+    yield struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, len(central_directory),
+                      len(central_directory), len(directory), offset, 0)
+
+
+def compress(chunks, compression, name):
+    # type: (typing.Iterable[bytes], typing.Optional[str], str) -> typing.Iterable[bytes]
+    """
+    Compress exported XLIFF file incrementally
+
+    :param chunks: an iterable of XLIFF file chunks
+    :param compression: ``'gzip'``, ``'zip'`` or ``None``
+    :param name: XLIFF file name without extension used for a ZIP
+        archive member
+    :return: an iterable of compressed chunks
+    """
+    _check_compression(compression)
+    if compression == GZIP:
+        return iter_gzip(chunks)
+    if compression == ZIP:
+        return iter_zip(((name + EXTENSIONS[None], chunks),))
+    return chunks
+
+
+def iter_xliff_files(fo):
+    # type: (typing.BinaryIO) -> types.GeneratorType
+    """
+    Get XLIFF files from an uploaded file that may be compressed
+
+    The compression format is detected by the file contents.
+    Gzip files and ZIP archive members are decompressed as a stream
+    while they are read. All XLIFF files from a ZIP archive are provided
+    in the order of file names.
+
+    :param fo: uploaded file as a seekable binary file object
+    :return: generator that yields XLIFF files as binary file objects
+    :raises django.core.exceptions.ValidationError: if a ZIP archive
+        is invalid or has no XLIFF files
+    """
+    magic = fo.read(4)
+    fo.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+        with gzip.GzipFile(fileobj=fo, mode='rb') as gzip_file:
+            yield gzip_file
+    elif magic == ZIP_MAGIC:
+        try:
+            archive = zipfile.ZipFile(fo)
+        except zipfile.BadZipFile:
+            raise ValidationError(_('Invalid ZIP archive!'))
+        with archive:
+            names = sorted(
+                name for name in archive.namelist()
+                if name.lower().endswith(XLIFF_EXTENSIONS)
+            )
+            if not names:
+                raise ValidationError(_('The ZIP archive has no XLIFF files!'))
+            for name in names:
+                with archive.open(name) as member:
+                    yield member
+    else:
+        yield fo
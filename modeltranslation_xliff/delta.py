@@ -0,0 +1,105 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Delta export of translatable content changed since its last export
+
+Fingerprints of translatable fields in the default language are stored
+in the database after changed content has been exported, so the next export
+includes only objects and fields whose content has changed.
+"""
+import hashlib
+import types
+import typing
+from collections import OrderedDict
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Model
+from django.utils import timezone
+from .models import ExportFingerprint
+from .utils import chunked, bulk_update
+
+__all__ = ['get_fingerprint', 'filter_changed_objects', 'save_fingerprints']
+
+BATCH_SIZE = 500
+
+
+def get_fingerprint(value):
+    # type: (typing.Optional[str]) -> str
+    """
+    Get a fingerprint of a translatable field value
+
+    :param value: field value
+    :return: SHA1 hex digest of the value
+    """
+    return hashlib.sha1((value or '').encode('utf-8')).hexdigest()
+
+
+def save_fingerprints(fingerprints):
+    # type: (list) -> None
+    """
+    Save fingerprints of exported fields
+
+    Call this function only after the XLIFF file has been successfully
+    created, so that content is exported again if the export fails.
+
+    :param fingerprints: the list of fingerprints collected
+        by :func:`filter_changed_objects`
+    """
+    now = timezone.now()
+    new_records = []
+    changed_records = []
+    for content_type, object_id, field, fingerprint, record in fingerprints:
+        if record is None:
+            new_records.append(ExportFingerprint(
+                content_type=content_type,
+                object_id=object_id,
+                field=field,
+                fingerprint=fingerprint,
+                exported=now
+            ))
+        else:
+            record.fingerprint = fingerprint
+            record.exported = now
+            changed_records.append(record)
+    with transaction.atomic():
+        ExportFingerprint.objects.bulk_create(new_records, batch_size=BATCH_SIZE)
+        bulk_update(ExportFingerprint, changed_records,
+                    ['fingerprint', 'exported'], batch_size=BATCH_SIZE)
+
+
+def filter_changed_objects(model, objects, fingerprints):
+    # type: (typing.Type[Model], typing.Iterable[dict], list) -> types.GeneratorType
+    """
+    Filter translatable content changed since its last export
+
+    Objects are checked in batches and yielded with changed fields only.
+    New fingerprints are appended to ``fingerprints`` list and must be saved
+    with :func:`save_fingerprints` after the export has succeeded.
+
+    :param model: Django model class
+    :param objects: translatable content of model objects
+    :param fingerprints: the list that receives fingerprints of changed fields
+    :return: generator that yields changed translatable content
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    for batch in chunked(objects, BATCH_SIZE):
+        records = {
+            (record.object_id, record.field): record
+            for record in ExportFingerprint.objects.filter(
+                content_type=content_type,
+                object_id__in=[obj['id'] for obj in batch]
+            )
+        }
+        for obj in batch:
+            changed_fields = []
+            for field in obj['fields']:
+                fingerprint = get_fingerprint(field['value'])
+                record = records.get((obj['id'], field['name']))
+                if record is None or record.fingerprint != fingerprint:
+                    changed_fields.append(field)
+                    fingerprints.append((content_type, obj['id'],
+                                         field['name'], fingerprint, record))
+            if changed_fields:
+                changed_obj = OrderedDict(obj)
+                changed_obj['fields'] = changed_fields
+                yield changed_obj
@@ -0,0 +1,326 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Background XLIFF export and import jobs
+
+Jobs are stored in the database and are processed either by a worker thread
+in the web server process or by ``manage.py xliff_worker`` command,
+depending on ``XLIFF_EXCHANGE_JOB_WORKER`` setting. Exported XLIFF files
+and uploaded files for import are saved with Django storage API.
+"""
+import logging
+import pickle
+import threading
+import types
+import typing
+from datetime import timedelta
+from functools import partial
+from tempfile import TemporaryFile
+from django.contrib import admin
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.files import File
+from django.core.files.uploadedfile import UploadedFile
+from django.db import connection, transaction
+from django.db.models import Model, QuerySet
+from django.http.request import HttpRequest
+from django.utils import timezone
+from django.utils.translation import ugettext as _
+from .admin import XliffExchangeMixin
+from .compression import ZIP, compress, get_file_extension
+from .models import XliffJob
+from .settings import JOB_WORKER, JOB_TIMEOUT, EXPORT_COMPRESSION
+from .utils import iter_xliff, iter_xliff_archive
+
+__all__ = ['enqueue_export', 'enqueue_import', 'run_job', 'run_pending_jobs',
+           'start_worker']
+
+#: The number of processed objects between progress updates
+PROGRESS_INTERVAL = 100
+
+_worker_thread = None
+_worker_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+def get_model_admin(model):
+    # type: (typing.Type[Model]) -> XliffExchangeMixin
+    """
+    Find XLIFF exchange model admin registered for a model
+
+    :param model: Django model class
+    :return: model admin instance
+    :raises django.core.exceptions.ImproperlyConfigured: if the model
+        has no registered XLIFF exchange admin
+    """
+    try:
+        from django.contrib.admin.sites import all_sites
+    except ImportError:  # Django < 2.1
+        all_sites = (admin.site,)
+    for site in all_sites:
+        model_admin = site._registry.get(model)
+        if isinstance(model_admin, XliffExchangeMixin):
+            return model_admin
+    raise ImproperlyConfigured(
+        'Model "{}" has no XLIFF exchange admin!'.format(model.__name__)
+    )
+
+
+def enqueue_export(model_admin, querysets, changed_only=False,
+                   target_languages=None):
+    # type: (XliffExchangeMixin, typing.List[QuerySet], bool, typing.Optional[list]) -> XliffJob
+    """
+    Create a background export job
+
+    :param model_admin: model admin instance
+    :param querysets: querysets for model objects to translate.
+        Each queryset is exported to a separate ``<file>`` element.
+    :param changed_only: export only content changed since its last export
+    :param target_languages: if set, XLIFF files for each target language
+        are exported to a ZIP archive
+    :return: job instance
+    """
+    job = XliffJob.objects.create(
+        kind=XliffJob.EXPORT,
+        content_type=ContentType.objects.get_for_model(model_admin.model),
+        query=pickle.dumps([qs.query for qs in querysets]),
+        changed_only=changed_only,
+        target_languages=','.join(target_languages or ()),
+        total=sum(qs.count() for qs in querysets)
+    )
+    _notify_worker()
+    return job
+
+
+def enqueue_import(model_admin, fo, user=None):
+    # type: (XliffExchangeMixin, UploadedFile, typing.Optional[Model]) -> XliffJob
+    """
+    Create a background import job
+
+    :param model_admin: model admin instance
+    :param fo: uploaded XLIFF file
+    :param user: optional user who has uploaded the file. If set,
+        translations are imported only if the user has the change permission
+        for all models in the file.
+    :return: job instance
+    """
+    job = XliffJob(
+        kind=XliffJob.IMPORT,
+        content_type=ContentType.objects.get_for_model(model_admin.model),
+        user=user
+    )
+    job.source.save(fo.name, fo, save=False)
+    job.save()
+    _notify_worker()
+    return job
+
+
+def _track_progress(job, objects):
+    # type: (XliffJob, typing.Iterable) -> types.GeneratorType
+    """
+    Update job progress while objects are consumed
+
+    :param job: job instance
+    :param objects: processed objects
+    :return: generator that yields objects
+    """
+    processed = job.processed
+    for processed, obj in enumerate(objects, processed + 1):
+        yield obj
+        if not processed % PROGRESS_INTERVAL:
+            XliffJob.objects.filter(pk=job.pk).update(processed=processed)
+    job.processed = processed
+
+
+def _run_export(job, model_admin):
+    # type: (XliffJob, XliffExchangeMixin) -> None
+    translation_data = []
+    fingerprints = []
+    for query in pickle.loads(job.query):
+        queryset = query.model._default_manager.all()
+        queryset.query = query
+        model_data = model_admin._get_model_trans_source(queryset, lazy=True)
+        model_data['objects'] = _track_progress(job, model_data['objects'])
+        if job.changed_only:
+            from .delta import filter_changed_objects
+            model_data['objects'] = filter_changed_objects(
+                query.model, model_data['objects'], fingerprints
+            )
+        translation_data.append(model_data)
+    name = model_admin.model.__name__.lower()
+    if job.target_languages:
+        compression = ZIP
+        chunks = iter_xliff_archive(translation_data,
+                                    job.target_languages.split(','), name)
+    else:
+        compression = EXPORT_COMPRESSION
+        chunks = compress(iter_xliff(translation_data), compression, name)
+    with TemporaryFile() as fo:
+        for chunk in chunks:
+            fo.write(chunk)
+        fo.seek(0)
+        job.result.save(name + get_file_extension(compression), File(fo),
+                        save=False)
+    if fingerprints:
+        from .delta import save_fingerprints
+        save_fingerprints(fingerprints)
+
+
+def _run_import(job, model_admin):
+    # type: (XliffJob, XliffExchangeMixin) -> None
+    request = None
+    if job.user is not None:
+        # Permissions are checked for the user who has uploaded the file
+        request = HttpRequest()
+        request.user = job.user
+    with job.source.storage.open(job.source.name, 'rb') as fo:
+        languages = model_admin._import_xliff_files(
+            fo, track_progress=partial(_track_progress, job), request=request
+        )
+    job.message = _('Translation for "{}" was imported successfully.').format(
+        ', '.join(languages)
+    )
+
+
+def run_job(job):
+    # type: (XliffJob) -> None
+    """
+    Run a job and save its result
+
+    :param job: job instance
+    """
+    try:
+        model_admin = get_model_admin(job.content_type.model_class())
+        if job.kind == XliffJob.EXPORT:
+            _run_export(job, model_admin)
+        else:
+            _run_import(job, model_admin)
+    except ValidationError as ex:
+        job.status = XliffJob.FAILED
+        job.message = ex.message
+    except Exception as ex:
+        logging.exception('Error while running XLIFF job #%s!', job.pk)
+        job.status = XliffJob.FAILED
+        job.message = _('Unexpected error: {}').format(str(ex))
+    else:
+        job.status = XliffJob.DONE
+    job.finished = timezone.now()
+    job.save()
+
+
+def _claim_job():
+    # type: () -> typing.Optional[XliffJob]
+    """
+    Get the next pending job and mark it as running
+
+    The job status is changed with a conditional update, so each job
+    is claimed only by one worker.
+
+    :return: job instance or ``None`` if there are no pending jobs
+    """
+    for job in XliffJob.objects.filter(status=XliffJob.PENDING)[:10]:
+        started = timezone.now()
+        if XliffJob.objects.filter(pk=job.pk, status=XliffJob.PENDING).update(
+                status=XliffJob.RUNNING, started=started):
+            job.status = XliffJob.RUNNING
+            job.started = started
+            return job
+    return None
+
+
+def fail_stale_jobs():
+    # type: () -> int
+    """
+    Mark running jobs that have been interrupted as failed
+
+    A job is considered interrupted if it has been started more than
+    ``XLIFF_EXCHANGE_JOB_TIMEOUT`` seconds ago, e.g. if the worker
+    has been stopped by a server restart.
+
+    :return: the number of failed jobs
+    """
+    now = timezone.now()
+    return XliffJob.objects.filter(
+        status=XliffJob.RUNNING,
+        started__lt=now - timedelta(seconds=JOB_TIMEOUT)
+    ).update(status=XliffJob.FAILED, finished=now,
+             message=_('The job has been interrupted.'))
+
+
+def delete_finished_jobs(days):
+    # type: (float) -> int
+    """
+    Delete finished jobs with their source and result files
+
+    :param days: delete jobs finished more than this number of days ago
+    :return: the number of deleted jobs
+    """
+    count = 0
+    for job in XliffJob.objects.filter(
+            status__in=(XliffJob.DONE, XliffJob.FAILED),
+            finished__lt=timezone.now() - timedelta(days=days)
+    ).defer('query').iterator():
+        for field_file in (job.source, job.result):
+            if field_file:
+                field_file.delete(save=False)
+        job.delete()
+        count += 1
+    return count
+
+
+def run_pending_jobs():
+    # type: () -> int
+    """
+    Run all pending jobs
+
+    :return: the number of processed jobs
+    """
+    count = 0
+    job = _claim_job()
+    while job is not None:
+        run_job(job)
+        count += 1
+        job = _claim_job()
+    return count
+
+
+def _worker_main():
+    global _worker_thread
+    try:
+        fail_stale_jobs()
+        while True:
+            _wakeup.clear()
+            run_pending_jobs()
+            with _worker_lock:
+                if not _wakeup.is_set():
+                    _worker_thread = None
+                    return
+    finally:
+        connection.close()
+
+
+def start_worker():
+    # type: () -> None
+    """
+    Start a worker thread that runs pending jobs
+
+    If the worker thread is already running, it checks for pending jobs
+    again after finishing the current ones.
+    """
+    global _worker_thread
+    with _worker_lock:
+        _wakeup.set()
+        if _worker_thread is None or not _worker_thread.is_alive():
+            _worker_thread = threading.Thread(
+                target=_worker_main, name='xliff-worker', daemon=True
+            )
+            _worker_thread.start()
+
+
+def _notify_worker():
+    # type: () -> None
+    """
+    Start the worker thread after the current transaction is committed
+    """
+    if JOB_WORKER == 'thread':
+        transaction.on_commit(start_worker)
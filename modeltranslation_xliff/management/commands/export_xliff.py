@@ -0,0 +1,149 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+import os
+import time
+from django.apps import apps
+from django.core.exceptions import FieldError, ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from modeltranslation_xliff.compression import GZIP, ZIP
+from modeltranslation_xliff.settings import EXPORT_COMPRESSION
+
+
+class Command(BaseCommand):
+    help = 'Export translatable content of models to XLIFF files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models', nargs='+', metavar='model',
+            help='Model label in "app_label.ModelName" format. Several models '
+                 'are exported to one XLIFF file with several <file> elements.'
+        )
+        parser.add_argument(
+            '-f', '--filter', action='append', default=[], metavar='LOOKUP=VALUE',
+            help='Queryset filter, e.g. "pk__gte=100" or "pk__in=1,2,3", '
+                 'applied to all models. Can be used several times.'
+        )
+        parser.add_argument(
+            '-c', '--chunk-size', type=int, default=0,
+            help='Split export of each model into files with the given number '
+                 'of objects (default: 0, export to a single file)'
+        )
+        parser.add_argument(
+            '-o', '--output', default='.',
+            help='Output file path or directory (default: current directory)'
+        )
+        parser.add_argument(
+            '--compression', choices=(GZIP, ZIP), default=EXPORT_COMPRESSION,
+            help='Compress exported files (default: '
+                 'XLIFF_EXCHANGE_EXPORT_COMPRESSION setting)'
+        )
+        parser.add_argument(
+            '-t', '--target-language', action='append', default=[],
+            dest='target_languages', metavar='LANGUAGE',
+            help='Export a XLIFF file for each target language to a ZIP '
+                 'archive. Content is segmented only once for all languages. '
+                 'Can be used several times.'
+        )
+        parser.add_argument(
+            '--changed-only', action='store_true',
+            help='Export only content changed since its last export '
+                 'with this option'
+        )
+
+    @staticmethod
+    def _parse_filters(filters):
+        lookups = {}
+        for item in filters:
+            lookup, sep, value = item.partition('=')
+            if not (lookup and sep):
+                raise CommandError('Invalid filter: "{}"!'.format(item))
+            if lookup.endswith('__in'):
+                value = value.split(',')
+            lookups[lookup] = value
+        return lookups
+
+    def handle(self, *args, **options):
+        from modeltranslation_xliff.jobs import get_model_admin
+        from modeltranslation_xliff.compression import compress, \
+            get_file_extension
+        from modeltranslation_xliff.utils import chunked, iter_xliff, \
+            iter_xliff_archive
+        lookups = self._parse_filters(options['filter'])
+        translation_data = []
+        fingerprints = []
+        for label in options['models']:
+            try:
+                model = apps.get_model(label)
+                model_admin = get_model_admin(model)
+                queryset = model._default_manager.filter(
+                    **lookups
+                ).order_by('pk')
+            except (LookupError, ValueError, ImproperlyConfigured,
+                    FieldError) as ex:
+                raise CommandError(str(ex))
+            model_data = model_admin._get_model_trans_source(
+                queryset, lazy=True
+            )
+            if options['changed_only']:
+                from modeltranslation_xliff.delta import filter_changed_objects
+                model_data['objects'] = filter_changed_objects(
+                    model, model_data['objects'], fingerprints
+                )
+            translation_data.append(model_data)
+        output = options['output']
+        chunk_size = options['chunk_size']
+        target_languages = options['target_languages']
+        compression = ZIP if target_languages else options['compression']
+        extension = get_file_extension(compression)
+        if chunk_size > 0:
+            # Each model is split into separate files
+            os.makedirs(output, exist_ok=True)
+            exports = (
+                (os.path.join(output, '{}-{:04d}{}'.format(
+                    model_data['name'].lower(), i, extension)),
+                 dict(model_data, objects=objects))
+                for model_data in translation_data
+                for i, objects in enumerate(
+                    chunked(model_data['objects'], chunk_size), 1)
+            )
+        else:
+            # All models are exported to a single file
+            path = output
+            if os.path.isdir(output):
+                path = os.path.join(output, '-'.join(
+                    model_data['name'].lower() for model_data in translation_data
+                ) + extension)
+            exports = ((path, translation_data),)
+        total = {'objects': 0, 'segments': 0}
+        start = time.time()
+        for path, export_data in exports:
+            stats = {}
+            name = os.path.basename(path)
+            if name.endswith(extension):
+                name = name[:-len(extension)]
+            if target_languages:
+                chunks = iter_xliff_archive(export_data, target_languages,
+                                            name, stats=stats)
+            else:
+                chunks = compress(iter_xliff(export_data, stats=stats),
+                                  compression, name)
+            with open(path, 'wb') as fo:
+                for data in chunks:
+                    fo.write(data)
+            total['objects'] += stats['objects']
+            total['segments'] += stats['segments']
+            self.stdout.write('{}: {} objects, {} segments'.format(
+                path, stats['objects'], stats['segments']
+            ))
+        if fingerprints:
+            # Changed content is marked as exported only if all files are saved
+            from modeltranslation_xliff.delta import save_fingerprints
+            save_fingerprints(fingerprints)
+        elapsed = max(time.time() - start, 1e-6)
+        self.stdout.write(
+            'Exported {} objects, {} segments in {:.2f}s '
+            '({:.1f} objects/s, {:.1f} segments/s).'.format(
+                total['objects'], total['segments'], elapsed,
+                total['objects'] / elapsed, total['segments'] / elapsed
+            )
+        )
@@ -0,0 +1,74 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+import glob
+import time
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Import translations of a model from translated XLIFF files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'model',
+            help='Model label in "app_label.ModelName" format. Translations '
+                 'for other models in the same XLIFF files are imported '
+                 'with their admins from the same admin site.'
+        )
+        parser.add_argument(
+            'files', nargs='+',
+            help='Translated XLIFF files, gzip-compressed XLIFF files '
+                 'or ZIP archives with XLIFF files, or glob patterns, '
+                 'e.g. "exports/*.xlf"'
+        )
+
+    @staticmethod
+    def _expand_paths(patterns):
+        paths = []
+        for pattern in patterns:
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise CommandError('No files match "{}"!'.format(pattern))
+            paths.extend(path for path in matches if path not in paths)
+        return paths
+
+    def handle(self, *args, **options):
+        from modeltranslation_xliff.jobs import get_model_admin
+        try:
+            model = apps.get_model(options['model'])
+            model_admin = get_model_admin(model)
+        except (LookupError, ValueError, ImproperlyConfigured) as ex:
+            raise CommandError(str(ex))
+        total = {'objects': 0, 'segments': 0}
+        failed = 0
+        start = time.time()
+        for path in self._expand_paths(options['files']):
+            stats = {}
+            try:
+                with open(path, 'rb') as fo:
+                    languages = model_admin._import_xliff_files(fo, stats)
+            except ValidationError as ex:
+                failed += 1
+                self.stderr.write('{}: {}'.format(path, ex.message))
+                continue
+            except Exception as ex:
+                failed += 1
+                self.stderr.write('{}: unexpected error: {}'.format(path, ex))
+                continue
+            total['objects'] += stats['objects']
+            total['segments'] += stats['segments']
+            self.stdout.write('{}: {} objects, {} segments ({})'.format(
+                path, stats['objects'], stats['segments'], ', '.join(languages)
+            ))
+        elapsed = max(time.time() - start, 1e-6)
+        self.stdout.write(
+            'Imported {} objects, {} segments in {:.2f}s '
+            '({:.1f} objects/s, {:.1f} segments/s).'.format(
+                total['objects'], total['segments'], elapsed,
+                total['objects'] / elapsed, total['segments'] / elapsed
+            )
+        )
+        if failed:
+            raise CommandError('{} file(s) failed to import!'.format(failed))
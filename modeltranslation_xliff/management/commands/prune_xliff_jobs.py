@@ -0,0 +1,22 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Delete finished background XLIFF jobs with their uploaded '
+            'and exported files')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=7,
+            help='Delete jobs finished more than this number of days ago '
+                 '(default: 7)'
+        )
+
+    def handle(self, *args, **options):
+        from modeltranslation_xliff.jobs import delete_finished_jobs
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative!')
+        count = delete_finished_jobs(options['days'])
+        self.stdout.write('Deleted {} XLIFF job(s).'.format(count))
@@ -0,0 +1,26 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Delete XLIFF skeletons stored for exports with external '
+            'skeletons that are older than the given number of days')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help='Delete skeletons created more than this number '
+                 'of days ago (default: 30). Translated files exported '
+                 'with deleted skeletons cannot be imported.'
+        )
+
+    def handle(self, *args, **options):
+        from modeltranslation_xliff.models import XliffSkeleton
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative!')
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        count = XliffSkeleton.objects.filter(created__lt=cutoff).delete()[0]
+        self.stdout.write('Deleted {} XLIFF skeleton(s).'.format(count))
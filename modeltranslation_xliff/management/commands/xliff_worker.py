@@ -0,0 +1,33 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+import time
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Run background XLIFF export and import jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run pending jobs and exit'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Seconds between checks for new jobs (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        from modeltranslation_xliff.jobs import fail_stale_jobs, \
+            run_pending_jobs
+        count = fail_stale_jobs()
+        if count:
+            self.stdout.write('Marked {} interrupted XLIFF job(s) '
+                              'as failed.'.format(count))
+        while True:
+            count = run_pending_jobs()
+            if count:
+                self.stdout.write('Processed {} XLIFF job(s).'.format(count))
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,197 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Instrumentation of XLIFF export and import
+
+Each export or import collects the time spent in its phases,
+e.g. fetching objects from the database, parsing content or building
+XML, and counters of processed objects, fields, blocks, segments, bytes
+and database queries. When the operation is finished, the metrics are sent
+with :data:`modeltranslation_xliff.signals.metrics_collected` signal
+and to ``XLIFF_EXCHANGE_METRICS_CALLBACK``, and slow operations
+are logged.
+
+Export phases are ``fetch`` (reading objects from the database),
+``parse_content``, ``segment_text``, ``add_xliff_tags``, ``build_xml``
+(creating XLIFF elements), ``store_skeleton`` (saving external skeletons)
+and ``serialize`` (writing XML). Import phases are ``parse``
+(parsing the XLIFF file), ``fetch_objects`` and ``update_objects``.
+"""
+import json
+import logging
+import time
+import types
+import typing
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from django.db import connections
+from django.utils.module_loading import import_string
+from .settings import METRICS_CALLBACK, SLOW_LOG_THRESHOLD
+from .signals import metrics_collected
+
+__all__ = ['Metrics']
+
+
+class Metrics:
+    """
+    Timings and counters of an XLIFF export or import
+
+    :param operation: operation name, e.g. ``'export'`` or ``'import'``
+    """
+    def __init__(self, operation):
+        # type: (str) -> None
+        self.operation = operation
+        #: Phase name -> seconds
+        self.timings = OrderedDict()
+        #: Counter name -> value
+        self.counters = OrderedDict()
+        self._started = time.perf_counter()
+        self._elapsed = None
+
+    def add_time(self, phase, seconds):
+        # type: (str, float) -> None
+        """
+        Add time spent in a phase
+
+        :param phase: phase name
+        :param seconds: time in seconds
+        """
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def count(self, name, value=1):
+        # type: (str, int) -> None
+        """
+        Increment a counter
+
+        :param name: counter name
+        :param value: increment
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, timings, counters):
+        # type: (dict, dict) -> None
+        """
+        Add timings and counters collected elsewhere, e.g. in a worker process
+
+        :param timings: phase name -> seconds mapping
+        :param counters: counter name -> value mapping
+        """
+        for phase, seconds in timings.items():
+            self.add_time(phase, seconds)
+        for name, value in counters.items():
+            self.count(name, value)
+
+    @contextmanager
+    def timer(self, phase):
+        # type: (str) -> typing.Iterator[None]
+        """
+        Measure the time spent in a block of code
+
+        :param phase: phase name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def timed_iter(self, phase, iterable):
+        # type: (str, typing.Iterable) -> types.GeneratorType
+        """
+        Measure the time spent in producing items of an iterable
+
+        Only the time spent in the iterable itself is measured,
+        not the time spent by its consumer.
+
+        :param phase: phase name
+        :param iterable: an iterable, e.g. a generator
+        :return: generator that yields the same items
+        """
+        clock = time.perf_counter
+        iterator = iter(iterable)
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(phase, clock() - start)
+                return
+            self.add_time(phase, clock() - start)
+            yield item
+
+    @contextmanager
+    def count_queries(self):
+        # type: () -> typing.Iterator[None]
+        """
+        Count database queries made by the current thread in a block of code
+
+        The block of code must not yield from a generator. Queries
+        are not counted on Django < 2.0.
+        """
+        def count_query(execute, sql, params, many, context):
+            self.count('queries')
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                if hasattr(connection, 'execute_wrapper'):  # Django 2.0+
+                    stack.enter_context(connection.execute_wrapper(count_query))
+            yield
+
+    @property
+    def elapsed(self):
+        # type: () -> float
+        """Total operation time in seconds"""
+        if self._elapsed is not None:
+            return self._elapsed
+        return time.perf_counter() - self._started
+
+    def as_dict(self):
+        # type: () -> OrderedDict
+        """
+        Get metrics as a JSON-serializable dictionary
+
+        :return: dictionary with operation name, total time, phase timings
+            and counters
+        """
+        data = OrderedDict()
+        data['operation'] = self.operation
+        data['elapsed'] = round(self.elapsed, 6)
+        data['timings'] = OrderedDict(
+            (phase, round(seconds, 6)) for phase, seconds in self.timings.items()
+        )
+        data['counters'] = OrderedDict(self.counters)
+        return data
+
+    def report(self):
+        # type: () -> None
+        """
+        Finish the operation and publish its metrics
+
+        The metrics are sent with ``metrics_collected`` signal
+        and to ``XLIFF_EXCHANGE_METRICS_CALLBACK``. If the operation has taken
+        longer than ``XLIFF_EXCHANGE_SLOW_LOG_THRESHOLD`` seconds,
+        a warning with metrics as JSON is logged. Errors in signal receivers
+        and the callback are logged and do not affect the operation.
+        """
+        self._elapsed = time.perf_counter() - self._started
+        responses = metrics_collected.send_robust(sender=self.__class__,
+                                                  metrics=self)
+        for receiver, response in responses:
+            if isinstance(response, Exception):
+                logging.error('Error in XLIFF metrics receiver %r!', receiver,
+                              exc_info=(type(response), response,
+                                        response.__traceback__))
+        if METRICS_CALLBACK is not None:
+            try:
+                callback = METRICS_CALLBACK
+                if isinstance(callback, str):
+                    callback = import_string(callback)
+                callback(self)
+            except Exception:
+                logging.exception('Error in XLIFF metrics callback!')
+        if (SLOW_LOG_THRESHOLD is not None and
+                self._elapsed >= SLOW_LOG_THRESHOLD):
+            data = self.as_dict()
+            logging.warning('Slow XLIFF %s: %s', self.operation,
+                            json.dumps(data), extra={'xliff_metrics': data})
@@ -0,0 +1,35 @@
+# Generated by Django 2.1.15 on 2026-10-17 06:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportFingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.CharField(max_length=255)),
+                ('field', models.CharField(max_length=255)),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('exported', models.DateTimeField()),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+            ],
+            options={
+                'verbose_name': 'export fingerprint',
+                'verbose_name_plural': 'export fingerprints',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='exportfingerprint',
+            unique_together={('content_type', 'object_id', 'field')},
+        ),
+    ]
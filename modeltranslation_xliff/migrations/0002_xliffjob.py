@@ -0,0 +1,39 @@
+# Generated by Django 2.1.15 on 2026-10-17 06:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('modeltranslation_xliff', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XliffJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('export', 'Export'), ('import', 'Import')], max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10)),
+                ('query', models.BinaryField(blank=True, null=True)),
+                ('changed_only', models.BooleanField(default=False)),
+                ('source', models.FileField(blank=True, upload_to='modeltranslation_xliff/imports/')),
+                ('result', models.FileField(blank=True, upload_to='modeltranslation_xliff/exports/')),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(blank=True, null=True)),
+                ('message', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+            ],
+            options={
+                'verbose_name': 'XLIFF job',
+                'verbose_name_plural': 'XLIFF jobs',
+                'ordering': ['pk'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.15 on 2026-10-17 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modeltranslation_xliff', '0002_xliffjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xliffjob',
+            name='target_languages',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.1.15 on 2026-10-17 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modeltranslation_xliff', '0003_xliffjob_target_languages'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XliffSkeleton',
+            fields=[
+                ('checksum', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'XLIFF skeleton',
+                'verbose_name_plural': 'XLIFF skeletons',
+            },
+        ),
+    ]
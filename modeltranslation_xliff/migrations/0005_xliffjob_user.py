@@ -0,0 +1,21 @@
+# Generated by Django 2.1.15 on 2026-10-17 07:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('modeltranslation_xliff', '0004_xliffskeleton'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xliffjob',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+
+class ExportFingerprint(models.Model):
+    """
+    Fingerprint of a translatable field in the default language
+    as of the last export of changed content
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.CharField(max_length=255)
+    field = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=40)
+    exported = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'field')
+        verbose_name = _('export fingerprint')
+        verbose_name_plural = _('export fingerprints')
+
+    def __str__(self):
+        return '{}.{}#{}'.format(self.content_type, self.field, self.object_id)
+
+
+class XliffJob(models.Model):
+    """
+    Background XLIFF export or import job
+    """
+    EXPORT = 'export'
+    IMPORT = 'import'
+    KIND_CHOICES = (
+        (EXPORT, _('Export')),
+        (IMPORT, _('Import')),
+    )
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, _('Pending')),
+        (RUNNING, _('Running')),
+        (DONE, _('Done')),
+        (FAILED, _('Failed')),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                              default=PENDING, db_index=True)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    #: Pickled query for exported objects
+    query = models.BinaryField(null=True, blank=True)
+    changed_only = models.BooleanField(default=False)
+    #: Comma-separated target languages for multi-language exports
+    target_languages = models.CharField(max_length=255, blank=True)
+    source = models.FileField(upload_to='modeltranslation_xliff/imports/',
+                              blank=True)
+    result = models.FileField(upload_to='modeltranslation_xliff/exports/',
+                              blank=True)
+    #: The user who has uploaded a file for import
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             null=True, blank=True)
+    processed = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    message = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['pk']
+        verbose_name = _('XLIFF job')
+        verbose_name_plural = _('XLIFF jobs')
+
+    def __str__(self):
+        return '{} {} #{}'.format(self.content_type, self.kind, self.pk)
+
+    @property
+    def is_finished(self):
+        # type: () -> bool
+        return self.status in (self.DONE, self.FAILED)
+
+
+class XliffSkeleton(models.Model):
+    """
+    XLIFF skeleton stored on the server for exports with external skeletons
+
+    Skeletons are identified by the SHA-1 checksum of their contents
+    and can be deleted when the respective translations are imported.
+    """
+    checksum = models.CharField(max_length=40, primary_key=True)
+    #: zlib-compressed skeleton JSON
+    data = models.BinaryField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('XLIFF skeleton')
+        verbose_name_plural = _('XLIFF skeletons')
+
+    def __str__(self):
+        return self.checksum
@@ -3,7 +3,8 @@
 """
 Parsers for extracting translatable text from different content formats
 
-Currently only html and plain text ("text") are supported
+Currently html, plain text ("text") and html with a faster tokenizer
+("fast_html") are supported
 """
 
-from . import html, text
+from . import html, fast_html, text
@@ -0,0 +1,193 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Fast parser for extracting translatable text from HTML content
+
+The parser produces the same blocks as :mod:`.html` parser,
+but HTML markup is tokenized with compiled regular expressions
+instead of the pure-Python tokenizer of :class:`html.parser.HTMLParser`.
+Markup that may be tokenized differently, e.g. malformed tags or
+unterminated entity references, is passed to :class:`HTMLParser`.
+"""
+import re
+import types
+from html import unescape
+from .html import ContentParser, add_xliff_tags, _parse_content, \
+    _parse_content_spans
+
+__all__ = ['parse_content', 'parse_content_spans', 'add_xliff_tags']
+
+CDATA_CONTENT_TAGS = ('script', 'style')
+
+# Text followed by markup that is tokenized by HTMLParser in the same way
+markup_re = re.compile(r"""
+    (?P<text>[^<&]*)
+    (?:<(?P<start>[a-zA-Z][-.:a-zA-Z0-9_]*)
+        (?P<attrs>(?:[ \t\n\r\f]+[^\s"'<>/=]+
+            (?:[ \t\n\r\f]*=[ \t\n\r\f]*(?:"[^"]*"|'[^']*'|[^\s"'<>=`]+))?)*)
+        [ \t\n\r\f]*(?P<empty>/?)>
+    | </(?P<end>[a-zA-Z][-.:a-zA-Z0-9_]*)[ \t\n\r\f]*>
+    | &(?P<entity>[a-zA-Z][a-zA-Z0-9]*);
+    | &\#(?P<charref>[0-9]+|[xX][0-9a-fA-F]+);
+    | (?P<data>[<&])(?=[^a-zA-Z/!?\#])
+    | <!--(?P<comment>(?![->])(?:[^-]|-(?!-))*)-->
+    | <!(?P<decl>[dD][oO][cC][tT][yY][pP][eE][^<>]*)>
+    | (?P<other>[<&]))
+""", re.X)
+attr_re = re.compile(r"""
+    [ \t\n\r\f]+([^\s"'<>/=]+)
+    (?:[ \t\n\r\f]*=[ \t\n\r\f]*("[^"]*"|'[^']*'|[^\s"'<>=`]+))?
+""", re.X)
+cdata_end_re = re.compile(r'</([a-zA-Z]+)[ \t\n\r\f]*>')
+
+
+class FastContentParser(ContentParser):
+    """
+    Extracts translatable blocks of text from HTML markup
+
+    Markup is passed to the same handlers as in :class:`ContentParser`.
+    """
+    def reset(self):
+        super().reset()
+        self._starttag_text = None
+
+    def get_starttag_text(self):
+        if self._starttag_text is not None:
+            return self._starttag_text
+        return super().get_starttag_text()
+
+    def feed(self, data):
+        # type: (str) -> None
+        if not self.rawdata and self.cdata_elem is None:
+            base = len(self._source)
+            state = (len(self._content_list), self._current_block,
+                     self._current_spans, len(self._current_spans),
+                     self._ignore_block)
+            self._source += data
+            if self._feed_markup(data, base):
+                return
+            # Roll back and let HTMLParser tokenize the data
+            del self._content_list[state[0]:]
+            del self._spans_list[state[0]:]
+            self._current_block, self._current_spans = state[1:3]
+            del self._current_spans[state[3]:]
+            self._ignore_block = state[4]
+            self._source = self._source[:base]
+            self._starttag_text = None
+        super().feed(data)
+
+    def _feed_markup(self, data, base=0):
+        # type: (str, int) -> bool
+        """
+        Tokenize data and pass it to the handlers
+
+        :param data: HTML markup
+        :param base: the source offset of the data
+        :return: ``False`` if the data contains markup that is not supported
+        """
+        pos = 0
+        match_markup = markup_re.match
+        handle_data = self.handle_data
+        match = match_markup(data)
+        while match is not None:
+            text = match.group('text')
+            if text:
+                self._pos = base + pos
+                handle_data(text)
+            pos = match.end()
+            # Tokens start after the text
+            self._pos = base + match.end('text')
+            kind = match.lastgroup
+            if kind == 'empty':  # Start tag
+                tag = match.group('start').lower()
+                attrs = []
+                attrs_string = match.group('attrs')
+                if attrs_string:
+                    for name, value in attr_re.findall(attrs_string):
+                        if value[:1] in ('"', "'"):
+                            value = value[1:-1]
+                        elif not value:
+                            value = None
+                        attrs.append((name.lower(),
+                                      unescape(value) if value else value))
+                self._starttag_text = data[match.start('start') - 1:pos]
+                if match.group('empty'):
+                    self.handle_startendtag(tag, attrs)
+                else:
+                    self.handle_starttag(tag, attrs)
+                    if tag in CDATA_CONTENT_TAGS:
+                        pos = self._feed_cdata_content(data, pos, tag, base)
+                        if pos == -1:
+                            return False
+            elif kind == 'end':
+                self.handle_endtag(match.group('end').lower())
+            elif kind == 'entity':
+                self.handle_entityref(match.group('entity'))
+            elif kind == 'charref':
+                self.handle_charref(match.group('charref'))
+            elif kind == 'data':
+                handle_data(match.group('data'))
+            elif kind == 'comment':
+                self.handle_comment(match.group('comment'))
+            elif kind == 'decl':
+                self.handle_decl(match.group('decl'))
+            else:
+                return False
+            match = match_markup(data, pos)
+        if pos < len(data):
+            self._pos = base + pos
+            handle_data(data[pos:])
+        return True
+
+    def _feed_cdata_content(self, data, pos, tag, base=0):
+        # type: (str, int, str, int) -> int
+        """
+        Pass the content and the end tag of <script> or <style> to the handlers
+
+        :param data: HTML markup
+        :param pos: the position of the content
+        :param tag: tag name
+        :param base: the source offset of the data
+        :return: the position after the end tag or -1 if the content
+            is not supported
+        """
+        end = data.find('</', pos)
+        if end == -1:
+            return -1
+        match = cdata_end_re.match(data, end)
+        if (match is None or match.group(1).lower() != tag or
+                '<!--' in data[pos:end]):
+            return -1
+        if end > pos:
+            self._pos = base + pos
+            self.handle_data(data[pos:end])
+        self._pos = base + end
+        self.handle_endtag(tag)
+        return match.end()
+
+
+def parse_content(html):
+    # type: (str) -> types.GeneratorType
+    """
+    Extract translatable segments from a HTML document
+
+    This function is thread-safe and reentrant, and it yields
+    the same blocks as :func:`modeltranslation_xliff.parsers.html.parse_content`.
+
+    :param html: HTML document
+    :return: generator that yields translatable blocks
+    """
+    return _parse_content(html, FastContentParser)
+
+
+def parse_content_spans(html):
+    # type: (str) -> types.GeneratorType
+    """
+    Extract translatable segments and their locations from a HTML document
+
+    :param html: HTML document
+    :return: generator that yields (block, source spans) tuples
+        that are the same as in
+        :func:`modeltranslation_xliff.parsers.html.parse_content_spans`
+    """
+    return _parse_content_spans(html, FastContentParser)
@@ -5,11 +5,14 @@ Parser for extracting translatable text from HTML content
 """
 import logging
 import re
+import threading
 import types
+import typing
+from functools import lru_cache
 from html import escape, unescape
 from html.parser import HTMLParser
 
-__all__ = ['parse_content', 'add_xliff_tags']
+__all__ = ['parse_content', 'parse_content_spans', 'add_xliff_tags']
 
 INLINE_TAGS = (
     'a', 'abbr', 'acronym', 'applet', 'b', 'bdo', 'big', 'blink',
@@ -43,6 +46,11 @@ IGNORE_BLOCK_TAGS = ('script', 'style')
 
 INVALID_XML_REFS = ('&lt;', '&gt;', '&amp;', '&#38;', '&#60;', '&#62;')
 
+#: Kinds of HTML tags in translation segments
+OPEN_TAG = 1
+CLOSE_TAG = 2
+ISOLATED_TAG = 3
+
 charset_re = re.compile(rb'<meta[^>]+charset="?([\w-]+)"[^>]*>', re.I)
 whitespace_re = re.compile(r'^\s+$', re.U)
 tag_string_re = re.compile(r'^(<[^>]*>)$')
@@ -50,12 +58,25 @@ tag_re = re.compile(r'(<[^>]+>)')
 open_tag_re = re.compile(r'<(\w+)[^>]*>')
 close_tag_re = re.compile(r'</(\w+)>')
 entity_re = re.compile(r'(&#?[^;]+;)')
+token_re = re.compile(r'(<[^>]+>|&#?[^;]+;)')
 pre_code_re = re.compile(r'^<pre[^>]*>\s*?<code[^>]*>', re.I)
+attr_token_re = re.compile(r'[^&]+|&[^&;\s]*;?')
+attr_value_re = re.compile(
+    r'''[\s/]([^\s/>"'=]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s>]*))?'''
+)
 
 
 class ContentParser(HTMLParser):
     """
     Extracts translatable blocks of text from HTML markup
+
+    For each block the parser also records its source spans:
+    a list of ``(block start, block end, source start, source end, exact)``
+    tuples for the parts of the block. ``exact`` parts are copied
+    from the source verbatim, so any position inside them can be mapped
+    to the source. Other parts, e.g. unescaped entity references
+    or normalized end tags, can be mapped only as a whole.
+    The source start is ``None`` for parts without a known location.
     """
     def __init__(self):
         super().__init__(convert_charrefs=False)
@@ -64,9 +85,25 @@ class ContentParser(HTMLParser):
     def content_list(self):
         return self._content_list
 
+    @property
+    def spans_list(self):
+        return self._spans_list
+
+    def feed(self, data):
+        # type: (str) -> None
+        self._rawdata_base = self._pos = len(self._source) - len(self.rawdata)
+        self._source += data
+        super().feed(data)
+
+    def updatepos(self, i, j):
+        # The handler of a token is called before its position is updated,
+        # so handlers receive the source offset of the token start
+        self._pos = self._rawdata_base + j
+        return super().updatepos(i, j)
+
     def handle_starttag(self, tag, attrs):
         if (tag in INLINE_TAGS and self._current_block) or tag == 'pre':
-            self._current_block += self.get_starttag_text()
+            self._add_text(self.get_starttag_text())
         elif tag in IGNORE_BLOCK_TAGS:
             self._ignore_block = True
         elif tag == 'br':
@@ -76,7 +113,7 @@ class ContentParser(HTMLParser):
 
     def handle_startendtag(self, tag, attrs):
         if tag in INLINE_TAGS and self._current_block:
-            self._current_block += self.get_starttag_text()
+            self._add_text(self.get_starttag_text())
         elif tag == 'br':
             self._finish_block()
         elif tag in ('meta', 'img'):
@@ -84,7 +121,8 @@ class ContentParser(HTMLParser):
 
     def handle_endtag(self, tag):
         if tag in INLINE_TAGS or tag == 'pre':
-            self._current_block += '</{}>'.format(tag)
+            end = self._source.find('>', self._pos) + 1
+            self._add_text('</{}>'.format(tag), end or None)
             if tag == 'pre':
                 self._finish_block()
         elif tag in IGNORE_BLOCK_TAGS:
@@ -94,15 +132,18 @@ class ContentParser(HTMLParser):
 
     def handle_data(self, data):
         if not self._ignore_block and not whitespace_re.search(data):
-            self._current_block += data
+            self._add_text(data)
 
     def _add_ref(self, name):
+        end = self._pos + len(name) - 1
+        if self._source.startswith(';', end):
+            end += 1
         if name in INVALID_XML_REFS:
-            self._current_block += name
+            self._add_text(name, end)
         else:
             # "XLIFF 1.2 Representation Guide for HTML" strongly recommends
             # to unescape all HTML entities
-            self._current_block += unescape(name)
+            self._add_text(unescape(name), end)
 
     def handle_charref(self, name):
         self._add_ref('&#' + name + ';')
@@ -113,39 +154,197 @@ class ContentParser(HTMLParser):
     def error(self, message):
         logging.error(message)
 
+    def _add_text(self, text, end=None, start=None):
+        # type: (str, typing.Optional[int], typing.Optional[int]) -> None
+        """
+        Add text to the current block and record its source span
+
+        :param text: text to add
+        :param end: the source offset after the text. If it is not set,
+            the text is a verbatim copy of the source.
+        :param start: the source offset of the text
+            (default: the start of the current token)
+        """
+        if start is None:
+            start = self._pos
+        block_start = len(self._current_block)
+        self._current_block += text
+        if end is None:
+            end = start + len(text)
+            exact = True
+        else:
+            exact = self._source[start:end] == text
+        self._current_spans.append(
+            (block_start, len(self._current_block), start, end, exact)
+        )
+
     def _finish_block(self):
-        self._content_list.append(self._current_block.strip(' \r\n'))
+        block = self._current_block.strip(' \r\n')
+        lead = len(self._current_block) - len(self._current_block.lstrip(' \r\n'))
+        spans = []
+        for block_start, block_end, start, end, exact in self._current_spans:
+            new_start = max(block_start - lead, 0)
+            new_end = min(block_end - lead, len(block))
+            if new_end <= new_start:
+                continue
+            if new_start != block_start - lead or new_end != block_end - lead:
+                # Stripped whitespace is a part of the span
+                if exact:
+                    start += new_start - (block_start - lead)
+                    end -= (block_end - lead) - new_end
+                else:
+                    start = end = None
+            spans.append((new_start, new_end, start, end, exact))
+        self._content_list.append(block)
+        self._spans_list.append(spans)
         self._current_block = ''
+        self._current_spans = []
         self._ignore_block = False
 
+    def _get_attr_span(self, name, value):
+        # type: (str, str) -> tuple
+        """
+        Get the source span of an attribute value of the current start tag
+
+        :param name: attribute name
+        :param value: attribute value
+        :return: (start, end) tuple or (``None``, ``None``)
+            if the attribute value is not found
+        """
+        span = None
+        for match in attr_value_re.finditer(self.get_starttag_text() or '', 1):
+            # The last attribute wins like in HTMLParser
+            if match.group(1).lower() == name:
+                span = match.span(2) if match.group(2) else None
+        if span is not None:
+            start, end = span
+            if self.get_starttag_text()[start] in ('"', "'"):
+                start += 1
+                end -= 1
+            if unescape(self.get_starttag_text()[start:end]) == value:
+                return self._pos + start, self._pos + end
+        return None, None
+
+    def _add_attr_value(self, attrs_dict, name):
+        # type: (dict, str) -> None
+        value = attrs_dict[name]
+        start, end = self._get_attr_span(name, value)
+        if start is None:
+            block_start = len(self._current_block)
+            self._current_block += value
+            self._current_spans.append(
+                (block_start, len(self._current_block), None, None, False)
+            )
+        else:
+            # Text and character references of the value are added separately,
+            # so segments of the value can be located in the source
+            for match in attr_token_re.finditer(self._source, start, end):
+                token = match.group()
+                if token not in INVALID_XML_REFS:
+                    token = unescape(token)
+                self._add_text(token, match.end(), match.start())
+        self._finish_block()
+
     def _process_translatable_attrs(self, attrs):
         attrs_dict = dict(attrs)
         if attrs_dict.get('description'):
-            self._current_block += attrs_dict['description']
-            self._finish_block()
+            self._add_attr_value(attrs_dict, 'description')
         elif attrs_dict.get('keywords'):
-            self._current_block += attrs_dict['keywords']
-            self._finish_block()
+            self._add_attr_value(attrs_dict, 'keywords')
         elif attrs_dict.get('http-equiv') == 'keywords':
-            self._current_block += attrs_dict['content']
-            self._finish_block()
+            self._add_attr_value(attrs_dict, 'content')
         elif attrs_dict.get('alt'):
-            self._current_block += attrs_dict['alt']
-            self._finish_block()
+            self._add_attr_value(attrs_dict, 'alt')
 
     def reset(self):
         super().reset()
         self._content_list = []
+        self._spans_list = []
         self._current_block = ''
+        self._current_spans = []
         self._ignore_block = False
+        self._source = ''
+        self._rawdata_base = 0
+        self._pos = 0
 
     def close(self):
         if self._current_block and not whitespace_re.search(self._current_block):
             self._finish_block()
+        self._rawdata_base = self._pos = len(self._source) - len(self.rawdata)
         super().close()
 
 
-content_parser = ContentParser()
+#: Max number of idle parser instances of each class kept for reuse
+PARSER_POOL_SIZE = 8
+
+_parser_pools = {}  # type: typing.Dict[type, typing.List[ContentParser]]
+_parser_pool_lock = threading.Lock()
+
+
+def _acquire_parser(parser_class=ContentParser):
+    # type: (typing.Type[ContentParser]) -> ContentParser
+    """
+    Get a parser instance for exclusive use
+
+    :param parser_class: content parser class
+    :return: content parser from the pool or a new instance
+    """
+    with _parser_pool_lock:
+        pool = _parser_pools.get(parser_class)
+        if pool:
+            return pool.pop()
+    return parser_class()
+
+
+def _release_parser(parser):
+    # type: (ContentParser) -> None
+    """
+    Return a parser instance to the pool
+
+    :param parser: content parser
+    """
+    with _parser_pool_lock:
+        pool = _parser_pools.setdefault(type(parser), [])
+        if len(pool) < PARSER_POOL_SIZE:
+            pool.append(parser)
+
+
+def _parse_content_spans(html, parser_class):
+    # type: (str, typing.Type[ContentParser]) -> types.GeneratorType
+    """
+    Extract translatable blocks and their source spans from a HTML document
+    with a pooled parser
+
+    :param html: HTML document
+    :param parser_class: content parser class
+    :return: generator that yields (block, source spans) tuples
+    """
+    parser = _acquire_parser(parser_class)
+    try:
+        parser.reset()
+        parser.feed(html)
+        parser.close()
+        content_list = parser.content_list
+        spans_list = parser.spans_list
+    finally:
+        _release_parser(parser)
+    for item, spans in zip(content_list, spans_list):
+        # Skip <pre><code> blocks
+        if pre_code_re.search(item) is None:
+            if not tag_string_re.search(item):
+                yield item, spans
+
+
+def _parse_content(html, parser_class):
+    # type: (str, typing.Type[ContentParser]) -> types.GeneratorType
+    """
+    Extract translatable segments from a HTML document with a pooled parser
+
+    :param html: HTML document
+    :param parser_class: content parser class
+    :return: generator that yields translatable blocks
+    """
+    return (item for item, _ in _parse_content_spans(html, parser_class))
 
 
 def parse_content(html):
@@ -153,17 +352,26 @@ def parse_content(html):
     """
     Extract translatable segments from a HTML document
 
+    This function is thread-safe and reentrant: each call uses
+    its own parser instance from a pool, and the parser is returned
+    to the pool before the first block is yielded.
+
     :param html: HTML document
     :return: generator that yields translatable blocks
     """
-    content_parser.reset()
-    content_parser.feed(html)
-    content_parser.close()
-    for item in content_parser.content_list:
-        # Skip <pre><code> blocks
-        if pre_code_re.search(item) is None:
-            if not tag_string_re.search(item):
-                yield item
+    return _parse_content(html, ContentParser)
+
+
+def parse_content_spans(html):
+    # type: (str) -> types.GeneratorType
+    """
+    Extract translatable segments and their locations from a HTML document
+
+    :param html: HTML document
+    :return: generator that yields (block, source spans) tuples.
+        See :class:`ContentParser` for the format of source spans.
+    """
+    return _parse_content_spans(html, ContentParser)
 
 
 def add_ph_tags(segment):
@@ -186,24 +394,6 @@ def add_ph_tags(segment):
     return string
 
 
-def find_tag(tag_name, tags_stack):
-    # type: (str, list) -> int
-    """
-    Find the closest opening tag in a tags stack
-    Search is done from the end of the stack.
-
-    :param tag_name: tag name
-    :param tags_stack: tags stack
-    :return: opening tag index or -1
-    """
-    i = len(tags_stack) - 1
-    for item in reversed(tags_stack):
-        if tag_name == item[0]:
-            return i
-        i -= 1
-    return -1
-
-
 def add_t_tags(segment):
     # type: (str) -> str
     """
@@ -213,23 +403,22 @@ def add_t_tags(segment):
     :param segment: translation segments
     :return: tagged segment
     """
-    tags_stack = []
-    open_tags = []
-    close_tags = []
-    isolated_tags = []
+    # Tag name -> stack of (chunk index, tag ID) of unpaired open tags
+    open_tags = {}
     tag_id = 1
     chunks = tag_re.split(segment)
-    for i, chunk in enumerate(chunks):
+    # Tags are at odd indexes of split chunks
+    for i in range(1, len(chunks), 2):
+        chunk = chunks[i]
         open_tag_match = open_tag_re.search(chunk)
         if open_tag_match is not None:
             tag_name = open_tag_match.group(1)
             if tag_name == 'ph':  # Ignore <ph> XLIFF tags
                 continue
-            elif tag_name in SELF_CLOSING_TAGS:
-                isolated_tags.append((i, tag_id))
-                tag_id += 1
-                continue
-            tags_stack.append((tag_name, i, tag_id))
+            if tag_name in SELF_CLOSING_TAGS:
+                chunks[i] = '<it id="{}">{}</it>'.format(tag_id, escape(chunk))
+            else:
+                open_tags.setdefault(tag_name, []).append((i, tag_id))
             tag_id += 1
             continue
         close_tag_match = close_tag_re.search(chunk)
@@ -237,41 +426,118 @@ def add_t_tags(segment):
             tag_name = close_tag_match.group(1)
             if tag_name == 'ph':  # Ignore </ph> XLIFF tags
                 continue
-            # If a closing tag does not have a pair in the stack
-            # treat it as an isolated tag.
-            open_tag_idx = find_tag(tag_name, tags_stack)
-            if open_tag_idx == -1:
-                isolated_tags.append((i, tag_id))
-                tag_id += 1
-                continue
+            stack = open_tags.get(tag_name)
+            if stack:
+                open_idx, open_id = stack.pop()
+                chunks[open_idx] = '<bpt id="{}">{}</bpt>'.format(
+                    open_id, escape(chunks[open_idx])
+                )
+                chunks[i] = '<ept id="{}">{}</ept>'.format(
+                    open_id, escape(chunk)
+                )
             else:
-                open_tags.append((tags_stack[open_tag_idx][1], tags_stack[open_tag_idx][2]))
-                close_tags.append((i, tags_stack[open_tag_idx][2]))
-                tags_stack.pop(open_tag_idx)
-    for item in tags_stack:
-        # Add unpaired open tags from the stack to isolated tags.
-        isolated_tags.append((item[1], item[2]))
-    for tag in open_tags:
-        chunks[tag[0]] = '<bpt id="{}">{}</bpt>'.format(
-            tag[1], escape(chunks[tag[0]])
-        )
-    for tag in close_tags:
-        chunks[tag[0]] = '<ept id="{}">{}</ept>'.format(
-            tag[1], escape(chunks[tag[0]])
-        )
-    for tag in isolated_tags:
-        chunks[tag[0]] = '<it id="{}">{}</it>'.format(
-            tag[1], escape(chunks[tag[0]])
-        )
+                # If a closing tag does not have a pair
+                # treat it as an isolated tag.
+                chunks[i] = '<it id="{}">{}</it>'.format(tag_id, escape(chunk))
+                tag_id += 1
+    for stack in open_tags.values():
+        # Unpaired open tags are isolated tags
+        for open_idx, open_id in stack:
+            chunks[open_idx] = '<it id="{}">{}</it>'.format(
+                open_id, escape(chunks[open_idx])
+            )
     return ''.join(chunks)
 
 
+@lru_cache(maxsize=1024)
+def _parse_tag(tag):
+    # type: (str) -> typing.Tuple[typing.Optional[int], typing.Optional[str], str]
+    """
+    Get the kind and the name of a HTML tag from a translation segment
+
+    Inline tags repeat a lot, so parsed tags are cached.
+
+    :param tag: HTML tag
+    :return: (tag kind, tag name, escaped tag) tuple.
+        The kind is ``None`` for tags that are left as is.
+    """
+    open_tag_match = open_tag_re.search(tag)
+    if open_tag_match is not None:
+        tag_name = open_tag_match.group(1)
+        if tag_name == 'ph':  # Ignore <ph> tags
+            kind = None
+        elif tag_name in SELF_CLOSING_TAGS:
+            kind = ISOLATED_TAG
+        else:
+            kind = OPEN_TAG
+    else:
+        close_tag_match = close_tag_re.search(tag)
+        if close_tag_match is None:
+            return None, None, tag
+        tag_name = close_tag_match.group(1)
+        kind = CLOSE_TAG if tag_name != 'ph' else None
+    return kind, tag_name, escape(tag)
+
+
 def add_xliff_tags(segment):
     # type: (str) -> str
     """
     Add inline XLIFF tags to translatable segment
 
+    Entity references and HTML tags are found in a single scan.
+    The result is the same as :func:`add_t_tags` applied to the result
+    of :func:`add_ph_tags`. Segments where entity references and tags
+    overlap, e.g. a tag with an entity in an attribute value, are rare
+    and are processed by those functions.
+
     :param segment: translatable segment
     :return: segment with HTML tags marked with inline XLIFF XML tags
     """
-    return add_t_tags(add_ph_tags(segment))
+    if ('&;' in segment or '<>' in segment or
+            segment.rfind('<') > segment.rfind('>')):
+        # "&;...;" text is treated as an entity by add_ph_tags(),
+        # and "<" that does not start a tag may be followed by <ph>.
+        return add_t_tags(add_ph_tags(segment))
+    # Tag name -> stack of (chunk index, tag ID, escaped tag)
+    # of unpaired open tags
+    open_tags = {}
+    ph_id = tag_id = 1
+    chunks = token_re.split(segment)
+    # Tags and entities are at odd indexes of split chunks
+    for i in range(1, len(chunks), 2):
+        token = chunks[i]
+        if token[0] == '&':
+            if '<' in token:
+                return add_t_tags(add_ph_tags(segment))
+            chunks[i] = '<ph id="{}">{}</ph>'.format(ph_id, token)
+            ph_id += 1
+            continue
+        if '&' in token:
+            return add_t_tags(add_ph_tags(segment))
+        kind, tag_name, escaped_tag = _parse_tag(token)
+        if kind == OPEN_TAG:
+            open_tags.setdefault(tag_name, []).append(
+                (i, tag_id, escaped_tag)
+            )
+            tag_id += 1
+        elif kind == CLOSE_TAG:
+            stack = open_tags.get(tag_name)
+            if stack:
+                open_idx, open_id, escaped_open_tag = stack.pop()
+                chunks[open_idx] = '<bpt id="{}">{}</bpt>'.format(
+                    open_id, escaped_open_tag
+                )
+                chunks[i] = '<ept id="{}">{}</ept>'.format(open_id,
+                                                           escaped_tag)
+            else:
+                chunks[i] = '<it id="{}">{}</it>'.format(tag_id, escaped_tag)
+                tag_id += 1
+        elif kind == ISOLATED_TAG:
+            chunks[i] = '<it id="{}">{}</it>'.format(tag_id, escaped_tag)
+            tag_id += 1
+    for stack in open_tags.values():
+        for open_idx, open_id, escaped_open_tag in stack:
+            chunks[open_idx] = '<it id="{}">{}</it>'.format(
+                open_id, escaped_open_tag
+            )
+    return ''.join(chunks)
@@ -5,17 +5,14 @@ Functions for splitting blocks of text into translation segments
 
 This module uses sent_tokenize function from NLTK package that splits text
 into sentences that correspond to translation segments in CAT tools.
+NLTK and its Punkt tokenizer models are loaded on first use.
 """
+import threading
+import typing
+from ..settings import NLTK_OFFLINE
 
-from nltk import download
-from nltk.tokenize import sent_tokenize
-
-try:
-    sent_tokenize('Test.')
-except LookupError:
-    download('punkt')
-
-__all__ = ['NLTK_SUPPORTED_LANGUAGES', 'is_supported_language', 'segment_text']
+__all__ = ['NLTK_SUPPORTED_LANGUAGES', 'is_supported_language', 'segment_text',
+           'load_tokenizer']
 
 NLTK_SUPPORTED_LANGUAGES = {
     'cs': 'czech',
@@ -37,6 +34,41 @@ NLTK_SUPPORTED_LANGUAGES = {
     'tr': 'turkish'
 }
 
+_sent_tokenize = None
+_load_lock = threading.Lock()
+
+
+def load_tokenizer():
+    # type: () -> typing.Callable
+    """
+    Import NLTK and load Punkt tokenizer models
+
+    Punkt models are downloaded if they are not installed, unless
+    ``XLIFF_EXCHANGE_NLTK_OFFLINE`` setting is ``True``. This function
+    is called automatically on first segmentation but can be called
+    explicitly to load NLTK in advance.
+
+    :return: NLTK ``sent_tokenize`` function
+    :raises LookupError: if Punkt models are not installed in offline mode
+        or cannot be downloaded
+    """
+    global _sent_tokenize
+    if _sent_tokenize is None:
+        with _load_lock:
+            if _sent_tokenize is None:
+                from nltk import download
+                from nltk.tokenize import sent_tokenize
+                try:
+                    sent_tokenize('Test.')
+                except LookupError:
+                    if NLTK_OFFLINE:
+                        raise
+                    download('punkt')
+                    # Raises LookupError if the download has failed
+                    sent_tokenize('Test.')
+                _sent_tokenize = sent_tokenize
+    return _sent_tokenize
+
 
 def is_supported_language(lang_code):
     # type: (str) -> bool
@@ -64,4 +96,4 @@ def segment_text(text, lang_code):
         raise LookupError(
             'Language "{}" is not supported by NLTK!'.format(lang_code)
         )
-    return sent_tokenize(text, language)
+    return load_tokenizer()(text, language)
@@ -0,0 +1,139 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Rule-based segmenter for splitting blocks of text into translation segments
+
+Segmentation rules are similar to default rules of
+`SRX <https://www.gala-global.org/srx-20-april-7-2008>`_ segmenters
+used in CAT tools: a segment ends after sentence-final punctuation followed
+by whitespace unless the next word starts with a lowercase letter
+or the punctuation belongs to a known abbreviation, an initial
+or an ordinal number. CJK full-width punctuation ends a segment
+unconditionally. The segmenter has no external dependencies and supports
+any language, while language-specific rules are provided for a number
+of languages.
+"""
+import re
+import typing
+
+__all__ = ['is_supported_language', 'segment_text']
+
+#: Known abbreviations, lowercase and without the trailing period
+ABBREVIATIONS = {
+    'en': (
+        'mr mrs ms dr prof sr jr st vs etc e.g i.e inc ltd co corp no nos '
+        'fig figs approx dept est jan feb mar apr jun jul aug sep sept oct '
+        'nov dec mt ft'
+    ),
+    'de': (
+        'bzw ca dr evtl ggf hr fr nr prof str usw vgl z.b u.a d.h s abs bd '
+        'inkl jh jhd'
+    ),
+    'fr': 'm mm mme mlle dr pr etc av bd ex cf p vol',
+    'es': 'sr sra srta dr dra ud uds etc pág vol',
+    'it': 'sig sigg dott prof ecc pag vol',
+    'pt': 'sr sra dr dra etc pág vol',
+    'nl': 'dhr mevr dr bijv blz enz nr',
+    'pl': 'dr inż prof np tzn itd itp ul nr',
+    'ru': 'т е д п др пр г гг ул им проф см стр рис тыс млн млрд руб коп',
+    'uk': 'т д ін пр р рр вул ім проф див стор рис тис млн млрд грн коп',
+}
+#: Languages that use a period after ordinal numbers, e.g. "3. Oktober"
+ORDINAL_LANGUAGES = (
+    'cs', 'da', 'de', 'et', 'fi', 'fo', 'hr', 'hu', 'is', 'lt', 'lv', 'nb',
+    'nn', 'no', 'pl', 'sk', 'sl', 'sr', 'tr'
+)
+
+break_re = re.compile(
+    # Western sentence-final punctuation, optional closing quotes, brackets
+    # and closing inline tags, followed by mandatory whitespace
+    r'[.?!…]+[\'")\]»”’]*(?:</[^>]+>)*(?P<space>\s+)|'
+    # CJK full-width punctuation and closing brackets
+    r'[。！？｡][」』）】》]*(?P<cjk>\s*)'
+)
+# Break candidates outside of tags: tags are matched as a whole,
+# so punctuation in attribute values is skipped
+segment_re = re.compile(r'(?P<tag><[^>]*>)|' + break_re.pattern)
+next_char_re = re.compile(
+    r'(?:<[^>]+>|[\'"(\[«“‘¿¡])*(.)', re.S
+)
+last_token_re = re.compile(r'(\S*)$')
+tag_re = re.compile(r'<[^>]*>')
+initialism_re = re.compile(r'^(?:\w\.)+\w$')
+#: Max number of characters to look back for the last word before a period
+MAX_TOKEN_LENGTH = 64
+
+_abbreviations = {
+    lang: frozenset(abbrs.split()) for lang, abbrs in ABBREVIATIONS.items()
+}
+
+
+def is_supported_language(lang_code):
+    # type: (str) -> bool
+    """
+    Check if a language is supported by the segmenter
+
+    Default segmentation rules apply to all languages.
+
+    :param lang_code: language code in ll or ll-CC format
+    :return: always ``True``
+    """
+    return True
+
+
+def _is_break(text, match, lang):
+    # type: (str, typing.Match, str) -> bool
+    """
+    Check if a segment ends at a punctuation match
+
+    :param text: text to segment
+    :param match: ``break_re`` match
+    :param lang: 2-letter language code
+    :return: check result
+    """
+    if match.group('space') is None:
+        # CJK punctuation ends a segment unless it is the end of text
+        return match.end() < len(text)
+    next_char = next_char_re.match(text, match.end())
+    if next_char is None:
+        return False
+    char = next_char.group(1)
+    if char.islower():
+        return False
+    if text[match.start()] != '.':
+        return True
+    token = last_token_re.search(
+        text, max(0, match.start() - MAX_TOKEN_LENGTH), match.start()
+    ).group(1)
+    token = tag_re.sub('', token).lstrip('\'"(«“‘').lower()
+    if not token:
+        return True
+    if token in _abbreviations.get(lang, ()) or initialism_re.search(token):
+        return False
+    if len(token) == 1 and token.isalpha():
+        # An initial
+        return False
+    if token.isdigit() and lang in ORDINAL_LANGUAGES:
+        return False
+    return True
+
+
+def segment_text(text, lang_code):
+    # type: (str, str) -> list
+    """
+    Split text into translation segments
+
+    :param text: text to segment
+    :param lang_code: language code for the text
+    :return: the list of translation segments
+    """
+    lang = lang_code[:2].lower()
+    segments = []
+    start = 0
+    for match in segment_re.finditer(text):
+        if match.group('tag') is None and _is_break(text, match, lang):
+            end = match.end() - len(match.group('space') or match.group('cjk'))
+            segments.append(text[start:end].strip())
+            start = match.end()
+    segments.append(text[start:].strip())
+    return [seg for seg in segments if seg]
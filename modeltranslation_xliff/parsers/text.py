@@ -5,12 +5,18 @@ Dummy parser for plain text
 """
 from html import unescape
 
-__all__ = ['parse_content', 'add_xliff_tags']
+__all__ = ['parse_content', 'parse_content_spans', 'add_xliff_tags']
 
 
 def parse_content(text):
     return text
 
 
+def parse_content_spans(text):
+    # Blocks are the items of parse_content() result
+    for i, block in enumerate(parse_content(text)):
+        yield block, [(0, len(block), i, i + len(block), True)]
+
+
 def add_xliff_tags(segment):
     return unescape(segment)  # Plain text does not require any special tags
@@ -1,6 +1,63 @@
 from django.conf import settings
 
-#: Disable splitting text into segments with `NLTK <http://www.nltk.org>`_
-DISABLE_NLTK = getattr(settings, 'XLIFF_EXCHANGE_DISABLE_NLTK', False)
+#: Disable splitting text into segments with any segmenter
+DISABLE_SEGMENTATION = getattr(
+    settings, 'XLIFF_EXCHANGE_DISABLE_SEGMENTATION',
+    getattr(settings, 'XLIFF_EXCHANGE_DISABLE_NLTK', False)
+)
+#: Deprecated alias of ``DISABLE_SEGMENTATION``
+DISABLE_NLTK = DISABLE_SEGMENTATION
 #: Explicitly set content type. Use "text" if your content has no HTML markup
 CONTENT_TYPE = getattr(settings, 'XLIFF_EXCHANGE_CONTENT_TYPE', 'html')
+#: Stream exported XLIFF files instead of building them in memory
+STREAMING_EXPORT = getattr(settings, 'XLIFF_EXCHANGE_STREAMING_EXPORT', False)
+#: The number of model objects updated with one query on XLIFF import
+IMPORT_BATCH_SIZE = getattr(settings, 'XLIFF_EXCHANGE_IMPORT_BATCH_SIZE', 500)
+#: Allow lxml to parse imported XLIFF files with very deep trees
+#: or very long text nodes
+IMPORT_HUGE_TREE = getattr(settings, 'XLIFF_EXCHANGE_IMPORT_HUGE_TREE', False)
+#: Max number of processed content blocks in the in-process cache.
+#: Set to 0 to disable caching.
+BLOCK_CACHE_SIZE = getattr(settings, 'XLIFF_EXCHANGE_BLOCK_CACHE_SIZE', 1000)
+#: The name of a Django cache from ``CACHES`` setting for processed content
+#: blocks. If set, it is used instead of the in-process cache.
+BLOCK_CACHE_ALIAS = getattr(settings, 'XLIFF_EXCHANGE_BLOCK_CACHE_ALIAS', None)
+#: The number of worker processes for processing exported content.
+#: 0 or 1 means that content is processed in the current process.
+EXPORT_WORKERS = getattr(settings, 'XLIFF_EXCHANGE_EXPORT_WORKERS', 0)
+#: The number of model objects sent to a worker process at once
+EXPORT_BATCH_SIZE = getattr(settings, 'XLIFF_EXCHANGE_EXPORT_BATCH_SIZE', 100)
+#: Do not download NLTK Punkt models if they are not installed
+NLTK_OFFLINE = getattr(settings, 'XLIFF_EXCHANGE_NLTK_OFFLINE', False)
+#: Load NLTK when Django starts instead of the first export
+PRELOAD_NLTK = getattr(settings, 'XLIFF_EXCHANGE_PRELOAD_NLTK', False)
+#: Segmenter for splitting translatable text into segments: "srx", "nltk"
+#: or a full path to a custom segmenter module
+SEGMENTER = getattr(settings, 'XLIFF_EXCHANGE_SEGMENTER', 'srx')
+#: Run XLIFF export and import in background jobs
+BACKGROUND_JOBS = getattr(settings, 'XLIFF_EXCHANGE_BACKGROUND_JOBS', False)
+#: Background job worker: "thread" or "command" (``manage.py xliff_worker``)
+JOB_WORKER = getattr(settings, 'XLIFF_EXCHANGE_JOB_WORKER', 'thread')
+#: Running jobs started more than this number of seconds ago are considered
+#: interrupted, e.g. by a server restart, and marked as failed
+JOB_TIMEOUT = getattr(settings, 'XLIFF_EXCHANGE_JOB_TIMEOUT', 3600)
+#: The number of rows fetched from the database at once on export
+EXPORT_CHUNK_SIZE = getattr(settings, 'XLIFF_EXCHANGE_EXPORT_CHUNK_SIZE', 2000)
+#: The database alias to read exported content from, e.g. a read replica
+EXPORT_DB_ALIAS = getattr(settings, 'XLIFF_EXCHANGE_EXPORT_DB_ALIAS', None)
+#: Compression of exported XLIFF files: None, "gzip" or "zip"
+EXPORT_COMPRESSION = getattr(settings, 'XLIFF_EXCHANGE_EXPORT_COMPRESSION', None)
+#: Target languages for multi-language export.
+#: Default: all languages except the default one.
+EXPORT_TARGET_LANGUAGES = getattr(
+    settings, 'XLIFF_EXCHANGE_EXPORT_TARGET_LANGUAGES', None
+)
+#: How XLIFF skeletons are stored: "base64" (inline), "zlib" (inline,
+#: compressed) or "external" (in the database)
+SKELETON_MODE = getattr(settings, 'XLIFF_EXCHANGE_SKELETON_MODE', 'base64')
+#: A callable or a full path to a callable that receives
+#: :class:`modeltranslation_xliff.metrics.Metrics` of each export and import
+METRICS_CALLBACK = getattr(settings, 'XLIFF_EXCHANGE_METRICS_CALLBACK', None)
+#: Log a warning with metrics of exports and imports that take longer than
+#: this number of seconds. Set to None to disable logging.
+SLOW_LOG_THRESHOLD = getattr(settings, 'XLIFF_EXCHANGE_SLOW_LOG_THRESHOLD', 60)
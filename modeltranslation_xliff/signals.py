@@ -0,0 +1,13 @@
+# (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
+# License: MIT
+"""
+Signals sent by XLIFF exchange
+"""
+from django.dispatch import Signal
+
+__all__ = ['metrics_collected']
+
+#: Sent after an XLIFF export or import has finished.
+#: Receivers get ``metrics`` keyword argument with
+#: a :class:`modeltranslation_xliff.metrics.Metrics` instance.
+metrics_collected = Signal()
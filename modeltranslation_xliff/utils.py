@@ -4,23 +4,64 @@ Utility functions for converting model data to XLIFF and back
 Currently only HTML content is supported but technically HTML parser can
 process plain text as well.
 """
+import hashlib
 import json
+import logging
+import re
+import time
+import zlib
 import types
+import typing
+from importlib import import_module
+from itertools import islice
 from base64 import b64encode, b64decode
+from collections import OrderedDict, deque
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
 from html import escape
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+import django
 from django.core.exceptions import ValidationError, ImproperlyConfigured
+from django.db import connections, router, transaction
+from django.db.models import Case, Model, QuerySet, Value, When
 from django.utils.translation import ugettext_lazy as _
-try:
-    from lxml import etree
-except ImportError:
-    from xml.etree import ElementTree as etree
-from .settings import DISABLE_NLTK, CONTENT_TYPE
+from lxml import etree
+from .settings import DISABLE_SEGMENTATION, CONTENT_TYPE, SEGMENTER, EXPORT_WORKERS, \
+    EXPORT_BATCH_SIZE, SKELETON_MODE, IMPORT_HUGE_TREE
 from . import parsers
-from .parsers.segmenter import is_supported_language, segment_text
+from .cache import get_block_cache, make_key
+from .compression import iter_zip
+from .metrics import Metrics
 
-__all__ = ['create_xliff', 'import_xliff']
+__all__ = ['create_xliff', 'iter_xliff', 'import_xliff', 'iterparse_xliff',
+           'iterparse_xliff_files', 'iter_xliff_archive', 'process_object']
 
-FORBIDDEN_CHARS = ('<', '>', '&')
+XML_NS = 'http://www.w3.org/XML/1998/namespace'
+#: Content types with HTML markup
+HTML_CONTENT_TYPES = ('html', 'fast_html')
+#: Inline XLIFF elements that contain native code, e.g. HTML tags
+NATIVE_CODE_TAGS = ('bpt', 'ept', 'it')
+#: Max size of in-memory buffers for streaming export before spilling to disk
+SPOOL_MAX_SIZE = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+#: Skeleton storage modes
+SKELETON_BASE64 = 'base64'
+SKELETON_ZLIB = 'zlib'
+SKELETON_EXTERNAL = 'external'
+#: ``form`` attribute of ``<internal-file>`` with zlib-compressed skeleton
+ZLIB_FORM = 'x-zlib-base64'
+#: ``href`` prefix of ``<external-file>`` with skeleton stored on the server
+EXTERNAL_SKELETON_PREFIX = 'xliff-skeleton:'
+#: Built-in segmenters
+SEGMENTERS = {
+    'srx': 'modeltranslation_xliff.parsers.srx',
+    'nltk': 'modeltranslation_xliff.parsers.segmenter',
+}
+
+placeholder_re = re.compile(r'%%%(\d+)%%%')
+#: Characters that require parsing of a tagged segment as XML
+xml_special_re = re.compile(r'[<&\r]|]]>')
 
 
 def get_content_parser():
@@ -39,126 +80,1072 @@ def get_content_parser():
     return parser
 
 
+def get_segmenter():
+    # type: () -> types.ModuleType
+    """
+    Get segmenter for splitting translatable blocks into segments
+
+    A segmenter is a module that provides ``is_supported_language(lang_code)``
+    and ``segment_text(text, lang_code)`` functions.
+
+    :return: segmenter module
+    """
+    try:
+        segmenter = import_module(SEGMENTERS.get(SEGMENTER, SEGMENTER))
+    except ImportError as ex:
+        raise ImproperlyConfigured(
+            'Invalid segmenter: "{}"!'.format(SEGMENTER)
+        ) from ex
+    return segmenter
+
+
+def _get_segmenter_name():
+    # type: () -> str
+    """
+    Get the module path of the configured segmenter
+
+    :return: the module path or an empty string if segmentation is disabled
+    """
+    if DISABLE_SEGMENTATION:
+        return ''
+    return SEGMENTERS.get(SEGMENTER, SEGMENTER)
+
+
+def chunked(iterable, size):
+    # type: (typing.Iterable, int) -> types.GeneratorType
+    """
+    Split an iterable into lists of the given size
+
+    :param iterable: an iterable to split
+    :param size: chunk size
+    :return: generator that yields chunks as lists
+    """
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def iterate_queryset(queryset, chunk_size):
+    # type: (QuerySet, int) -> typing.Iterator
+    """
+    Iterate over a queryset without caching its results
+
+    :param queryset: queryset to iterate over
+    :param chunk_size: the number of rows fetched from the database at once
+        (ignored on Django < 2.0)
+    :return: queryset iterator
+    """
+    if django.VERSION >= (2, 0):
+        return queryset.iterator(chunk_size=chunk_size)
+    return queryset.iterator()
+
+
+def bulk_update(model, objs, fields, batch_size=None):
+    # type: (typing.Type[Model], list, list, typing.Optional[int]) -> None
+    """
+    Update fields of model objects with the minimal number of queries
+
+    Uses ``bulk_update`` on Django 2.2+ and falls back to an equivalent
+    ``UPDATE ... SET field = CASE WHEN ...`` query for each batch of objects
+    on older versions.
+
+    :param model: Django model class
+    :param objs: model objects to update
+    :param fields: the names of fields to update
+    :param batch_size: the number of objects updated with one query
+    """
+    if hasattr(QuerySet, 'bulk_update'):  # Django 2.2+
+        model._default_manager.bulk_update(objs, fields, batch_size=batch_size)
+        return
+    objs = list(objs)
+    if not objs:
+        return
+    fields = [model._meta.get_field(name) for name in fields]
+    connection = connections[router.db_for_write(model)]
+    max_batch_size = connection.ops.bulk_batch_size(['pk', 'pk'] + fields, objs)
+    batch_size = min(batch_size, max_batch_size) if batch_size else max_batch_size
+    queryset = model._default_manager.using(connection.alias)
+    with transaction.atomic(using=connection.alias, savepoint=False):
+        for batch in chunked(objs, max(batch_size, 1)):
+            queryset.filter(pk__in=[obj.pk for obj in batch]).update(**{
+                field.attname: Case(*[
+                    When(pk=obj.pk, then=Value(getattr(obj, field.attname),
+                                               output_field=field))
+                    for obj in batch
+                ], output_field=field)
+                for field in fields
+            })
+
+
+def _get_segments(block, language):
+    # type: (str, str) -> typing.Sequence[str]
+    """
+    Split a block of translatable content into translation segments
+
+    :param block: translatable block
+    :param language: content language
+    :return: translation segments
+    """
+    if not DISABLE_SEGMENTATION:
+        segmenter = get_segmenter()
+        if segmenter.is_supported_language(language):
+            return segmenter.segment_text(block, language)
+    return (block,)
+
+
+def _process_block(block, language, parser, metrics=None):
+    # type: (str, str, types.ModuleType, typing.Optional[Metrics]) -> list
+    """
+    Split a translatable block into segments and add inline XLIFF tags
+
+    Processed blocks are cached by their content.
+
+    :param block: translatable block
+    :param language: content language
+    :param parser: content parser
+    :param metrics: optional metrics for segmenting and tagging time
+    :return: the list of (segment, tagged segment) tuples
+    """
+    cache = get_block_cache()
+    if cache is not None:
+        key = make_key(CONTENT_TYPE, language, block, _get_segmenter_name())
+        segments = cache.get(key)
+        if segments is not None:
+            return segments
+    start = time.perf_counter()
+    raw_segments = _get_segments(block, language)
+    segmented = time.perf_counter()
+    segments = [(seg, parser.add_xliff_tags(seg)) for seg in raw_segments]
+    if metrics is not None:
+        metrics.add_time('segment_text', segmented - start)
+        metrics.add_time('add_xliff_tags', time.perf_counter() - segmented)
+    if cache is not None:
+        cache.set(key, segments)
+    return segments
+
+
+def _get_source_span(spans, start, end):
+    # type: (list, int, int) -> typing.Optional[typing.Tuple[int, int]]
+    """
+    Map a part of a translatable block to its location in the source content
+
+    :param spans: source spans of the block from ``parse_content_spans``
+    :param start: the start of the part in the block
+    :param end: the end of the part in the block
+    :return: (start, end) tuple of source offsets or ``None``
+        if the part cannot be mapped to the source
+    """
+    source_start = None
+    for block_start, block_end, span_start, span_end, exact in spans:
+        if span_start is None:
+            if source_start is not None or block_start <= start < block_end:
+                return None
+            continue
+        if source_start is None:
+            if not block_start <= start < block_end:
+                continue
+            if exact:
+                source_start = span_start + start - block_start
+            elif start == block_start:
+                source_start = span_start
+            else:
+                return None
+        if end <= block_end:
+            if exact:
+                return source_start, span_start + end - block_start
+            if end == block_end:
+                return source_start, span_end
+            return None
+    return None
+
+
+def process_object(obj, language, metrics=None):
+    # type: (dict, str, typing.Optional[Metrics]) -> list
+    """
+    Extract translation segments from translatable content of a model object
+
+    Skeleton templates for object fields are built in the same pass:
+    the content parser records the locations of translatable blocks
+    in a field value, and each segment is replaced with a placeholder
+    at its location. A template is a list of literal strings
+    alternating with indexes of segments that replace the text between them.
+    Segments that cannot be located, e.g. if a custom segmenter
+    has changed their text, are logged and not exported.
+
+    This function does not depend on segment numbering, so objects
+    can be processed independently, e.g. in worker processes.
+
+    :param obj: translatable content of a model object
+    :param language: content language
+    :param metrics: optional metrics that receive processing time
+        and the numbers of processed fields and blocks
+    :return: the list of (skeleton template, tagged segments) tuples
+        for object fields
+    """
+    parser = get_content_parser()
+    processed_fields = []
+    for field in obj['fields']:
+        value = field['value']
+        template = []
+        tagged_segments = []
+        pos = 0
+        start = time.perf_counter()
+        blocks = list(parser.parse_content_spans(value))
+        if metrics is not None:
+            metrics.add_time('parse_content', time.perf_counter() - start)
+            metrics.count('fields')
+            metrics.count('blocks', len(blocks))
+        for block, spans in blocks:
+            block_pos = 0
+            for seg, tagged_seg in _process_block(block, language, parser,
+                                                  metrics):
+                idx = block.find(seg, block_pos)
+                source_span = None
+                if idx != -1:
+                    block_pos = idx + len(seg)
+                    source_span = _get_source_span(spans, idx, block_pos)
+                if source_span is None or source_span[0] < pos:
+                    logging.warning(
+                        'Cannot locate segment "%s" in field "%s" of object %s,'
+                        ' the segment is not exported!',
+                        seg, field['name'], obj['id']
+                    )
+                    continue
+                template.append(value[pos:source_span[0]])
+                template.append(len(tagged_segments))
+                pos = source_span[1]
+                tagged_segments.append(tagged_seg)
+        template.append(value[pos:])
+        processed_fields.append((template, tagged_segments))
+    return processed_fields
+
+
+def _process_objects(objects, language):
+    # type: (list, str) -> tuple
+    """
+    Process a chunk of model objects in a worker process
+
+    :param objects: translatable content of model objects
+    :param language: content language
+    :return: a tuple of (the list of processed fields for each object,
+        processing timings, processing counters)
+    """
+    metrics = Metrics('process')
+    results = [process_object(obj, language, metrics) for obj in objects]
+    return results, metrics.timings, metrics.counters
+
+
+def _iter_processed_objects(objects, language, workers, batch_size,
+                            metrics=None):
+    # type: (typing.Iterable[dict], str, int, int, typing.Optional[Metrics]) -> types.GeneratorType
+    """
+    Process translatable content of model objects serially or in parallel
+
+    In parallel mode chunks of objects are sent to a pool of worker processes.
+    The number of chunks in flight is limited, and results are yielded
+    in the original order of objects.
+
+    :param objects: translatable content of model objects
+    :param language: content language
+    :param workers: the number of worker processes.
+        If less than 2, objects are processed in the current process.
+    :param batch_size: the number of objects sent to a worker at once
+    :param metrics: optional metrics for processing time. In parallel mode
+        it receives the sum of processing time in all worker processes.
+    :return: generator that yields (object, processed fields) tuples
+    """
+    if workers < 2:
+        for obj in objects:
+            yield obj, process_object(obj, language, metrics)
+        return
+
+    def get_results(future):
+        results, timings, counters = future.result()
+        if metrics is not None:
+            metrics.merge(timings, counters)
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunked(objects, batch_size):
+            pending.append(
+                (chunk, executor.submit(_process_objects, chunk, language))
+            )
+            if len(pending) > workers * 2:
+                chunk, future = pending.popleft()
+                yield from zip(chunk, get_results(future))
+        while pending:
+            chunk, future = pending.popleft()
+            yield from zip(chunk, get_results(future))
+
+
+def _add_sources(tagged_units):
+    # type: (typing.List[typing.Tuple[etree._Element, str]]) -> None
+    """
+    Add ``<source>`` elements with tagged segments to translation units
+
+    Segments without markup are added as text. Segments with inline
+    XLIFF tags are parsed in a single document, because parsing each
+    segment separately is dominated by parser setup. If the combined
+    document is invalid, segments are parsed one by one
+    to report the error for the invalid segment.
+
+    :param tagged_units: the list of (``<trans-unit>`` element,
+        segment with inline XLIFF tags) tuples
+    """
+    marked_units = []
+    for trans_unit, tagged_seg in tagged_units:
+        if xml_special_re.search(tagged_seg) is None:
+            etree.SubElement(trans_unit, 'source').text = tagged_seg or None
+        else:
+            marked_units.append((trans_unit, tagged_seg))
+    if not marked_units:
+        return
+    if len(marked_units) > 1:
+        try:
+            root = etree.fromstring('<sources>{}</sources>'.format(''.join(
+                '<source>{}</source>'.format(tagged_seg)
+                for _, tagged_seg in marked_units
+            )))
+        except SyntaxError:
+            pass
+        else:
+            sources = list(root)
+            # Segments must not contain text or elements outside <source>
+            if (len(sources) == len(marked_units) and root.text is None and
+                    all(source.tag == 'source' and source.tail is None
+                        for source in sources)):
+                for (trans_unit, _), source in zip(marked_units, sources):
+                    trans_unit.append(source)
+                return
+    for trans_unit, tagged_seg in marked_units:
+        trans_unit.append(
+            etree.fromstring('<source>{}</source>'.format(tagged_seg))
+        )
+
+
+def _create_object_group(obj, processed_fields, translation_data, segment_id):
+    # type: (dict, list, dict, int) -> tuple
+    """
+    Create a XLIFF group element for a single model object
+
+    :param obj: translatable content of a model object
+    :param processed_fields: object fields processed by :func:`process_object`
+    :param translation_data: translation data for Django model objects
+    :param segment_id: the ID of the first translation segment in the group
+    :return: a tuple of (group element, skeleton fragment, next segment ID)
+    """
+    outer_group = etree.Element(
+        'group', {
+            'id': obj['id'],
+            'restype': 'x-django-model',
+            'resname': translation_data['name']
+        })
+    skeleton_fields = []
+    tagged_units = []
+    space_attr = '{{{}}}space'.format(XML_NS)
+    for field, (template, tagged_segments) in zip(obj['fields'],
+                                                   processed_fields):
+        inner_group = etree.SubElement(
+            outer_group, 'group', {
+                'restype': 'x-django-model-field',
+                'resname': field['name']
+            })
+        for i, tagged_seg in enumerate(tagged_segments):
+            trans_unit = etree.SubElement(
+                inner_group, 'trans-unit', {
+                    'id': str(segment_id + i),
+                    space_attr: 'preserve'
+                })
+            tagged_units.append((trans_unit, tagged_seg))
+        skeleton_field = OrderedDict(field)
+        skeleton_field['value'] = ''.join(
+            item if isinstance(item, str)
+            else '%%%{}%%%'.format(segment_id + item)
+            for item in template
+        )
+        skeleton_fields.append(skeleton_field)
+        segment_id += len(tagged_segments)
+    _add_sources(tagged_units)
+    skeleton_obj = OrderedDict(obj)
+    skeleton_obj['fields'] = skeleton_fields
+    return outer_group, json.dumps(skeleton_obj), segment_id
+
+
+def _iter_file_chunks(fo, chunk_size):
+    # type: (typing.BinaryIO, int) -> types.GeneratorType
+    """
+    Read a file object from the beginning in chunks
+
+    :param fo: binary file object
+    :param chunk_size: chunk size in bytes
+    :return: generator that yields file chunks
+    """
+    fo.seek(0)
+    chunk = fo.read(chunk_size)
+    while chunk:
+        yield chunk
+        chunk = fo.read(chunk_size)
+
+
+class _ChunkBuffer:
+    """
+    File-like object that accumulates written data until it is consumed
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(data)
+
+    def pop(self):
+        # type: () -> bytes
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _spool_xliff_file(translation_data, workers, batch_size, stats, stack,
+                      metrics):
+    # type: (dict, int, int, typing.Optional[dict], ExitStack, Metrics) -> typing.Tuple[typing.BinaryIO, typing.BinaryIO]
+    """
+    Process translatable objects of a single model and write the skeleton
+    and ``<body>`` contents to temporary spool files
+
+    :param translation_data: translation data for Django model objects
+    :param workers: the number of worker processes
+    :param batch_size: the number of objects sent to a worker process at once
+    :param stats: optional dictionary for exported objects
+        and segments counters
+    :param stack: exit stack that closes the spool files
+    :param metrics: export metrics
+    :return: skeleton and body spool files
+    """
+    header = OrderedDict()
+    header['name'] = translation_data['name']
+    header['language'] = translation_data['language']
+    header['objects'] = []
+    skeleton_file = stack.enter_context(
+        SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    )
+    body_file = stack.enter_context(
+        SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    )
+    # Write the skeleton JSON without closing "]}"
+    skeleton_file.write(json.dumps(header)[:-2].encode('utf-8'))
+    segment_id = 1
+    i = -1
+    processed_objects = _iter_processed_objects(
+        metrics.timed_iter('fetch', translation_data['objects']),
+        translation_data['language'], workers, batch_size, metrics
+    )
+    clock = time.perf_counter
+    for i, (obj, processed_fields) in enumerate(processed_objects):
+        start = clock()
+        group, obj_skeleton, segment_id = _create_object_group(
+            obj, processed_fields, translation_data, segment_id
+        )
+        built = clock()
+        body_file.write(etree.tostring(group, encoding='utf-8'))
+        if i:
+            skeleton_file.write(b', ')
+        skeleton_file.write(obj_skeleton.encode('utf-8'))
+        metrics.add_time('build_xml', built - start)
+        metrics.add_time('serialize', clock() - built)
+    skeleton_file.write(b']}')
+    metrics.count('objects', i + 1)
+    metrics.count('segments', segment_id - 1)
+    if stats is not None:
+        stats['objects'] += i + 1
+        stats['segments'] += segment_id - 1
+    return skeleton_file, body_file
+
+
+def _store_skeleton(skeleton_file):
+    # type: (typing.BinaryIO) -> str
+    """
+    Store a XLIFF skeleton in the database
+
+    :param skeleton_file: skeleton spool file
+    :return: skeleton checksum
+    """
+    # Models cannot be imported before Django apps are loaded
+    from .models import XliffSkeleton
+    sha1 = hashlib.sha1()
+    compressor = zlib.compressobj()
+    parts = []
+    for chunk in _iter_file_chunks(skeleton_file, CHUNK_SIZE):
+        sha1.update(chunk)
+        parts.append(compressor.compress(chunk))
+    parts.append(compressor.flush())
+    checksum = sha1.hexdigest()
+    XliffSkeleton.objects.get_or_create(
+        checksum=checksum, defaults={'data': b''.join(parts)}
+    )
+    return checksum
+
+
+def _load_skeleton(checksum):
+    # type: (str) -> str
+    """
+    Load a XLIFF skeleton stored in the database
+
+    :param checksum: skeleton checksum
+    :return: skeleton JSON
+    :raises django.core.exceptions.ValidationError: if the skeleton
+        is not found
+    """
+    from .models import XliffSkeleton
+    try:
+        skeleton = XliffSkeleton.objects.get(checksum=checksum)
+    except XliffSkeleton.DoesNotExist:
+        raise ValidationError(_('XLIFF skeleton is not found on the server!'))
+    return zlib.decompress(bytes(skeleton.data)).decode('utf-8')
+
+
+def _iter_skeleton_base64(skeleton_file, chunk_size, compressed):
+    # type: (typing.BinaryIO, int, bool) -> types.GeneratorType
+    """
+    Encode a skeleton spool file to base64 incrementally
+
+    :param skeleton_file: skeleton spool file
+    :param chunk_size: max size of encoded chunks
+    :param compressed: compress the skeleton with zlib before encoding
+    :return: generator that yields base64-encoded chunks
+    """
+    # Base64 chunks can be concatenated only if
+    # their source size is a multiple of 3.
+    raw_size = chunk_size // 4 * 3
+    if not compressed:
+        for chunk in _iter_file_chunks(skeleton_file, raw_size):
+            yield b64encode(chunk).decode('ascii')
+        return
+    compressor = zlib.compressobj()
+    buffer = b''
+    for chunk in _iter_file_chunks(skeleton_file, raw_size):
+        buffer += compressor.compress(chunk)
+        size = len(buffer) // 3 * 3
+        if size:
+            yield b64encode(buffer[:size]).decode('ascii')
+            buffer = buffer[size:]
+    buffer += compressor.flush()
+    yield b64encode(buffer).decode('ascii')
+
+
+def _iter_xliff_document(spooled_files, chunk_size, target_language=None,
+                         skeleton_mode=SKELETON_BASE64):
+    # type: (list, int, typing.Optional[str], str) -> types.GeneratorType
+    """
+    Write a XLIFF document from spooled ``<file>`` contents incrementally
+
+    :param spooled_files: the list of (translation data, skeleton spool file,
+        body spool file, external skeleton checksum) tuples
+    :param chunk_size: the size of yielded chunks in bytes
+    :param target_language: optional ``target-language`` attribute value
+    :param skeleton_mode: skeleton storage mode
+    :return: generator that yields XLIFF file contents as UTF-8 encoded chunks
+    """
+    output = _ChunkBuffer()
+    with etree.xmlfile(output) as xf:
+        with xf.element('xliff', {'version': '1.2'}):
+            for (translation_data, skeleton_file, body_file,
+                 skeleton_id) in spooled_files:
+                file_attrib = {
+                    'original': translation_data['name'],
+                    'datatype': 'database',
+                    'source-language': translation_data['language']
+                }
+                if target_language is not None:
+                    file_attrib['target-language'] = target_language
+                with xf.element('file', file_attrib):
+                    with xf.element('header'):
+                        xf.write(etree.Element('tool', {
+                            'tool-id': 'django-modeltranslation-xliff',
+                            'tool-name': 'XLIFF Exchange for django-modeltranslation'
+                        }))
+                        with xf.element('skl'):
+                            if skeleton_id is not None:
+                                xf.write(etree.Element('external-file', {
+                                    'href': EXTERNAL_SKELETON_PREFIX + skeleton_id,
+                                    'uid': skeleton_id
+                                }))
+                            else:
+                                compressed = skeleton_mode == SKELETON_ZLIB
+                                form = ZLIB_FORM if compressed else 'base64'
+                                with xf.element('internal-file', {'form': form}):
+                                    for chunk in _iter_skeleton_base64(
+                                            skeleton_file, chunk_size,
+                                            compressed):
+                                        xf.write(chunk)
+                                        xf.flush()
+                                        yield output.pop()
+                    with xf.element('body'):
+                        xf.flush()
+                        yield output.pop()
+                        yield from _iter_file_chunks(body_file, chunk_size)
+    yield output.pop()
+
+
+def _spool_xliff_files(translation_data, workers, batch_size, stats, stack,
+                       skeleton_mode, metrics):
+    # type: (typing.Union[dict, typing.Sequence[dict]], typing.Optional[int], typing.Optional[int], typing.Optional[dict], ExitStack, str, Metrics) -> list
+    """
+    Process translation data for one or several models
+
+    :param translation_data: translation data for Django model objects
+        or a list of translation data for several models
+    :param workers: the number of worker processes
+    :param batch_size: the number of objects sent to a worker process at once
+    :param stats: optional dictionary for exported objects
+        and segments counters
+    :param stack: exit stack that closes the spool files
+    :param skeleton_mode: skeleton storage mode. Skeletons are saved
+        to the database in ``'external'`` mode.
+    :param metrics: export metrics
+    :return: the list of (translation data, skeleton spool file,
+        body spool file, external skeleton checksum) tuples
+    """
+    if skeleton_mode not in (SKELETON_BASE64, SKELETON_ZLIB, SKELETON_EXTERNAL):
+        raise ValueError('Unknown skeleton mode: "{}"!'.format(skeleton_mode))
+    if workers is None:
+        workers = EXPORT_WORKERS
+    if batch_size is None:
+        batch_size = EXPORT_BATCH_SIZE
+    if isinstance(translation_data, dict):
+        translation_data = (translation_data,)
+    if stats is not None:
+        stats.update(objects=0, segments=0)
+    spooled_files = []
+    with metrics.count_queries():
+        for file_data in translation_data:
+            skeleton_file, body_file = _spool_xliff_file(
+                file_data, workers, batch_size, stats, stack, metrics
+            )
+            skeleton_id = None
+            if skeleton_mode == SKELETON_EXTERNAL:
+                with metrics.timer('store_skeleton'):
+                    skeleton_id = _store_skeleton(skeleton_file)
+            spooled_files.append(
+                (file_data, skeleton_file, body_file, skeleton_id)
+            )
+    return spooled_files
+
+
+def iter_xliff(translation_data, chunk_size=CHUNK_SIZE, workers=None,
+               batch_size=None, stats=None, target_language=None,
+               skeleton_mode=None):
+    # type: (typing.Union[dict, typing.Sequence[dict]], int, typing.Optional[int], typing.Optional[int], typing.Optional[dict], typing.Optional[str], typing.Optional[str]) -> types.GeneratorType
+    """
+    Create a XLIFF file from model translation data incrementally
+
+    ``translation_data['objects']`` can be any iterable, e.g. a generator
+    that fetches objects from a database. Each object is converted to
+    a ``<group>`` element as soon as it is received and written to a temporary
+    spool file along with its skeleton fragment, so memory consumption
+    does not depend on the number of objects. The XLIFF skeleton precedes
+    ``<body>`` so the file contents are yielded after all objects are processed.
+
+    Objects can be processed in parallel by a pool of worker processes.
+    Segments are numbered in the original order of objects, so the result
+    is identical to serial processing.
+
+    Translation data for several models can be passed as a list.
+    In this case each model is exported to a separate ``<file>`` element
+    of the same XLIFF document.
+
+    :param translation_data: translation data for Django model objects
+        or a list of translation data for several models
+    :param chunk_size: the size of yielded chunks in bytes
+    :param workers: the number of worker processes
+        (default: ``XLIFF_EXCHANGE_EXPORT_WORKERS`` setting)
+    :param batch_size: the number of objects sent to a worker process at once
+        (default: ``XLIFF_EXCHANGE_EXPORT_BATCH_SIZE`` setting)
+    :param stats: optional dictionary that receives the numbers
+        of exported ``'objects'`` and ``'segments'``
+    :param target_language: optional target language code
+        for ``target-language`` attribute of ``<file>`` elements
+    :param skeleton_mode: ``'base64'`` for an inline skeleton,
+        ``'zlib'`` for an inline zlib-compressed skeleton or ``'external'``
+        for a skeleton stored in the database
+        (default: ``XLIFF_EXCHANGE_SKELETON_MODE`` setting)
+    :return: generator that yields XLIFF file contents as UTF-8 encoded chunks
+    """
+    if skeleton_mode is None:
+        skeleton_mode = SKELETON_MODE
+    metrics = Metrics('export')
+    with ExitStack() as stack:
+        spooled_files = _spool_xliff_files(translation_data, workers,
+                                           batch_size, stats, stack,
+                                           skeleton_mode, metrics)
+        for chunk in metrics.timed_iter(
+                'serialize', _iter_xliff_document(spooled_files, chunk_size,
+                                                  target_language,
+                                                  skeleton_mode)):
+            metrics.count('bytes', len(chunk))
+            yield chunk
+    metrics.report()
+
+
+def iter_xliff_archive(translation_data, target_languages, name,
+                       chunk_size=CHUNK_SIZE, workers=None, batch_size=None,
+                       stats=None, skeleton_mode=None):
+    # type: (typing.Union[dict, typing.Sequence[dict]], typing.Iterable[str], str, int, typing.Optional[int], typing.Optional[int], typing.Optional[dict], typing.Optional[str]) -> types.GeneratorType
+    """
+    Create a ZIP archive with XLIFF files for several target languages
+    incrementally
+
+    Translatable content is parsed, segmented and tagged only once,
+    and then a XLIFF file with ``target-language`` attribute is written
+    to the archive for each target language.
+
+    :param translation_data: translation data for Django model objects
+        or a list of translation data for several models
+    :param target_languages: target language codes
+    :param name: XLIFF file name prefix. Files in the archive are named
+        ``<name>_<language>.xlf``.
+    :param chunk_size: the size of XLIFF chunks in bytes
+    :param workers: the number of worker processes
+        (default: ``XLIFF_EXCHANGE_EXPORT_WORKERS`` setting)
+    :param batch_size: the number of objects sent to a worker process at once
+        (default: ``XLIFF_EXCHANGE_EXPORT_BATCH_SIZE`` setting)
+    :param stats: optional dictionary that receives the numbers
+        of exported ``'objects'`` and ``'segments'`` per language
+    :param skeleton_mode: skeleton storage mode
+        (default: ``XLIFF_EXCHANGE_SKELETON_MODE`` setting)
+    :return: generator that yields ZIP archive contents
+    """
+    if skeleton_mode is None:
+        skeleton_mode = SKELETON_MODE
+    metrics = Metrics('export')
+    with ExitStack() as stack:
+        spooled_files = _spool_xliff_files(translation_data, workers,
+                                           batch_size, stats, stack,
+                                           skeleton_mode, metrics)
+        archive = iter_zip(
+            ('{}_{}.xlf'.format(name, language),
+             _iter_xliff_document(spooled_files, chunk_size, language,
+                                  skeleton_mode))
+            for language in target_languages
+        )
+        # Serialization time includes compression of the archive
+        for chunk in metrics.timed_iter('serialize', archive):
+            metrics.count('bytes', len(chunk))
+            yield chunk
+    metrics.report()
+
+
 def create_xliff(translation_data):
-    # type: (dict) -> str
+    # type: (typing.Union[dict, typing.Sequence[dict]]) -> str
     """
     Create a XLIFF file from model translation data
 
     :param translation_data: translation data for Django model objects
+        or a list of translation data for several models
     :return: XLIFF file contents
     """
-    XML = 'http://www.w3.org/XML/1998/namespace'
-    parser = get_content_parser()
-    xliff = etree.Element('xliff', {'version': '1.2'}, nsmap={'xml': XML})
-    file_ = etree.SubElement(xliff, 'file', {
-        'original': translation_data['name'],
-        'datatype': 'database',
-        'source-language': translation_data['language']
-    })
-    header = etree.SubElement(file_, 'header')
-    etree.SubElement(header, 'tool', {
-        'tool-id': 'django-modeltranslation-xliff',
-        'tool-name': 'XLIFF Exchange for django-modeltranslation'
-    })
-    skl = etree.SubElement(header, 'skl')
-    internal_file = etree.SubElement(skl, 'internal-file', {'form': 'base64'})
-    skeleton = json.dumps(translation_data)
-    body = etree.SubElement(file_, 'body')
-    segment_id = 1
-    for obj in translation_data['objects']:
-        outer_group = etree.SubElement(
-            body, 'group', {
-                'id': obj['id'],
-                'restype': 'x-django-model',
-                'resname': translation_data['name']
-            })
-        for field in obj['fields']:
-            inner_group = etree.SubElement(
-                outer_group, 'group', {
-                    'restype': 'x-django-model-field',
-                    'resname': field['name']
-                })
-            content_blocks = parser.parse_content(field['value'])
-            for block in content_blocks:
-                if (not DISABLE_NLTK and
-                        is_supported_language(translation_data['language'])):
-                    segments = segment_text(block, translation_data['language'])
-                else:
-                    segments = (block,)
-                for seg in segments:
-                    skeleton = skeleton.replace(
-                        seg, '%%%{}%%%'.format(segment_id), 1
-                    )
-                    trans_unit = etree.SubElement(
-                        inner_group, 'trans-unit', {
-                            'id': str(segment_id),
-                            '{{{}}}space'.format(XML): 'preserve'
-                        })
-                    source = etree.fromstring('<source>{}</source>'.format(
-                        parser.add_xliff_tags(seg)
-                    ))
-                    trans_unit.append(source)
-                    segment_id += 1
-        internal_file.text = b64encode(skeleton.encode('utf-8')).decode('ascii')
-    return etree.tostring(xliff, encoding='unicode')
+    return b''.join(iter_xliff(translation_data)).decode('utf-8')
+
+
+def _escape_text(text):
+    # type: (str) -> str
+    return text.replace('&', '&amp;').replace('<', '&lt;')
+
+
+def _add_element_text(elem, native, is_html, parts):
+    # type: (etree._Element, bool, bool, list) -> None
+    """
+    Add text of an inline element and of all its descendants to parts
+
+    The element's own tail is not added.
+    """
+    walker = etree.iterwalk(elem, events=('start', 'end'))
+    # Native code flags of the elements being walked
+    native_stack = [native]
+    for event, child in walker:
+        native = native_stack[-1]
+        if event == 'start':
+            tag = child.tag
+            if isinstance(tag, str):  # Skip comment text
+                native = native or tag in NATIVE_CODE_TAGS
+                text = child.text
+                if text:
+                    if native or not is_html:
+                        parts.append(text)
+                    elif tag == 'ph':
+                        parts.append(escape(text, quote=False))
+                    else:
+                        parts.append(_escape_text(text))
+            native_stack.append(native)
+            continue
+        native_stack.pop()
+        if child is elem:
+            break
+        tail = child.tail
+        if tail:
+            if native_stack[-1] or not is_html:
+                parts.append(tail)
+            else:
+                parts.append(_escape_text(tail))
 
 
 def get_inner_text(elem):
     # type: (etree.Element) -> str
     """
-    Extract Element's inner content as a string
+    Reconstruct translated content from a ``<target>`` element
+
+    The element is walked once without recursion. Contents of ``<bpt>``,
+    ``<ept>`` and ``<it>`` elements are native code, e.g. HTML tags,
+    and are restored as is. For HTML content, entity references
+    from ``<ph>`` elements and characters that are not allowed in HTML
+    text are escaped, because ElementTree unescapes text content.
+    Other inline elements, e.g. ``<g>``, are replaced with their contents,
+    and comments are dropped.
 
     :param elem: :class:`Element <xml.etree.ElementTree.Element>`
     :return: Element's content
     """
+    is_html = CONTENT_TYPE in HTML_CONTENT_TYPES
     text = elem.text or ''
-    # ElementTree unescapes text content so we need to re-escape entities
-    # that are preserved by the HTML parser.
-    if CONTENT_TYPE == 'html' and text in FORBIDDEN_CHARS:
-        text = escape(text)
-    for child in list(elem):
-        text += get_inner_text(child)
-    tail = elem.tail or ''
-    if CONTENT_TYPE == 'html' and tail in FORBIDDEN_CHARS:
-        tail = escape(tail)
-    text += tail
-    return text
+    if is_html:
+        text = _escape_text(text)
+    if not len(elem):
+        return text
+    parts = [text]
+    # Inline elements created on export are not nested,
+    # so nested ones are walked separately.
+    for child in elem:
+        tag = child.tag
+        if len(child):
+            _add_element_text(child, False, is_html, parts)
+        elif isinstance(tag, str):  # Skip comment text
+            text = child.text
+            if text:
+                if not is_html or tag in NATIVE_CODE_TAGS:
+                    parts.append(text)
+                elif tag == 'ph':
+                    parts.append(escape(text, quote=False))
+                else:
+                    parts.append(_escape_text(text))
+        tail = child.tail
+        if tail:
+            parts.append(_escape_text(tail) if is_html else tail)
+    return ''.join(parts)
 
 
-def import_xliff(xliff):
-    # type: (bytes) -> dict
+def fill_placeholders(obj, translations):
+    # type: (dict, dict) -> None
     """
-    Extract translation data from a translated XLIFF file
+    Replace segment placeholders in skeleton field values with translations
 
-    :param xliff: XLIFF file as :class:`bytes` string
-    :return: translation data
+    Each field value is processed in a single pass. Placeholders
+    without translations are left intact.
+
+    :param obj: model object data restored from a XLIFF skeleton
+    :param translations: segment ID -> translation mapping
     """
-    xliff_elem = etree.fromstring(xliff)
-    tool = xliff_elem.find('./file/header/tool')
+    def replace(match):
+        return translations.get(match.group(1), match.group(0))
+
+    for field in obj['fields']:
+        field['value'] = placeholder_re.sub(replace, field['value'])
+
+
+def _iter_translated_objects(events, skeleton_objects, stats=None):
+    # type: (typing.Iterator, list, typing.Optional[dict]) -> types.GeneratorType
+    """
+    Restore translated model objects from the body of a XLIFF file
+
+    :param events: iterparse events positioned at the beginning of ``<body>``
+    :param skeleton_objects: model objects from the XLIFF skeleton
+    :param stats: optional dictionary for processed objects
+        and segments counters
+    :return: generator that yields translated model objects
+    """
+    # Reversed list allows to release processed objects with O(1) pop().
+    skeleton_objects.reverse()
+    translations = {}
+    for event, elem in events:
+        if event != 'end':
+            continue
+        if elem.tag == 'body':
+            break
+        if elem.tag == 'trans-unit':
+            segment_id = elem.attrib.get('id')
+            if not segment_id:
+                raise ValidationError(_('Invalid XLIFF file!'))
+            target = elem.find('target')
+            if target is None:
+                raise ValidationError(
+                    _('Missing translation for segment #{}!').format(segment_id)
+                )
+            translations[segment_id] = get_inner_text(target)
+            elem.clear()
+        elif (elem.tag == 'group' and
+              elem.attrib.get('restype') == 'x-django-model'):
+            if (not skeleton_objects or
+                    skeleton_objects[-1]['id'] != elem.attrib.get('id')):
+                raise ValidationError(_('Invalid XLIFF file!'))
+            obj = skeleton_objects.pop()
+            fill_placeholders(obj, translations)
+            if stats is not None:
+                stats['objects'] += 1
+                stats['segments'] += len(translations)
+            translations = {}
+            elem.clear()
+            # Remove processed groups from the partially built tree
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+            yield obj
+    if skeleton_objects:
+        raise ValidationError(_('Invalid XLIFF file!'))
+
+
+def _parse_file_header(events, stats=None):
+    # type: (typing.Iterator, typing.Optional[dict]) -> typing.Optional[dict]
+    """
+    Parse the header of the next ``<file>`` element of a XLIFF file
+
+    :param events: iterparse events
+    :param stats: optional dictionary for imported objects
+        and segments counters
+    :return: translation data with ``'objects'`` item as a generator
+        or ``None`` if there are no more ``<file>`` elements
+    :raises django.core.exceptions.ValidationError: if the XLIFF file
+        is invalid
+    """
+    tool_id = target_language = skeleton = None
+    file_found = False
+    for event, elem in events:
+        if event == 'start':
+            if elem.tag == 'file':
+                file_found = True
+                target_language = elem.attrib.get('target-language')
+            elif elem.tag == 'body':
+                break
+        elif elem.tag == 'tool':
+            tool_id = elem.attrib.get('tool-id')
+        elif elem.tag == 'internal-file' and elem.text:
+            form = elem.attrib.get('form')
+            if form == 'base64':
+                skeleton = b64decode(elem.text.encode('ascii')).decode('utf-8')
+            elif form == ZLIB_FORM:
+                try:
+                    skeleton = zlib.decompress(
+                        b64decode(elem.text.encode('ascii'))
+                    ).decode('utf-8')
+                except zlib.error:
+                    raise ValidationError(_('Invalid XLIFF file!'))
+            elem.clear()
+        elif elem.tag == 'external-file':
+            href = elem.attrib.get('href', '')
+            if href.startswith(EXTERNAL_SKELETON_PREFIX):
+                skeleton = _load_skeleton(href[len(EXTERNAL_SKELETON_PREFIX):])
+        elif elem.tag == 'file':
+            # Release processed <file> elements
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+    if not file_found:
+        return None
     # Basic sanity check
-    if tool is None or tool.attrib.get('tool-id') != 'django-modeltranslation-xliff':
-        raise ValidationError('Invalid XLIFF file!')
-    file_ = xliff_elem.find('file')
-    target_language = file_.attrib.get('target-language')
+    if tool_id != 'django-modeltranslation-xliff':
+        raise ValidationError(_('Invalid XLIFF file!'))
     if not target_language:
         raise ValidationError(_('The XLIFF file has no target language defined!'))
-    target_language = target_language.lower().replace('_', '-')
-    internal_file = file_.find('./header/skl/internal-file[@form="base64"]')
-    if internal_file is None:
+    if skeleton is None:
         raise ValidationError(_('Invalid XLIFF file!'))
-    skeleton = b64decode(internal_file.text.encode('ascii')).decode('utf-8')
-    trans_units = file_.findall('.//trans-unit')
-    for tu in trans_units:
-        segment_id = tu.attrib.get('id')
-        if not segment_id:
-            raise ValidationError(_('Invalid XLIFF file!'))
-        target = tu.find('target')
-        if target is None:
-            raise ValidationError(
-                _('Missing translation for segment #{}!').format(segment_id)
-            )
-        translation = get_inner_text(target)
-        skeleton = skeleton.replace('%%%{}%%%'.format(segment_id), translation, 1)
     translation_data = json.loads(skeleton)
-    translation_data['language'] = target_language
+    translation_data['language'] = target_language.lower().replace('_', '-')
+    translation_data['objects'] = _iter_translated_objects(
+        events, translation_data['objects'], stats
+    )
+    return translation_data
+
+
+def iterparse_xliff_files(fo, stats=None, metrics=None):
+    # type: (typing.BinaryIO, typing.Optional[dict], typing.Optional[Metrics]) -> types.GeneratorType
+    """
+    Extract translation data for all ``<file>`` elements of a translated
+    XLIFF file incrementally
+
+    Each ``<file>`` element contains translations for a single model.
+    Translated objects of a file must be consumed before requesting
+    the next file, otherwise the remaining objects are skipped.
+
+    :param fo: XLIFF file as a binary file object
+    :param stats: optional dictionary that receives the numbers
+        of imported ``'objects'`` and ``'segments'`` in all files
+        as the objects are consumed. Existing counters are incremented.
+    :param metrics: optional import metrics that receive XLIFF parsing time
+    :return: generator that yields translation data for each model
+        with ``'objects'`` item as a generator
+    :raises django.core.exceptions.ValidationError: if the XLIFF file
+        is invalid
+    """
+    if metrics is None:
+        # Parsing time is not collected
+        metrics = Metrics('parse')
+    events = etree.iterparse(fo, events=('start', 'end'),
+                             huge_tree=IMPORT_HUGE_TREE)
+    if stats is not None:
+        stats.setdefault('objects', 0)
+        stats.setdefault('segments', 0)
+    with metrics.timer('parse'):
+        translation_data = _parse_file_header(events, stats)
+    if translation_data is None:
+        raise ValidationError(_('Invalid XLIFF file!'))
+    while translation_data is not None:
+        translation_data['objects'] = metrics.timed_iter(
+            'parse', translation_data['objects']
+        )
+        yield translation_data
+        # Skip unconsumed objects
+        deque(translation_data['objects'], maxlen=0)
+        with metrics.timer('parse'):
+            translation_data = _parse_file_header(events, stats)
+
+
+def iterparse_xliff(fo, stats=None):
+    # type: (typing.BinaryIO, typing.Optional[dict]) -> dict
+    """
+    Extract translation data from a translated XLIFF file incrementally
+
+    The XLIFF header is parsed immediately, and translated model objects
+    are provided as a generator that parses ``<body>`` of the XLIFF file
+    group by group, releasing processed elements. This way only
+    the skeleton and a single model object are kept in memory
+    regardless of the number of translation units.
+
+    Only the first ``<file>`` element is processed. Use
+    :func:`iterparse_xliff_files` for XLIFF files with several models.
+
+    :param fo: XLIFF file as a binary file object
+    :param stats: optional dictionary that receives the numbers
+        of imported ``'objects'`` and ``'segments'`` as the objects
+        are consumed
+    :return: translation data with ``'objects'`` item as a generator
+    :raises django.core.exceptions.ValidationError: if the XLIFF file
+        is invalid
+    """
+    return next(iterparse_xliff_files(fo, stats))
+
+
+def import_xliff(xliff):
+    # type: (bytes) -> dict
+    """
+    Extract translation data from a translated XLIFF file
+
+    :param xliff: XLIFF file as :class:`bytes` string
+    :return: translation data
+    """
+    metrics = Metrics('import')
+    metrics.count('bytes', len(xliff))
+    with metrics.count_queries():
+        translation_data = next(
+            iterparse_xliff_files(BytesIO(xliff), metrics.counters, metrics)
+        )
+        translation_data['objects'] = list(translation_data['objects'])
+    metrics.report()
     return translation_data
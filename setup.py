@@ -8,7 +8,13 @@ with open('README.rst', 'r', encoding='utf-8') as fo:
 setup(
     name='django-modeltranslation-xliff',
     version=VERSION,
-    packages=['modeltranslation_xliff'],
+    packages=[
+        'modeltranslation_xliff',
+        'modeltranslation_xliff.management',
+        'modeltranslation_xliff.management.commands',
+        'modeltranslation_xliff.migrations',
+        'modeltranslation_xliff.parsers',
+    ],
     url='https://github.com/romanvm/django-modeltranslation-xliff',
     license='MIT',
     author='Roman Miroshnychenko',
@@ -20,9 +26,9 @@ setup(
     install_requires=[
         'Django>=1.11',
         'django-modeltranslation>=0.13b1',
-        'nltk',
         'lxml',
     ],
+    extras_require={'nltk': ['nltk']},
     setup_requires=['pytest-runner'],
     test_require=['pytest', 'pytest-cov', 'pytest-django'],
     zip_safe=False,
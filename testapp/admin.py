@@ -1,9 +1,14 @@
 from django.contrib import admin
 from modeltranslation.admin import TabbedTranslationAdmin
 from modeltranslation_xliff import XliffExchangeMixin
-from .models import Article
+from .models import Article, Block
 
 
 @admin.register(Article)
 class ArticleAdmin(XliffExchangeMixin, TabbedTranslationAdmin):
     list_display = ('title',)
+
+
+@admin.register(Block)
+class BlockAdmin(XliffExchangeMixin, TabbedTranslationAdmin):
+    list_display = ('article',)
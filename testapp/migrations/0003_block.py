@@ -0,0 +1,28 @@
+# Generated by Django 2.1.15 on 2026-10-17 06:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+import tinymce.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp', '0002_auto_20180909_0120'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Block',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', tinymce.models.HTMLField()),
+                ('text_en_us', tinymce.models.HTMLField(null=True)),
+                ('text_ru_ru', tinymce.models.HTMLField(null=True)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='testapp.Article')),
+            ],
+            options={
+                'ordering': ['pk'],
+            },
+        ),
+    ]
@@ -8,3 +8,12 @@ class Article(models.Model):
 
     class Meta:
         ordering = ['pk']
+
+
+class Block(models.Model):
+    article = models.ForeignKey(Article, on_delete=models.CASCADE,
+                                related_name='blocks')
+    text = HTMLField()
+
+    class Meta:
+        ordering = ['pk']
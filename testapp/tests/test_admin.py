@@ -1,8 +1,10 @@
 from io import BytesIO
 from unittest import mock
 import pytest
+from django.contrib import admin
 from django.contrib.messages import INFO, ERROR
 from django.urls import reverse
+from lxml import etree
 from testapp.admin import ArticleAdmin
 from testapp.models import Article
 from .data import XLIFF_EN, XLIFF_RU, TEST_DATA_RU
@@ -24,11 +26,24 @@ def test_export_xliff(admin_client):
     assert response.content == XLIFF_EN.encode('utf-8')
 
 
+@pytest.mark.usefixtures('populate_db')
+@mock.patch('modeltranslation_xliff.admin.STREAMING_EXPORT', True)
+def test_export_xliff_streaming(admin_client):
+    data = {
+        'action': 'export_xliff',
+        '_selected_action': [str(obj.pk) for obj in Article.objects.filter(pk__lte=2)]
+    }
+    response = admin_client.post(reverse('admin:testapp_article_changelist'),
+                                 data=data)
+    assert response.streaming
+    assert b''.join(response.streaming_content) == XLIFF_EN.encode('utf-8')
+
+
 @pytest.mark.usefixtures('populate_db')
 @mock.patch.object(ArticleAdmin, 'message_user', side_effect=catch_error_message)
 def test_import_xliff(_, admin_client):
     data = {'_upload-xliff': BytesIO(XLIFF_RU.encode('utf-8'))}
-    response = admin_client.post(reverse('admin:import_xliff'), data=data)
+    response = admin_client.post(reverse('admin:testapp_article_import_xliff'), data=data)
     assert response.status_code == 302
     article = Article.objects.get(pk=1)
     assert getattr(article, 'title_ru_ru') == TEST_DATA_RU['objects'][0]['fields'][0]['value']
@@ -38,16 +53,329 @@ def test_import_xliff(_, admin_client):
 @mock.patch.object(ArticleAdmin, 'message_user', side_effect=catch_error_message)
 def test_import_xliff_no_file(_, admin_client):
     with pytest.raises(AssertionError):
-        admin_client.post(reverse('admin:import_xliff'), data={})
+        admin_client.post(reverse('admin:testapp_article_import_xliff'), data={})
 
 
 @mock.patch.object(ArticleAdmin, 'message_user', side_effect=catch_error_message)
 def test_import_xliff_empty_file(_, admin_client):
     with pytest.raises(AssertionError):
-        admin_client.post(reverse('admin:import_xliff'),
+        admin_client.post(reverse('admin:testapp_article_import_xliff'),
                           data={'_upload-xliff': BytesIO()})
 
 
 def test_import_xliff_ivalid_method(admin_client):
-    response = admin_client.get(reverse('admin:import_xliff'))
+    response = admin_client.get(reverse('admin:testapp_article_import_xliff'))
     assert response.status_code == 405
+
+
+@pytest.mark.django_db
+def test_update_translations():
+    a1 = Article.objects.create(title='First', text='First text.')
+    a2 = Article.objects.create(title='Second', text='Second text.')
+    translation_data = {
+        'name': 'Article',
+        'language': 'ru-ru',
+        'objects': [
+            {'id': str(a2.pk), 'fields': [
+                {'name': 'title', 'value': 'Второй'},
+                {'name': 'text', 'value': 'Второй текст.'}
+            ]},
+            {'id': '0', 'fields': [{'name': 'title', 'value': 'Удалённый'}]},
+            {'id': str(a1.pk), 'fields': [
+                {'name': 'title', 'value': 'Первый'},
+                {'name': 'text', 'value': 'Первый текст.'}
+            ]},
+        ]
+    }
+    with mock.patch('modeltranslation_xliff.admin.IMPORT_BATCH_SIZE', 2):
+        ArticleAdmin(Article, admin.site)._update_translations(translation_data)
+    a1.refresh_from_db()
+    a2.refresh_from_db()
+    assert (a1.title_ru_ru, a1.text_ru_ru) == ('Первый', 'Первый текст.')
+    assert (a2.title_ru_ru, a2.text_ru_ru) == ('Второй', 'Второй текст.')
+
+
+@pytest.mark.django_db
+@mock.patch('modeltranslation_xliff.admin.STREAMING_EXPORT', True)
+def test_export_xliff_changes(admin_client):
+    a1 = Article.objects.create(title='First', text='First text.')
+    a2 = Article.objects.create(title='Second', text='Second text.')
+    data = {
+        'action': 'export_xliff_changes',
+        '_selected_action': [str(a1.pk), str(a2.pk)]
+    }
+    url = reverse('admin:testapp_article_changelist')
+    # Content is not marked as exported if the download is aborted
+    response = admin_client.post(url, data=data)
+    next(iter(response))
+    response.close()
+    response = admin_client.post(url, data=data)
+    xliff = etree.fromstring(b''.join(response.streaming_content))
+    assert len(xliff.findall('.//trans-unit')) == 4
+    a2.text = 'Changed text.'
+    a2.save()
+    response = admin_client.post(url, data=data)
+    xliff = etree.fromstring(b''.join(response.streaming_content))
+    groups = xliff.findall('./file/body/group')
+    assert [g.attrib['id'] for g in groups] == [str(a2.pk)]
+    assert [g.attrib['resname'] for g in groups[0]] == ['text']
+    response = admin_client.post(url, data=data)
+    xliff = etree.fromstring(b''.join(response.streaming_content))
+    assert xliff.find('./file/body/group') is None
+
+
+@pytest.mark.django_db
+@mock.patch('modeltranslation_xliff.admin.BACKGROUND_JOBS', True)
+@mock.patch('modeltranslation_xliff.jobs.JOB_WORKER', 'command')
+def test_xliff_views_permissions(client, django_user_model, settings, tmpdir):
+    from django.contrib.contenttypes.models import ContentType
+    from modeltranslation_xliff.models import XliffJob
+    settings.MEDIA_ROOT = str(tmpdir)
+    user = django_user_model.objects.create_user('staff', password='staff',
+                                                 is_staff=True)
+    client.force_login(user)
+    data = {'_upload-xliff': BytesIO(XLIFF_RU.encode('utf-8'))}
+    response = client.post(reverse('admin:testapp_article_import_xliff'),
+                           data=data)
+    assert response.status_code == 403
+    assert not XliffJob.objects.exists()
+    job = XliffJob.objects.create(
+        kind=XliffJob.EXPORT, status=XliffJob.DONE,
+        content_type=ContentType.objects.get_for_model(Article)
+    )
+    for name in ('xliff_job', 'xliff_job_download'):
+        response = client.get(reverse('admin:testapp_article_' + name,
+                                      args=(job.pk,)))
+        assert response.status_code == 403
+    client.logout()
+    response = client.post(reverse('admin:testapp_article_import_xliff'),
+                           data=data)
+    assert response.status_code == 302
+    assert '/login/' in response['Location']
+
+
+@pytest.mark.usefixtures('populate_db')
+@mock.patch('modeltranslation_xliff.admin.BACKGROUND_JOBS', True)
+@mock.patch('modeltranslation_xliff.jobs.JOB_WORKER', 'command')
+def test_export_xliff_background_job(admin_client, settings, tmpdir):
+    from modeltranslation_xliff.jobs import run_pending_jobs
+    from modeltranslation_xliff.models import XliffJob
+    settings.MEDIA_ROOT = str(tmpdir)
+    data = {
+        'action': 'export_xliff',
+        '_selected_action': [str(obj.pk) for obj in Article.objects.filter(pk__lte=2)]
+    }
+    response = admin_client.post(reverse('admin:testapp_article_changelist'),
+                                 data=data)
+    assert response.status_code == 302
+    job = XliffJob.objects.latest('pk')
+    assert job.status == XliffJob.PENDING
+    assert response['Location'] == reverse('admin:testapp_article_xliff_job',
+                                           args=(job.pk,))
+    response = admin_client.get(response['Location'])
+    assert b'http-equiv="refresh"' in response.content
+    assert run_pending_jobs() == 1
+    job.refresh_from_db()
+    assert job.status == XliffJob.DONE
+    assert (job.processed, job.total) == (2, 2)
+    download_url = reverse('admin:testapp_article_xliff_job_download',
+                           args=(job.pk,))
+    response = admin_client.get(reverse('admin:testapp_article_xliff_job',
+                                        args=(job.pk,)))
+    assert b'http-equiv="refresh"' not in response.content
+    assert download_url.encode('utf-8') in response.content
+    response = admin_client.get(download_url)
+    assert b''.join(response.streaming_content) == XLIFF_EN.encode('utf-8')
+
+
+@pytest.mark.usefixtures('populate_db')
+@mock.patch('modeltranslation_xliff.admin.BACKGROUND_JOBS', True)
+@mock.patch('modeltranslation_xliff.jobs.JOB_WORKER', 'command')
+def test_import_xliff_background_job(admin_client, settings, tmpdir):
+    from modeltranslation_xliff.jobs import run_pending_jobs
+    from modeltranslation_xliff.models import XliffJob
+    settings.MEDIA_ROOT = str(tmpdir)
+    data = {'_upload-xliff': BytesIO(XLIFF_RU.encode('utf-8'))}
+    response = admin_client.post(reverse('admin:testapp_article_import_xliff'), data=data)
+    assert response.status_code == 302
+    assert run_pending_jobs() == 1
+    job = XliffJob.objects.latest('pk')
+    assert job.status == XliffJob.DONE, job.message
+    article = Article.objects.get(pk=1)
+    assert article.title_ru_ru == TEST_DATA_RU['objects'][0]['fields'][0]['value']
+    data = {'_upload-xliff': BytesIO(b'<xliff>')}
+    admin_client.post(reverse('admin:testapp_article_import_xliff'), data=data)
+    assert run_pending_jobs() == 1
+    job = XliffJob.objects.latest('pk')
+    assert job.status == XliffJob.FAILED
+    assert job.message
+
+
+@pytest.mark.django_db
+@mock.patch('modeltranslation_xliff.admin.EXPORT_CHUNK_SIZE', 1)
+def test_get_model_trans_source_columns():
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    article = Article.objects.create(title='First', text='First text.')
+    model_admin = ArticleAdmin(Article, admin.site)
+    with CaptureQueriesContext(connection) as queries:
+        translation_data = model_admin._get_model_trans_source(
+            Article.objects.filter(pk=article.pk), lazy=True
+        )
+        objects = list(translation_data['objects'])
+    assert objects == [{
+        'id': str(article.pk),
+        'fields': [
+            {'name': 'title', 'value': 'First'},
+            {'name': 'text', 'value': 'First text.'},
+        ]
+    }]
+    sql = queries[0]['sql']
+    assert '"title_en_us"' in sql
+    assert '"title",' not in sql and '"title_ru_ru"' not in sql
+
+
+def test_get_translation_plan():
+    from modeltranslation_xliff.admin import get_translation_plan
+    plan = get_translation_plan(Article)
+    assert list(plan) == ['title', 'text']
+    assert plan['text'] == {'en-us': 'text_en_us', 'ru-ru': 'text_ru_ru'}
+    assert get_translation_plan(Article) is plan
+
+
+@pytest.mark.django_db
+def test_update_translations_unknown_field():
+    from django.core.exceptions import ValidationError
+    article = Article.objects.create(title='First', text='First text.')
+    translation_data = {
+        'name': 'Article',
+        'language': 'ru-ru',
+        'objects': [{'id': str(article.pk), 'fields': [
+            {'name': 'title_ru_ru', 'value': 'Первый'},
+        ]}]
+    }
+    with pytest.raises(ValidationError):
+        ArticleAdmin(Article, admin.site)._update_translations(translation_data)
+
+
+@pytest.mark.django_db
+@mock.patch.object(ArticleAdmin, 'message_user', side_effect=catch_error_message)
+def test_export_import_xliff_multiple_models(_, admin_client):
+    from testapp.models import Block
+    article = Article.objects.create(title='Page', text='Page text.')
+    block = Block.objects.create(article=article, text='Block text.')
+
+    def get_xliff_querysets(self, request, queryset):
+        return [queryset, Block.objects.filter(article__in=queryset)]
+
+    data = {'action': 'export_xliff', '_selected_action': [str(article.pk)]}
+    with mock.patch.object(ArticleAdmin, 'get_xliff_querysets',
+                           get_xliff_querysets):
+        response = admin_client.post(
+            reverse('admin:testapp_article_changelist'), data=data
+        )
+    xliff = etree.fromstring(response.content)
+    files = xliff.findall('file')
+    assert [f.attrib['original'] for f in files] == ['Article', 'Block']
+    for file in files:
+        file.set('target-language', 'ru-RU')
+        for unit in file.iter('trans-unit'):
+            etree.SubElement(unit, 'target').text = \
+                'RU ' + unit.find('source').text
+    data = {'_upload-xliff': BytesIO(etree.tostring(xliff))}
+    response = admin_client.post(reverse('admin:testapp_article_import_xliff'), data=data)
+    assert response.status_code == 302
+    article.refresh_from_db()
+    block.refresh_from_db()
+    assert (article.title_ru_ru, article.text_ru_ru) == ('RU Page', 'RU Page text.')
+    assert block.text_ru_ru == 'RU Block text.'
+
+
+@pytest.mark.django_db
+@mock.patch('modeltranslation_xliff.jobs.JOB_WORKER', 'command')
+def test_import_xliff_multiple_models_permissions(django_user_model, settings,
+                                                  tmpdir):
+    from django.contrib.auth.models import Permission
+    from django.core.exceptions import ValidationError
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test import RequestFactory
+    from modeltranslation_xliff.jobs import enqueue_import, run_pending_jobs
+    from modeltranslation_xliff.models import XliffJob
+    from modeltranslation_xliff.utils import create_xliff
+    from testapp.models import Block
+    settings.MEDIA_ROOT = str(tmpdir)
+    article = Article.objects.create(title='Page', text='Page text.')
+    block = Block.objects.create(article=article, text='Block text.')
+    model_admin = ArticleAdmin(Article, admin.site)
+    xliff = etree.fromstring(create_xliff([
+        model_admin._get_model_trans_source(qs)
+        for qs in (Article.objects.all(), Block.objects.all())
+    ]).encode('utf-8'))
+    for file in xliff.findall('file'):
+        file.set('target-language', 'ru-RU')
+        for unit in file.iter('trans-unit'):
+            etree.SubElement(unit, 'target').text = \
+                'RU ' + unit.find('source').text
+    content = etree.tostring(xliff)
+    user = django_user_model.objects.create_user('editor', is_staff=True)
+    user.user_permissions.add(Permission.objects.get(codename='change_article'))
+    request = RequestFactory().post('/')
+    request.user = django_user_model.objects.get(pk=user.pk)
+    with pytest.raises(ValidationError):
+        model_admin._import_xliff_files(BytesIO(content), request=request)
+    job = enqueue_import(model_admin, SimpleUploadedFile('ru.xlf', content),
+                         user=user)
+    assert run_pending_jobs() == 1
+    job.refresh_from_db()
+    assert job.status == XliffJob.FAILED
+    assert 'no permission' in job.message and 'Block' in job.message
+    article.refresh_from_db()
+    block.refresh_from_db()
+    assert (article.title_ru_ru, block.text_ru_ru) == (None, None)
+
+
+@pytest.mark.usefixtures('populate_db')
+@mock.patch('modeltranslation_xliff.admin.STREAMING_EXPORT', True)
+@mock.patch('modeltranslation_xliff.admin.EXPORT_COMPRESSION', 'gzip')
+def test_export_xliff_gzip(admin_client):
+    import gzip
+    data = {
+        'action': 'export_xliff',
+        '_selected_action': [str(obj.pk) for obj in Article.objects.filter(pk__lte=2)]
+    }
+    response = admin_client.post(reverse('admin:testapp_article_changelist'),
+                                 data=data)
+    assert response['Content-Type'] == 'application/gzip'
+    assert 'article.xlf.gz' in response['Content-Disposition']
+    content = gzip.decompress(b''.join(response.streaming_content))
+    assert content == XLIFF_EN.encode('utf-8')
+
+
+@pytest.mark.usefixtures('populate_db')
+@mock.patch.object(ArticleAdmin, 'message_user', side_effect=catch_error_message)
+def test_import_xliff_zip(_, admin_client):
+    from modeltranslation_xliff.compression import iter_zip
+    Article.objects.filter(pk=1).update(title_ru_ru=None)
+    archive = b''.join(iter_zip([('article_ru.xlf', [XLIFF_RU.encode('utf-8')])]))
+    data = {'_upload-xliff': BytesIO(archive)}
+    response = admin_client.post(reverse('admin:testapp_article_import_xliff'),
+                                 data=data)
+    assert response.status_code == 302
+    article = Article.objects.get(pk=1)
+    assert article.title_ru_ru == TEST_DATA_RU['objects'][0]['fields'][0]['value']
+
+
+@pytest.mark.usefixtures('populate_db')
+def test_export_xliff_languages(admin_client):
+    import zipfile
+    data = {
+        'action': 'export_xliff_languages',
+        '_selected_action': [str(obj.pk) for obj in Article.objects.filter(pk__lte=2)]
+    }
+    response = admin_client.post(reverse('admin:testapp_article_changelist'),
+                                 data=data)
+    assert response['Content-Type'] == 'application/zip'
+    with zipfile.ZipFile(BytesIO(response.content)) as zf:
+        assert zf.namelist() == ['article_ru-ru.xlf']
+        xliff = etree.fromstring(zf.read('article_ru-ru.xlf'))
+    assert xliff.find('file').attrib['target-language'] == 'ru-ru'
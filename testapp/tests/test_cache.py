@@ -0,0 +1,55 @@
+from unittest import mock
+from modeltranslation_xliff import cache, utils
+from .data import TEST_DATA_EN
+
+
+def test_make_key():
+    key = cache.make_key('html', 'en-us', 'Text')
+    assert key.startswith('xliff-block:')
+    assert key != cache.make_key('html', 'ru-ru', 'Text')
+    assert key != cache.make_key('text', 'en-us', 'Text')
+    assert key != cache.make_key('html', 'en-us', 'Text',
+                                 'modeltranslation_xliff.parsers.srx')
+
+
+def test_lru_block_cache():
+    block_cache = cache.LRUBlockCache(2)
+    block_cache.set('a', 1)
+    block_cache.set('b', 2)
+    assert block_cache.get('a') == 1
+    block_cache.set('c', 3)
+    assert len(block_cache) == 2
+    assert block_cache.get('b') is None
+    assert block_cache.get('c') == 3
+    assert block_cache.stats == {'hits': 2, 'misses': 1}
+
+
+def test_django_block_cache():
+    block_cache = cache.DjangoBlockCache('default')
+    assert block_cache.get('xliff-test') is None
+    block_cache.set('xliff-test', [('Text', 'Text')])
+    assert block_cache.get('xliff-test') == [('Text', 'Text')]
+    assert block_cache.stats == {'hits': 1, 'misses': 1}
+
+
+def test_create_xliff_uses_block_cache():
+    block_cache = cache.LRUBlockCache(100)
+    with mock.patch.object(utils, 'get_block_cache', return_value=block_cache):
+        first = utils.create_xliff(TEST_DATA_EN)
+        misses = block_cache.misses
+        assert misses and not block_cache.hits
+        second = utils.create_xliff(TEST_DATA_EN)
+    assert first == second
+    assert block_cache.hits == misses
+    assert block_cache.misses == misses
+
+
+def test_block_cache_key_depends_on_segmentation():
+    block_cache = cache.LRUBlockCache(100)
+    with mock.patch.object(utils, 'get_block_cache', return_value=block_cache):
+        with mock.patch.object(utils, 'SEGMENTER', 'srx'):
+            segmented = utils.create_xliff(TEST_DATA_EN)
+        with mock.patch.object(utils, 'DISABLE_SEGMENTATION', True):
+            unsegmented = utils.create_xliff(TEST_DATA_EN)
+    assert not block_cache.hits
+    assert unsegmented.count('<trans-unit') < segmented.count('<trans-unit')
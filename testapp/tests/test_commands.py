@@ -0,0 +1,155 @@
+from io import StringIO
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from testapp.models import Article
+from .data import XLIFF_EN, XLIFF_RU, TEST_DATA_RU
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('populate_db')
+def test_export_xliff_command(tmpdir):
+    out = StringIO()
+    call_command('export_xliff', 'testapp.Article', '--filter', 'pk__in=1,2',
+                 '--output', str(tmpdir), stdout=out)
+    assert tmpdir.join('article.xlf').read_binary() == XLIFF_EN.encode('utf-8')
+    assert 'Exported 2 objects, 7 segments' in out.getvalue()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('populate_db')
+def test_export_xliff_command_chunks(tmpdir):
+    call_command('export_xliff', 'testapp.Article', '-f', 'pk__lte=2',
+                 '--chunk-size', '1', '--output', str(tmpdir.join('out')),
+                 stdout=StringIO())
+    assert sorted(p.basename for p in tmpdir.join('out').listdir()) == [
+        'article-0001.xlf', 'article-0002.xlf'
+    ]
+
+
+@pytest.mark.django_db
+def test_export_xliff_command_errors():
+    with pytest.raises(CommandError):
+        call_command('export_xliff', 'testapp.Missing', stdout=StringIO())
+    with pytest.raises(CommandError):
+        call_command('export_xliff', 'testapp.Article', '-f', 'pk',
+                     stdout=StringIO())
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('populate_db')
+def test_import_xliff_command(tmpdir):
+    tmpdir.join('article_ru.xlf').write_binary(XLIFF_RU.encode('utf-8'))
+    out = StringIO()
+    call_command('import_xliff', 'testapp.Article', str(tmpdir.join('*.xlf')),
+                 stdout=out)
+    article = Article.objects.get(pk=1)
+    assert article.title_ru_ru == TEST_DATA_RU['objects'][0]['fields'][0]['value']
+    assert 'Imported 2 objects, 7 segments' in out.getvalue()
+    tmpdir.join('invalid.xlf').write_binary(b'<xliff/>')
+    with pytest.raises(CommandError):
+        call_command('import_xliff', 'testapp.Article',
+                     str(tmpdir.join('*.xlf')), stdout=StringIO(),
+                     stderr=StringIO())
+
+
+@pytest.mark.django_db
+def test_export_xliff_command_multiple_models(tmpdir):
+    from lxml import etree
+    from testapp.models import Block
+    article = Article.objects.create(title='Page', text='Page text.')
+    Block.objects.create(article=article, text='Block text.')
+    call_command('export_xliff', 'testapp.Article', 'testapp.Block',
+                 '-f', 'pk={}'.format(article.pk), '--output', str(tmpdir),
+                 stdout=StringIO())
+    path = tmpdir.join('article-block.xlf')
+    xliff = etree.fromstring(path.read_binary())
+    assert [f.attrib['original'] for f in xliff.findall('file')] == \
+        ['Article', 'Block']
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('populate_db')
+def test_export_xliff_command_target_languages(tmpdir):
+    import zipfile
+    call_command('export_xliff', 'testapp.Article', '-f', 'pk__lte=2',
+                 '-t', 'ru-ru', '-t', 'de', '--output', str(tmpdir),
+                 stdout=StringIO())
+    with zipfile.ZipFile(str(tmpdir.join('article.zip'))) as zf:
+        assert zf.namelist() == ['article_ru-ru.xlf', 'article_de.xlf']
+
+
+@pytest.mark.django_db
+def test_prune_xliff_skeletons_command():
+    from datetime import timedelta
+    from django.utils import timezone
+    from modeltranslation_xliff.models import XliffSkeleton
+    XliffSkeleton.objects.create(checksum='old', data=b'')
+    XliffSkeleton.objects.create(checksum='new', data=b'')
+    XliffSkeleton.objects.filter(checksum='old').update(
+        created=timezone.now() - timedelta(days=31)
+    )
+    out = StringIO()
+    call_command('prune_xliff_skeletons', stdout=out)
+    assert 'Deleted 1 XLIFF skeleton(s).' in out.getvalue()
+    assert list(XliffSkeleton.objects.values_list('checksum', flat=True)) == \
+        ['new']
+    with pytest.raises(CommandError):
+        call_command('prune_xliff_skeletons', '--days', '-1', stdout=out)
+
+
+@pytest.mark.django_db
+def test_xliff_worker_command_fails_stale_jobs():
+    from datetime import timedelta
+    from django.contrib.contenttypes.models import ContentType
+    from django.utils import timezone
+    from modeltranslation_xliff.models import XliffJob
+    content_type = ContentType.objects.get_for_model(Article)
+    now = timezone.now()
+    stale = XliffJob.objects.create(
+        kind=XliffJob.EXPORT, status=XliffJob.RUNNING,
+        content_type=content_type, started=now - timedelta(hours=2)
+    )
+    running = XliffJob.objects.create(
+        kind=XliffJob.EXPORT, status=XliffJob.RUNNING,
+        content_type=content_type, started=now
+    )
+    out = StringIO()
+    call_command('xliff_worker', '--once', stdout=out)
+    assert 'Marked 1 interrupted XLIFF job(s) as failed.' in out.getvalue()
+    stale.refresh_from_db()
+    running.refresh_from_db()
+    assert stale.status == XliffJob.FAILED
+    assert stale.message and stale.finished
+    assert running.status == XliffJob.RUNNING
+
+
+@pytest.mark.django_db
+def test_prune_xliff_jobs_command(settings, tmpdir):
+    import os
+    from datetime import timedelta
+    from django.contrib.contenttypes.models import ContentType
+    from django.core.files.base import ContentFile
+    from django.utils import timezone
+    from modeltranslation_xliff.models import XliffJob
+    settings.MEDIA_ROOT = str(tmpdir)
+    content_type = ContentType.objects.get_for_model(Article)
+    now = timezone.now()
+    old = XliffJob(kind=XliffJob.IMPORT, status=XliffJob.DONE,
+                   content_type=content_type,
+                   finished=now - timedelta(days=8))
+    old.source.save('old.xlf', ContentFile(b'<xliff/>'), save=False)
+    old.result.save('old.xlf', ContentFile(b'<xliff/>'))
+    paths = [old.source.path, old.result.path]
+    assert all(os.path.exists(path) for path in paths)
+    recent = XliffJob.objects.create(kind=XliffJob.EXPORT,
+                                     status=XliffJob.FAILED,
+                                     content_type=content_type, finished=now)
+    pending = XliffJob.objects.create(kind=XliffJob.EXPORT,
+                                      content_type=content_type)
+    out = StringIO()
+    call_command('prune_xliff_jobs', stdout=out)
+    assert 'Deleted 1 XLIFF job(s).' in out.getvalue()
+    assert sorted(XliffJob.objects.values_list('pk', flat=True)) == \
+        [recent.pk, pending.pk]
+    assert not any(os.path.exists(path) for path in paths)
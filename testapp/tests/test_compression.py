@@ -0,0 +1,60 @@
+import gzip
+import zipfile
+from io import BytesIO
+import pytest
+from django.core.exceptions import ValidationError
+from modeltranslation_xliff import compression
+from .data import XLIFF_EN
+
+
+def test_iter_gzip():
+    data = XLIFF_EN.encode('utf-8')
+    chunks = [data[i:i + 100] for i in range(0, len(data), 100)]
+    compressed = b''.join(compression.iter_gzip(chunks))
+    assert len(compressed) < len(data)
+    assert gzip.decompress(compressed) == data
+
+
+def test_iter_zip():
+    data = XLIFF_EN.encode('utf-8')
+    archive = b''.join(compression.iter_zip([
+        ('article.xlf', iter([data[:100], data[100:]])),
+        ('статья.xlf', iter([data])),
+        ('empty.xlf', iter([])),
+    ]))
+    with zipfile.ZipFile(BytesIO(archive)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == ['article.xlf', 'статья.xlf', 'empty.xlf']
+        assert zf.read('article.xlf') == data
+        assert zf.read('статья.xlf') == data
+        assert zf.read('empty.xlf') == b''
+
+
+@pytest.mark.parametrize('method', [None, 'gzip', 'zip'])
+def test_compress_iter_xliff_files(method):
+    data = XLIFF_EN.encode('utf-8')
+    compressed = b''.join(compression.compress([data], method, 'article'))
+    contents = [fo.read() for fo in
+                compression.iter_xliff_files(BytesIO(compressed))]
+    assert contents == [data]
+
+
+def test_iter_xliff_files_zip():
+    data = XLIFF_EN.encode('utf-8')
+    archive = b''.join(compression.iter_zip([
+        ('b.xlf', [b'b']), ('readme.txt', [b'text']), ('a.xliff', [b'a'])
+    ]))
+    contents = [fo.read() for fo in
+                compression.iter_xliff_files(BytesIO(archive))]
+    assert contents == [b'a', b'b']
+    archive = b''.join(compression.iter_zip([('readme.txt', [data])]))
+    with pytest.raises(ValidationError):
+        list(compression.iter_xliff_files(BytesIO(archive)))
+
+
+def test_get_compression():
+    assert compression.get_compression('article.xlf.gz') == 'gzip'
+    assert compression.get_compression('article.zip') == 'zip'
+    assert compression.get_compression('article.xlf') is None
+    with pytest.raises(ValueError):
+        compression.get_file_extension('bz2')
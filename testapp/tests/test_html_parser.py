@@ -1,7 +1,11 @@
 # (c) 2018, Roman Miroshnychenko <roman1972@gmail.com>
 # License: MIT
+import random
+import pytest
 from .data import HTML5
-from modeltranslation_xliff.parsers.html import parse_content, add_ph_tags, add_t_tags
+from modeltranslation_xliff.parsers import fast_html
+from modeltranslation_xliff.parsers.html import parse_content, \
+    parse_content_spans, add_ph_tags, add_t_tags, add_xliff_tags
 
 
 def test_html_parser_html5():
@@ -40,3 +44,105 @@ def test_add_t_tags():
                       '<ept id="3">&lt;/span&gt;</ept>,<it id="4">&lt;br&gt;</it>' \
                       'close and isolated tags.<it id="5">&lt;/em&gt;</it>' \
                       '<ept id="1">&lt;/b&gt;</ept>'
+
+
+def test_parse_content_reentrant():
+    first = parse_content('<p>First block.</p><p>Second block.</p>')
+    assert next(first) == 'First block.'
+    assert list(parse_content('<p>Other block.</p>')) == ['Other block.']
+    assert next(first) == 'Second block.'
+
+
+@pytest.mark.parametrize('segment', [
+    '',
+    'Plain text.',
+    'Preserve &lt;invalid XML chars&gt;',
+    '<b><i>String with <span>various open</span>,<br>close and isolated tags.</em></b>',
+    '<b><i>Nested</b> <b>tags</i> with the same <b>name</b></b></b>',
+    'A <a href="/page?a=1&amp;b=2">link</a> with an entity in an attribute.',
+    'Entity &spanning <b>a tag</b>; and &; text;',
+    'Stray < bracket &amp; <i>tag</i> and <> brackets.',
+    '<ph id="1">&amp;</ph> and <!-- comment --> and < b> tags.',
+])
+def test_add_xliff_tags(segment):
+    assert add_xliff_tags(segment) == add_t_tags(add_ph_tags(segment))
+
+
+def test_add_xliff_tags_random():
+    pieces = ('<b>', '</b>', '<i>', '</i>', '<br>', '<img src="x">',
+              '<a href="?a=1&amp;b=2">', '</a>', '&amp;', '&#8212;', '&;',
+              '& ', ';', '<', '>', 'word', ' ', '</ph>', '<!-- c -->')
+    rnd = random.Random(1)
+    for _ in range(2000):
+        segment = ''.join(rnd.choice(pieces) for _ in range(rnd.randint(0, 12)))
+        assert add_xliff_tags(segment) == add_t_tags(add_ph_tags(segment))
+
+
+@pytest.mark.parametrize('html', [
+    HTML5,
+    '',
+    'Some plain text.',
+    '<p>Paragraph <B class=foo>with</B > <em>inline tags</em>.</p>',
+    '<p>Attributes <a href="/?a=1&amp;b=2" title="1 > 0" data-x>link</a></p>',
+    '<img src=/image.png alt=\'Alt &amp; text\'/><img alt="">',
+    '<meta http-equiv="keywords" content="k1, k2" /><meta keywords>',
+    '<p>Entities &amp; &lt;, &#38; &#x2014; &nbsp;&copy; &unknown; &; & text</p>',
+    '<p>Unterminated &amp entity</p><p>&#160 reference</p>',
+    '<p>Stray < and > brackets &</p><p>< b>Not a tag<</p>',
+    '<p>Line<br>break<br/>and <span/>empty tags</p>',
+    '<script>if (a < b && c) {}</script><style>p { x: "</p>" }</style>text',
+    '<script>document.write("</div>");</script><p>Text</p>',
+    '<script><!-- <script></script> --></script><p>Text</p>',
+    '<script>Unterminated script',
+    '<!DOCTYPE html><!-- <p>Comment</p> --><!----><?pi?><![CDATA[x]]>text',
+    '<p>Malformed <a href="x"title="y">tags</a> and <b\xa0>spaces</b></p>',
+    '<pre><code>import this</code></pre><pre>Preformatted</pre>',
+])
+def test_fast_html_parser(html):
+    assert list(fast_html.parse_content(html)) == list(parse_content(html))
+    assert list(fast_html.parse_content_spans(html)) == \
+        list(parse_content_spans(html))
+
+
+@pytest.mark.parametrize('html, spans', [
+    ('<h2 id="contacts">contacts</h2>', [(0, 8, 18, 26, True)]),
+    ('<p>A&nbsp;<B>b</B ></p>', [(0, 1, 3, 4, True), (1, 2, 4, 10, False),
+                                 (2, 5, 10, 13, True), (5, 6, 13, 14, True),
+                                 (6, 10, 14, 19, False)]),
+    ('<img alt="A &amp; b">', [(0, 2, 10, 12, True), (2, 7, 12, 17, True),
+                               (7, 9, 17, 19, True)]),
+])
+def test_parse_content_spans(html, spans):
+    assert [item[1] for item in parse_content_spans(html)] == [spans]
+
+
+def test_fast_html_parser_fast_path():
+    parser = fast_html.FastContentParser()
+    parser.reset()
+    assert parser._feed_markup(HTML5)
+    parser.reset()
+    assert not parser._feed_markup('<p>Malformed <a href="x"title="y">tag</a></p>')
+
+
+def test_fast_html_parser_chunks():
+    parser = fast_html.FastContentParser()
+    parser.reset()
+    for chunk in ('<p>First <b>bold', ' text</b>.</p><p>Split <a hr', 'ef="/">tag</a></p>'):
+        parser.feed(chunk)
+    parser.close()
+    assert parser.content_list == ['First <b>bold text</b>.',
+                                   'Split <a href="/">tag</a>']
+
+
+def test_fast_html_parser_random():
+    pieces = ('<p>', '</p>', '<b>', '</B>', '<br>', '<br />', '<div>', '</div>',
+              '<img src="x" alt="Alt">', '<meta description="Desc">',
+              '<a href="?a=1&amp;b=2">', '</a>', '<pre>', '</pre>', '<code>',
+              '<script>1 < 2</script>', '<style>', '</style>', '<!-- c -->',
+              '&amp;', '&lt;', '&#160;', '&nbsp', '&', '<', '< ', '>', '</ p>',
+              '<a b="c"d>', 'word', ' ', '\n', '\xa0')
+    rnd = random.Random(1)
+    for _ in range(2000):
+        html = ''.join(rnd.choice(pieces) for _ in range(rnd.randint(0, 20)))
+        assert list(fast_html.parse_content_spans(html)) == \
+            list(parse_content_spans(html))
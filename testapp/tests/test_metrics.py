@@ -0,0 +1,102 @@
+from io import BytesIO
+from unittest import mock
+import pytest
+from django.contrib import admin
+from modeltranslation_xliff import metrics, utils
+from modeltranslation_xliff.signals import metrics_collected
+from testapp.models import Article
+from .data import TEST_DATA_EN, XLIFF_RU
+
+
+@pytest.fixture
+def collected():
+    collected = []
+
+    def receiver(sender, metrics, **kwargs):
+        collected.append(metrics)
+
+    metrics_collected.connect(receiver)
+    yield collected
+    metrics_collected.disconnect(receiver)
+
+
+def test_export_metrics(collected):
+    xliff = b''.join(utils.iter_xliff(TEST_DATA_EN))
+    assert len(collected) == 1
+    export_metrics = collected[0]
+    assert export_metrics.operation == 'export'
+    assert export_metrics.counters['objects'] == 2
+    assert export_metrics.counters['fields'] == 4
+    assert export_metrics.counters['segments'] == 7
+    assert export_metrics.counters['bytes'] == len(xliff)
+    assert set(export_metrics.timings) >= {
+        'fetch', 'parse_content', 'build_xml', 'serialize'
+    }
+
+
+def test_export_metrics_parallel(collected):
+    serial = metrics.Metrics('export')
+    for obj in TEST_DATA_EN['objects']:
+        utils.process_object(obj, 'en-us', serial)
+    b''.join(utils.iter_xliff(TEST_DATA_EN, workers=2, batch_size=1))
+    assert collected[0].counters['fields'] == serial.counters['fields']
+    assert collected[0].counters['blocks'] == serial.counters['blocks']
+
+
+def test_import_metrics(collected):
+    utils.import_xliff(XLIFF_RU.encode('utf-8'))
+    import_metrics = collected[0]
+    assert import_metrics.operation == 'import'
+    assert import_metrics.counters['objects'] == 2
+    assert import_metrics.counters['segments'] == 7
+    assert import_metrics.timings['parse'] > 0
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('populate_db')
+def test_import_metrics_admin(collected):
+    model_admin = admin.site._registry[Article]
+    stats = {}
+    model_admin._import_xliff_files(BytesIO(XLIFF_RU.encode('utf-8')), stats)
+    assert stats == {'objects': 2, 'segments': 7}
+    import_metrics = collected[0]
+    assert import_metrics.counters['updated_objects'] == 2
+    assert import_metrics.counters['bytes'] == len(XLIFF_RU.encode('utf-8'))
+    assert import_metrics.counters['queries'] > 0
+    assert set(import_metrics.timings) >= {
+        'parse', 'fetch_objects', 'update_objects'
+    }
+
+
+def test_metrics_callback():
+    callback = mock.Mock()
+    with mock.patch.object(metrics, 'METRICS_CALLBACK', callback):
+        utils.create_xliff(TEST_DATA_EN)
+    callback.assert_called_once()
+    assert callback.call_args[0][0].operation == 'export'
+
+
+def test_slow_log(caplog):
+    with mock.patch.object(metrics, 'SLOW_LOG_THRESHOLD', 0):
+        utils.create_xliff(TEST_DATA_EN)
+    record = caplog.records[-1]
+    assert record.getMessage().startswith('Slow XLIFF export: {')
+    assert record.xliff_metrics['counters']['objects'] == 2
+
+
+def test_metrics_reporting_errors(collected, caplog):
+    def failing_receiver(sender, metrics, **kwargs):
+        raise RuntimeError('Receiver error')
+
+    metrics_collected.connect(failing_receiver)
+    callback = mock.Mock(side_effect=RuntimeError('Callback error'))
+    try:
+        with mock.patch.object(metrics, 'METRICS_CALLBACK', callback):
+            assert utils.create_xliff(TEST_DATA_EN)
+    finally:
+        metrics_collected.disconnect(failing_receiver)
+    assert len(collected) == 1
+    callback.assert_called_once()
+    errors = [str(record.exc_info[1]) for record in caplog.records
+              if record.exc_info and record.name == 'root']
+    assert errors == ['Receiver error', 'Callback error']
@@ -0,0 +1,74 @@
+from unittest import mock
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from modeltranslation_xliff import utils
+from modeltranslation_xliff.parsers import segmenter, srx
+
+
+@mock.patch.object(segmenter, '_sent_tokenize', None)
+def test_segment_text_loads_tokenizer():
+    sent_tokenize = mock.Mock(return_value=['First.', 'Second.'])
+    with mock.patch('nltk.tokenize.sent_tokenize', sent_tokenize):
+        segments = segmenter.segment_text('First. Second.', 'en-us')
+        assert segmenter.load_tokenizer() is sent_tokenize
+    assert segments == ['First.', 'Second.']
+    sent_tokenize.assert_called_with('First. Second.', 'english')
+
+
+@mock.patch.object(segmenter, '_sent_tokenize', None)
+@mock.patch.object(segmenter, 'NLTK_OFFLINE', True)
+def test_load_tokenizer_offline():
+    with mock.patch('nltk.tokenize.sent_tokenize', side_effect=LookupError), \
+            mock.patch('nltk.download') as download:
+        with pytest.raises(LookupError):
+            segmenter.load_tokenizer()
+    download.assert_not_called()
+
+
+@pytest.mark.parametrize('text,lang_code,segments', [
+    ('A piece of plain text. The second sentence.', 'en-us',
+     ['A piece of plain text.', 'The second sentence.']),
+    ('The <strong>first sentence</strong>. The <em>second</em> one!', 'en',
+     ['The <strong>first sentence</strong>.', 'The <em>second</em> one!']),
+    ('Mr. Smith met J. Watson, e.g. in the U.S. yesterday. "Hi!" he said.', 'en',
+     ['Mr. Smith met J. Watson, e.g. in the U.S. yesterday.', '"Hi!" he said.']),
+    ('<b>Bold sentence.</b> Next one... and more? 5 apples.', 'en',
+     ['<b>Bold sentence.</b>', 'Next one... and more?', '5 apples.']),
+    ('Это т. е. пример. Второе предложение!', 'ru',
+     ['Это т. е. пример.', 'Второе предложение!']),
+    ('Am 3. Oktober ist Feiertag. Das ist gut.', 'de',
+     ['Am 3. Oktober ist Feiertag.', 'Das ist gut.']),
+    ('今日は晴れです。明日は雨でしょう！', 'ja',
+     ['今日は晴れです。', '明日は雨でしょう！']),
+    ('Click <a title="Hello. World">here</a> now. <img alt="A. B"> Next.', 'en',
+     ['Click <a title="Hello. World">here</a> now.', '<img alt="A. B"> Next.']),
+    ('  ', 'en', []),
+])
+def test_srx_segment_text(text, lang_code, segments):
+    assert srx.segment_text(text, lang_code) == segments
+
+
+def test_get_segmenter():
+    with mock.patch.object(utils, 'SEGMENTER', 'nltk'):
+        assert utils.get_segmenter() is segmenter
+    with mock.patch.object(utils, 'SEGMENTER', 'modeltranslation_xliff.parsers.srx'):
+        assert utils.get_segmenter() is srx
+    with mock.patch.object(utils, 'SEGMENTER', 'foo'):
+        with pytest.raises(ImproperlyConfigured):
+            utils.get_segmenter()
+
+
+@pytest.mark.parametrize('segmenter_name,disabled,preloaded', [
+    ('nltk', False, True),
+    ('srx', False, False),
+    ('nltk', True, False),
+])
+def test_preload_nltk(segmenter_name, disabled, preloaded):
+    from django.apps import apps
+    app_config = apps.get_app_config('modeltranslation_xliff')
+    with mock.patch('modeltranslation_xliff.settings.PRELOAD_NLTK', True), \
+            mock.patch.object(utils, 'SEGMENTER', segmenter_name), \
+            mock.patch.object(utils, 'DISABLE_SEGMENTATION', disabled), \
+            mock.patch.object(segmenter, 'load_tokenizer') as load_tokenizer:
+        app_config.ready()
+    assert load_tokenizer.called == preloaded
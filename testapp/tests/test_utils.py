@@ -1,5 +1,17 @@
+import json
+import sys
+import types
+import zipfile
+from base64 import b64decode
+from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from unittest import mock
+import pytest
+from django.core.exceptions import ValidationError
+from lxml import etree
 from modeltranslation_xliff import utils
-from .data import TEST_DATA_EN, TEST_DATA_RU, XLIFF_EN, XLIFF_RU
+from .data import HTML5, TEST_DATA_EN, TEST_DATA_RU, XLIFF_EN, XLIFF_RU
 
 
 def test_create_xliff():
@@ -7,6 +19,360 @@ def test_create_xliff():
     assert xliff == XLIFF_EN
 
 
+def test_create_xliff_fast_html():
+    with mock.patch.object(utils, 'CONTENT_TYPE', 'fast_html'):
+        assert utils.create_xliff(TEST_DATA_EN) == XLIFF_EN
+        assert utils.import_xliff(XLIFF_RU.encode('utf-8')) == TEST_DATA_RU
+
+
+@mock.patch.object(utils, 'SEGMENTER', 'srx')
+def test_create_xliff_punctuation_in_tag_attributes():
+    translation_data = deepcopy(TEST_DATA_EN)
+    del translation_data['objects'][1:]
+    translation_data['objects'][0]['fields'][1]['value'] = \
+        '<p>Click <a title="Hello. World">here</a> now. Next.</p>'
+    xliff = etree.fromstring(utils.create_xliff(translation_data))
+    sources = [etree.tostring(elem, encoding='unicode', with_tail=False)
+               for elem in xliff.iter('source')]
+    assert len(sources) == 3
+    assert 'title="Hello. World"' in sources[1]
+    assert sources[2] == '<source>Next.</source>'
+
+
+def test_iter_xliff():
+    translation_data = TEST_DATA_EN.copy()
+    translation_data['objects'] = iter(TEST_DATA_EN['objects'])
+    chunks = list(utils.iter_xliff(translation_data, chunk_size=64))
+    assert len(chunks) > 1
+    assert b''.join(chunks) == XLIFF_EN.encode('utf-8')
+
+
+def test_iter_xliff_parallel():
+    translation_data = TEST_DATA_EN.copy()
+    translation_data['objects'] = iter(TEST_DATA_EN['objects'] * 3)
+    serial = b''.join(utils.iter_xliff(translation_data))
+    translation_data['objects'] = iter(TEST_DATA_EN['objects'] * 3)
+    parallel = b''.join(utils.iter_xliff(translation_data, workers=2,
+                                         batch_size=1))
+    assert parallel == serial
+
+
+def test_create_xliff_skeleton():
+    translation_data = {
+        'name': 'Article',
+        'language': 'ru-ru',
+        'objects': [{
+            'id': '1',
+            'fields': [
+                {'name': 'title', 'value': 'Article'},
+                {'name': 'text', 'value': '<p>Статья</p><p>Article</p>'}
+            ]
+        }]
+    }
+    xliff = etree.fromstring(utils.create_xliff(translation_data))
+    skeleton = json.loads(b64decode(
+        xliff.find('./file/header/skl/internal-file').text
+    ).decode('utf-8'))
+    assert skeleton['name'] == 'Article'
+    assert skeleton['objects'][0]['fields'][0]['value'] == '%%%1%%%'
+    assert skeleton['objects'][0]['fields'][1]['value'] == \
+        '<p>%%%2%%%</p><p>%%%3%%%</p>'
+
+
+@pytest.mark.parametrize('content_type', ['html', 'fast_html'])
+def test_create_xliff_skeleton_source_offsets(content_type):
+    translation_data = {
+        'name': 'Article',
+        'language': 'en',
+        'objects': [{
+            'id': '1',
+            'fields': [
+                {'name': 'title',
+                 'value': '<h2 id="contacts">contacts</h2><p>p</p>'
+                          '<ul><li><a href="/about">about</a></li></ul>'},
+                {'name': 'text',
+                 'value': '<p>It&rsquo;s a&nbsp;test. '
+                          '<STRONG>Bold</STRONG> <em>text</em >.</p>'},
+                {'name': 'image',
+                 'value': '<img src="/alt.png" alt="Alt &amp; text">'},
+            ]
+        }]
+    }
+    with mock.patch.object(utils, 'CONTENT_TYPE', content_type):
+        xliff = etree.fromstring(utils.create_xliff(translation_data))
+    skeleton = json.loads(b64decode(
+        xliff.find('./file/header/skl/internal-file').text
+    ).decode('utf-8'))
+    fields = skeleton['objects'][0]['fields']
+    assert fields[0]['value'] == '<h2 id="contacts">%%%1%%%</h2>' \
+        '<p>%%%2%%%</p><ul><li><a href="/about">%%%3%%%</li></ul>'
+    assert fields[1]['value'] == '<p>%%%4%%% %%%5%%%</p>'
+    assert fields[2]['value'] == '<img src="/alt.png" alt="%%%6%%%">'
+    sources = [etree.tostring(elem, encoding='unicode', with_tail=False)
+               for elem in xliff.iterfind('.//source')]
+    assert len(sources) == 6
+    assert sources[3] == '<source>It’s a\xa0test.</source>'
+    assert sources[5] == '<source>Alt <ph id="1">&amp;</ph> text</source>'
+
+
+def test_create_xliff_skeleton_unlocatable_segment(caplog):
+    translation_data = {
+        'name': 'Article',
+        'language': 'en',
+        'objects': [{
+            'id': '1',
+            'fields': [{'name': 'text', 'value': '<p>First.</p><p>Second.</p>'}]
+        }]
+    }
+
+    def get_segments(block, language):
+        return (block.upper(),) if block == 'First.' else (block,)
+
+    with mock.patch.object(utils, '_get_segments', get_segments):
+        xliff = etree.fromstring(utils.create_xliff(translation_data))
+    skeleton = json.loads(b64decode(
+        xliff.find('./file/header/skl/internal-file').text
+    ).decode('utf-8'))
+    assert skeleton['objects'][0]['fields'][0]['value'] == \
+        '<p>First.</p><p>%%%1%%%</p>'
+    assert [elem.text for elem in xliff.iterfind('.//source')] == ['Second.']
+    assert 'Cannot locate segment "FIRST."' in caplog.records[-1].getMessage()
+
+
 def test_import_xliff():
     translation_data = utils.import_xliff(XLIFF_RU.encode('utf-8'))
     assert translation_data == TEST_DATA_RU
+
+
+def test_iterparse_xliff():
+    translation_data = utils.iterparse_xliff(BytesIO(XLIFF_RU.encode('utf-8')))
+    assert translation_data['name'] == 'Article'
+    assert translation_data['language'] == 'ru-ru'
+    assert isinstance(translation_data['objects'], types.GeneratorType)
+    assert list(translation_data['objects']) == TEST_DATA_RU['objects']
+
+
+def test_iterparse_xliff_huge_tree():
+    # lxml rejects text nodes longer than 10 MB unless huge_tree is enabled
+    text = 'x' * 10000001
+    xliff = etree.fromstring(XLIFF_RU.encode('utf-8'))
+    xliff.find('.//target').text = text
+    xliff = etree.tostring(xliff)
+    with pytest.raises(etree.XMLSyntaxError):
+        list(utils.iterparse_xliff(BytesIO(xliff))['objects'])
+    with mock.patch.object(utils, 'IMPORT_HUGE_TREE', True):
+        objects = list(utils.iterparse_xliff(BytesIO(xliff))['objects'])
+    assert objects[0]['fields'][0]['value'] == text
+
+
+def test_create_xliff_multiple_files():
+    xliff = etree.fromstring(
+        utils.create_xliff([TEST_DATA_EN, dict(TEST_DATA_EN, name='Copy')])
+    )
+    files = xliff.findall('file')
+    assert [f.attrib['original'] for f in files] == ['Article', 'Copy']
+    assert etree.tostring(files[0]) == \
+        etree.tostring(etree.fromstring(XLIFF_EN.encode('utf-8')).find('file'))
+
+
+def test_iterparse_xliff_files():
+    xliff = etree.fromstring(XLIFF_RU.encode('utf-8'))
+    xliff.append(deepcopy(xliff.find('file')))
+    stats = {}
+    files = utils.iterparse_xliff_files(BytesIO(etree.tostring(xliff)), stats)
+    translation_data = next(files)
+    assert translation_data['name'] == 'Article'
+    assert next(translation_data['objects']) == TEST_DATA_RU['objects'][0]
+    # Unconsumed objects of the previous file are skipped
+    translation_data = next(files)
+    assert list(translation_data['objects']) == TEST_DATA_RU['objects']
+    assert next(files, None) is None
+    assert stats['objects'] == 2 * len(TEST_DATA_RU['objects'])
+
+
+def test_import_xliff_json_special_chars():
+    translation_data = {
+        'name': 'Article',
+        'language': 'xx',
+        'objects': [{'id': '1', 'fields': [{'name': 'title', 'value': 'Title'}]}]
+    }
+    xliff = etree.fromstring(utils.create_xliff(translation_data))
+    xliff.find('file').set('target-language', 'ru-ru')
+    target = etree.SubElement(xliff.find('.//trans-unit'), 'target')
+    target.text = '"Заголовок"\n\\1'
+    translation_data = utils.import_xliff(etree.tostring(xliff))
+    assert translation_data['objects'][0]['fields'][0]['value'] == \
+        '"Заголовок"\n\\1'
+
+
+def test_create_xliff_concurrent():
+    def make_data(i):
+        return {
+            'name': 'Article',
+            'language': 'en-us',
+            'objects': [{'id': str(i), 'fields': [
+                {'name': 'text', 'value': HTML5.replace('paragraph', str(i))}
+            ]}]
+        }
+
+    expected = [utils.create_xliff(make_data(i)) for i in range(32)]
+    switch_interval = sys.getswitchinterval()
+    # Force frequent thread switching to expose shared state
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(
+                lambda i: utils.create_xliff(make_data(i)), range(32)
+            ))
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert results == expected
+
+
+def test_iter_xliff_archive():
+    stats = {}
+    with mock.patch.object(utils, '_iter_processed_objects',
+                           wraps=utils._iter_processed_objects) as processed:
+        archive = b''.join(utils.iter_xliff_archive(
+            TEST_DATA_EN, ['ru-ru', 'de'], 'article', stats=stats
+        ))
+    assert processed.call_count == 1
+    assert stats == {'objects': 2, 'segments': 7}
+    with zipfile.ZipFile(BytesIO(archive)) as zf:
+        assert zf.namelist() == ['article_ru-ru.xlf', 'article_de.xlf']
+        for language in ('ru-ru', 'de'):
+            xliff = etree.fromstring(zf.read('article_{}.xlf'.format(language)))
+            assert xliff.find('file').attrib['target-language'] == language
+            del xliff.find('file').attrib['target-language']
+            assert etree.tostring(xliff, encoding='utf-8') == \
+                etree.tostring(etree.fromstring(XLIFF_EN.encode('utf-8')),
+                               encoding='utf-8')
+
+
+def _translate(xliff):
+    root = etree.fromstring(xliff)
+    for file in root.iter('file'):
+        file.set('target-language', 'ru-ru')
+    for unit in root.iter('trans-unit'):
+        target = deepcopy(unit.find('source'))
+        target.tag = 'target'
+        unit.append(target)
+    return etree.tostring(root, encoding='utf-8')
+
+
+@pytest.mark.parametrize('chunk_size', [16, utils.CHUNK_SIZE])
+def test_create_xliff_zlib_skeleton(chunk_size):
+    xliff = b''.join(utils.iter_xliff(TEST_DATA_EN, chunk_size=chunk_size,
+                                      skeleton_mode='zlib'))
+    internal_file = etree.fromstring(xliff).find('.//internal-file')
+    assert internal_file.attrib['form'] == utils.ZLIB_FORM
+    assert len(xliff) < len(XLIFF_EN.encode('utf-8'))
+    translation_data = utils.import_xliff(_translate(xliff))
+    assert translation_data['objects'] == TEST_DATA_EN['objects']
+
+
+@pytest.mark.django_db
+def test_create_xliff_external_skeleton():
+    from modeltranslation_xliff.models import XliffSkeleton
+    xliff = b''.join(utils.iter_xliff(TEST_DATA_EN, skeleton_mode='external'))
+    external_file = etree.fromstring(xliff).find('.//external-file')
+    checksum = external_file.attrib['uid']
+    assert external_file.attrib['href'] == 'xliff-skeleton:' + checksum
+    assert XliffSkeleton.objects.filter(checksum=checksum).exists()
+    translation_data = utils.import_xliff(_translate(xliff))
+    assert translation_data['objects'] == TEST_DATA_EN['objects']
+    XliffSkeleton.objects.all().delete()
+    with pytest.raises(ValidationError):
+        utils.import_xliff(_translate(xliff))
+
+
+def _add_sources(tagged_segments):
+    root = etree.Element('group')
+    units = [(etree.SubElement(root, 'trans-unit'), seg)
+             for seg in tagged_segments]
+    utils._add_sources(units)
+    return etree.tostring(root, encoding='unicode')
+
+
+def test_add_sources():
+    tagged_segments = [
+        'Plain text.',
+        'Text with <bpt id="1">&lt;b&gt;</bpt>tags<ept id="1">&lt;/b&gt;</ept>.',
+        'Text with <ph id="1">&amp;</ph> and &#38;.',
+        '',
+    ]
+    expected = ''.join(
+        '<trans-unit>{}</trans-unit>'.format(etree.tostring(
+            etree.fromstring('<source>{}</source>'.format(seg)),
+            encoding='unicode'
+        ))
+        for seg in tagged_segments
+    )
+    assert _add_sources(tagged_segments) == \
+        '<group>{}</group>'.format(expected)
+
+
+@pytest.mark.parametrize('tagged_segments', [
+    ['<b>Unclosed tag', 'Valid <ph id="1">&amp;</ph>'],
+    ['Split</source><source>segment', 'Valid <ph id="1">&amp;</ph>'],
+])
+def test_add_sources_invalid(tagged_segments):
+    with pytest.raises(SyntaxError):
+        _add_sources(tagged_segments)
+
+
+@pytest.mark.parametrize('target,expected', [
+    ('<target/>', ''),
+    ('<target>a &amp; b &lt; c</target>', 'a &amp; b &lt; c'),
+    ('<target>a <ph id="1">&amp;</ph> <ph id="2">&lt;</ph>b'
+     '<ph id="3">&gt;</ph></target>', 'a &amp; &lt;b&gt;'),
+    ('<target><bpt id="1">&lt;a href="?a=1&amp;b=2"&gt;</bpt>link'
+     '<ept id="1">&lt;/a&gt;</ept><it id="2" pos="open">&lt;br&gt;</it>'
+     '</target>', '<a href="?a=1&b=2">link</a><br>'),
+    ('<target><g id="1">a <g id="2">b <ph id="1">&amp;</ph></g> c</g>'
+     '<!-- comment -->d</target>', 'a b &amp; cd'),
+    ('<target><g id="1"><bpt id="1">&lt;b&gt;</bpt>x</g>y</target>',
+     '<b>xy'),
+])
+def test_get_inner_text(target, expected):
+    elem = etree.fromstring('<trans-unit>{}tail</trans-unit>'.format(target))[0]
+    assert utils.get_inner_text(elem) == expected
+
+
+def test_get_inner_text_plain_text():
+    elem = etree.fromstring(
+        '<target>a &amp; <ph id="1">&lt;</ph><g id="1">b</g></target>'
+    )
+    with mock.patch.object(utils, 'CONTENT_TYPE', 'text'):
+        assert utils.get_inner_text(elem) == 'a & <b'
+
+
+def test_get_inner_text_deep_nesting():
+    elem = etree.Element('target')
+    child = elem
+    for _ in range(sys.getrecursionlimit() * 2):
+        child = etree.SubElement(child, 'g')
+        child.text = 'x'
+        child.tail = 'y'
+    assert utils.get_inner_text(elem) == \
+        'x' * sys.getrecursionlimit() * 2 + 'y' * sys.getrecursionlimit() * 2
+
+
+@pytest.mark.django_db
+def test_bulk_update(django_assert_num_queries):
+    from testapp.models import Article
+    articles = [Article.objects.create(title='Title {}'.format(i), text='Text')
+                for i in range(3)]
+    for i, article in enumerate(articles):
+        article.title_ru_ru = 'RU Title {}'.format(i)
+        article.text_ru_ru = None if i else 'RU Text'
+    # One UPDATE query for each batch
+    with django_assert_num_queries(2):
+        utils.bulk_update(Article, articles, ['title_ru_ru', 'text_ru_ru'],
+                          batch_size=2)
+    assert list(Article.objects.filter(
+        pk__in=[article.pk for article in articles]
+    ).order_by('pk').values_list(
+        'title_ru_ru', 'text_ru_ru'
+    )) == [('RU Title 0', 'RU Text'), ('RU Title 1', None),
+           ('RU Title 2', None)]
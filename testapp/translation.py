@@ -1,7 +1,12 @@
 from modeltranslation.translator import register, TranslationOptions
-from .models import Article
+from .models import Article, Block
 
 
 @register(Article)
 class ArticleTranslationOptions(TranslationOptions):
     fields = ('title', 'text')
+
+
+@register(Block)
+class BlockTranslationOptions(TranslationOptions):
+    fields = ('text',)